@@ -0,0 +1 @@
+"""Benchmarks of the hot paths of aiida-cattools (see ``conftest.py``)."""
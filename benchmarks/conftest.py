@@ -0,0 +1,124 @@
+"""pytest fixtures of the benchmarks.
+
+Run the benchmarks with::
+
+    tox -e benchmarks
+
+Besides timing them, the benchmarks of the optimized paths check that they are
+faster than the slower path they replace, timed in the same run (see the
+``assert_speedup`` fixture), and the import time of the modules loaded by verdi
+is checked against a budget. These checks do not depend on the machine, and
+fail the run on any of them.
+
+The timings themselves do depend on the machine, so the baselines are not
+committed: they are saved in ``.benchmarks/<host name>``, and have to be
+created on a machine before comparing with them::
+
+    pytest benchmarks --benchmark-save=baseline
+    tox -e benchmarks-compare
+
+To benchmark larger databases::
+
+    pytest benchmarks --scale 1000 --scale 100000
+"""
+from pathlib import Path
+import platform
+import timeit
+
+import pytest
+
+from .synthetic import create_diff_parameters, create_workchains
+
+DEFAULT_SCALES = (1000,)
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--scale",
+        action="append",
+        type=int,
+        help="number of synthetic nodes in the database, can be repeated "
+        f"(default: {', '.join(map(str, DEFAULT_SCALES))})",
+    )
+
+
+def pytest_configure(config):
+    """Save and compare the benchmarks of each host in its own directory.
+
+    The machine id of pytest-benchmark only names the platform and the
+    Python version, which are the same on most runners.
+    """
+    storage = config.getoption("benchmark_storage", None)
+    if storage is None or "://" in storage and not storage.startswith("file://"):
+        return
+    path = Path(storage[len("file://") :] if "://" in storage else storage)
+    path /= platform.node()
+    config.option.benchmark_storage = str(path)
+
+    compare = config.getoption("benchmark_compare")
+    if compare and not _saved_benchmarks(path, compare):
+        raise pytest.UsageError(
+            f"No baseline saved in {path} to compare with, save one first with "
+            "'pytest benchmarks --benchmark-save=baseline'"
+        )
+
+
+def _saved_benchmarks(path, compare):
+    """Return the saved runs of this platform that ``--benchmark-compare`` selects."""
+    from pytest_benchmark.utils import (  # pylint: disable=import-outside-toplevel
+        get_machine_id,
+    )
+
+    if compare is True:
+        pattern = "[0-9][0-9][0-9][0-9]_*.json"
+    elif Path(compare).is_file():
+        return [compare]
+    else:
+        pattern = f"{compare.rstrip('*')}*.json"
+    return list(path.joinpath(get_machine_id()).glob(pattern))
+
+
+def pytest_generate_tests(metafunc):
+    if "scale" in metafunc.fixturenames:
+        scales = metafunc.config.getoption("scale") or DEFAULT_SCALES
+        metafunc.parametrize("scale", scales, scope="module")
+
+
+@pytest.fixture(scope="function", autouse=True)
+def clear_database_auto():
+    """Keep the synthetic nodes between the benchmarks of a module."""
+
+
+@pytest.fixture
+def assert_speedup(benchmark):
+    """Check that the benchmarked function is faster than a reference.
+
+    The reference is timed in the same run, so that the ratio of the two
+    timings hardly depends on the machine.
+
+    :returns: function of the ``reference`` (called without arguments), of
+        the minimum ``speedup`` and of the factor its time is multiplied by
+        (``scale``), e.g. to extrapolate the time of a sample
+    """
+
+    def check(reference, speedup, scale=1, repeat=3):
+        if benchmark.disabled:
+            return
+        elapsed = min(timeit.repeat(reference, number=1, repeat=repeat)) * scale
+        measured = elapsed / benchmark.stats.stats.min
+        assert measured >= speedup, f"only {measured:.1f} times faster"
+
+    return check
+
+
+@pytest.fixture(scope="module")
+def synthetic_profile(aiida_profile, scale):
+    """Profile with ``scale`` workchains and ``scale`` ``DiffParameters`` nodes.
+
+    :returns: dictionary with the PKs of the ``workchains`` and ``parameters``
+    """
+    aiida_profile.clear_profile()
+    return {
+        "workchains": create_workchains(scale),
+        "parameters": create_diff_parameters(scale),
+    }
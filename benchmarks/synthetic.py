@@ -0,0 +1,129 @@
+"""Bulk creation of synthetic nodes to benchmark against a realistic database.
+
+The nodes are inserted with the ``bulk_insert`` of the storage backend, in a
+single transaction, as storing 10^5 nodes one by one through the ORM would
+take longer than the benchmarks themselves.
+"""
+from uuid import uuid4
+
+import numpy as np
+
+from aiida.common import timezone
+from aiida.common.links import LinkType
+from aiida.manage import get_manager
+from aiida.orm import Dict, User, WorkflowNode
+from aiida.orm.entities import EntityTypes
+
+from aiida_cattools.data import DiffParameters, cmdline_options
+
+PROCESS_TYPE = "aiida.workflows:vasp.relax"
+PROCESS_LABEL = "RelaxWorkChain"
+METALS = ("Pt", "Pd", "Cu", "Ni")
+FACETS = ("111", "100")
+
+
+def _node_row(cls, user_id, now, **kwargs):
+    row = {
+        "uuid": str(uuid4()),
+        "node_type": cls._plugin_type_string,  # pylint: disable=protected-access
+        "process_type": None,
+        "label": "",
+        "description": "",
+        "ctime": now,
+        "mtime": now,
+        "attributes": {},
+        "extras": {},
+        "repository_metadata": {},
+        "dbcomputer_id": None,
+        "user_id": user_id,
+    }
+    row.update(kwargs)
+    return row
+
+
+def create_workchains(count, seed=0):
+    """Insert finished relaxation workchains returning a ``misc`` dictionary.
+
+    The workchains cycle through ``METALS`` and ``FACETS``, stored as the
+    ``Simulation`` metadata extras.
+
+    :param count: number of workchains
+    :param seed: seed of the random final energies
+    :returns: PKs of the workchains
+    :rtype: list
+    """
+    storage = get_manager().get_profile_storage()
+    user_id = User.collection.get_default().pk
+    now = timezone.now()
+    energies = np.random.default_rng(seed).uniform(-500.0, -100.0, count)
+
+    workchains = [
+        _node_row(
+            WorkflowNode,
+            user_id,
+            now,
+            process_type=PROCESS_TYPE,
+            label=f"relax-{index}",
+            attributes={
+                "process_label": PROCESS_LABEL,
+                "process_state": "finished",
+                "exit_status": 0,
+            },
+            extras={
+                "cattools_active_metal": METALS[index % len(METALS)],
+                "cattools_surf_facet": FACETS[index % len(FACETS)],
+            },
+        )
+        for index in range(count)
+    ]
+    outputs = [
+        _node_row(
+            Dict,
+            user_id,
+            now,
+            attributes={
+                "total_energies": {"energy_extrapolated_electronic": float(energy)}
+            },
+        )
+        for energy in energies
+    ]
+    with storage.transaction():
+        wc_pks = storage.bulk_insert(EntityTypes.NODE, workchains)
+        output_pks = storage.bulk_insert(EntityTypes.NODE, outputs)
+        storage.bulk_insert(
+            EntityTypes.LINK,
+            [
+                {
+                    "input_id": wc_pk,
+                    "output_id": output_pk,
+                    "label": "misc",
+                    "type": LinkType.RETURN.value,
+                }
+                for wc_pk, output_pk in zip(wc_pks, output_pks)
+            ],
+        )
+    return wc_pks
+
+
+def create_diff_parameters(count):
+    """Insert ``DiffParameters`` nodes with every combination of options.
+
+    :returns: PKs of the nodes
+    :rtype: list
+    """
+    storage = get_manager().get_profile_storage()
+    user_id = User.collection.get_default().pk
+    now = timezone.now()
+    names = [str(option) for option in cmdline_options]
+    rows = [
+        _node_row(
+            DiffParameters,
+            user_id,
+            now,
+            label=f"parameters-{index}",
+            attributes={name: bool(index >> bit & 1) for bit, name in enumerate(names)},
+        )
+        for index in range(count)
+    ]
+    with storage.transaction():
+        return storage.bulk_insert(EntityTypes.NODE, rows)
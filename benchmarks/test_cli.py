@@ -0,0 +1,16 @@
+""" Benchmarks of the command line interface."""
+from click.testing import CliRunner
+import pytest
+
+from aiida_cattools.cli import list_
+
+
+@pytest.mark.parametrize("format_", ["text", "json"])
+def test_list(benchmark, synthetic_profile, format_):
+    """verdi data cattools list, for all the DiffParameters nodes."""
+    runner = CliRunner()
+
+    result = benchmark(runner.invoke, list_, ["--format", format_])
+
+    assert result.exit_code == 0, result.output
+    assert str(synthetic_profile["parameters"][-1]) in result.output
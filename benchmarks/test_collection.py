@@ -0,0 +1,77 @@
+""" Benchmarks of the construction and export of collections."""
+import pytest
+
+from aiida_cattools.data.collection import Collection
+from aiida_cattools.data.group import CollectionGroup
+from aiida_cattools.data.simulation import Simulation
+from aiida_cattools.utils.export import write_chunks
+
+from .synthetic import METALS, PROCESS_LABEL
+
+FILTERS = {"attributes.process_label": PROCESS_LABEL}
+
+
+def test_from_workchains(benchmark, synthetic_profile):
+    """Collection of all the workchains, queried from the database."""
+    collection = benchmark(Collection.from_workchains, filters=FILTERS)
+
+    assert len(collection) == len(synthetic_profile["workchains"])
+    assert (collection.df["final_energy"] < 0).all()
+
+
+def test_query(benchmark, assert_speedup, synthetic_profile):
+    """Workchains of one metal in an energy range, filtered in the database."""
+    filters = {"active_metal": "Pt", "final_energy": {"<": -300.0}}
+
+    collection = benchmark(
+        Collection.query, filters, columns=["active_metal", "final_energy"]
+    )
+
+    assert 0 < len(collection) < len(synthetic_profile["workchains"]) / len(METALS)
+    assert (collection.df["final_energy"] < -300.0).all()
+
+    def filter_in_memory():
+        df = Collection.from_workchains(filters=FILTERS).df
+        return df[(df["active_metal"] == "Pt") & (df["final_energy"] < -300.0)]
+
+    assert_speedup(filter_in_memory, 2)
+
+
+def test_collection_group(benchmark, synthetic_profile):
+    """Bulk addition of all the workchains to a group, read back and removal."""
+    pks = synthetic_profile["workchains"]
+    group = CollectionGroup(label=f"benchmark-{len(pks)}").store()
+
+    def roundtrip():
+        group.add_workchains(pks)
+        collection = group.to_collection()
+        group.remove_workchains(pks)
+        return collection
+
+    collection = benchmark(roundtrip)
+
+    assert collection.df["wc_pk"].tolist() == pks
+    assert not group.count()
+
+
+def test_from_simulations(benchmark, scale):
+    """Collection of simulations held in memory, and back."""
+    simulations = [
+        Simulation(wc_pk=index, ads_formula="CO", final_energy=-1.0)
+        for index in range(scale)
+    ]
+
+    collection = benchmark(Collection.from_simulations, simulations)
+
+    assert len(collection.to_simulations()) == scale
+
+
+@pytest.mark.parametrize("filename", ["export.parquet", "export.csv.gz"])
+def test_export(benchmark, synthetic_profile, tmp_path, filename):
+    """Streamed export of all the workchains to a file."""
+    path = tmp_path / filename
+
+    def export():
+        return write_chunks(Collection.iter_workchains(filters=FILTERS), path)
+
+    assert benchmark(export) == len(synthetic_profile["workchains"])
@@ -0,0 +1,49 @@
+""" Benchmarks of the energy getters."""
+from aiida_cattools.data.simulation import Simulation
+from aiida_cattools.utils.getters import (
+    NodeCache,
+    get_energies_from_pks,
+    get_energy_from_pk,
+)
+
+# Number of workchains whose energy is loaded one by one, as a reference
+SAMPLE_SIZE = 50
+
+
+def test_get_energies_from_pks(benchmark, assert_speedup, synthetic_profile):
+    """Bulk query of the energies of all the workchains."""
+    pks = synthetic_profile["workchains"]
+
+    energies, missing = benchmark(get_energies_from_pks, pks)
+
+    assert len(energies) == len(pks)
+    assert not missing
+    sample = pks[:SAMPLE_SIZE]
+    assert_speedup(
+        lambda: [get_energy_from_pk(pk) for pk in sample],
+        20,
+        scale=len(pks) / len(sample),
+    )
+
+
+def test_get_energy_from_pk(benchmark, synthetic_profile):
+    """Energy of a single workchain, loading the node every time."""
+    pk = synthetic_profile["workchains"][-1]
+
+    assert benchmark(get_energy_from_pk, pk) < 0
+
+
+def test_get_energy_from_pk_cached(benchmark, assert_speedup, synthetic_profile):
+    """Energy of a single workchain from the node cache."""
+    pk = synthetic_profile["workchains"][-1]
+
+    assert benchmark(get_energy_from_pk, pk, use_cache=NodeCache()) < 0
+    assert_speedup(lambda: get_energy_from_pk(pk), 2)
+
+
+def test_set_output_energies(benchmark, synthetic_profile):
+    """Energies of the simulations of all the workchains."""
+    simulations = [Simulation(wc_pk=pk) for pk in synthetic_profile["workchains"]]
+
+    assert not benchmark(Simulation.set_output_energies, simulations)
+    assert all(simulation.final_energy < 0 for simulation in simulations)
@@ -0,0 +1,47 @@
+""" Import time of the modules loaded by verdi and the entry points."""
+import subprocess
+import sys
+
+import pytest
+
+# Time (in seconds) a module may add to the startup of verdi, on top of the
+# aiida modules that are loaded anyway. Importing pandas alone exceeds it.
+IMPORT_TIME_BUDGET = 0.15
+PRELOADED = (
+    "import aiida.cmdline.commands.cmd_data, aiida.engine, aiida.orm, aiida.plugins"
+)
+
+
+def import_time(module, repeat=3):
+    """Return the time ``module`` adds to the import of the aiida modules it needs.
+
+    The module is imported in a new interpreter after ``PRELOADED``, and its
+    cumulative import time, as reported by ``python -X importtime``, so only
+    counts the modules it imports on top of aiida's.
+
+    :param repeat: number of interpreters, the minimum time being returned
+    :returns: time in seconds
+    """
+    times = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"{PRELOADED}; import {module}"],
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+        for line in result.stderr.splitlines():
+            # import time: self [us] | cumulative | imported package
+            _, total, name = line.split(":", 1)[1].split("|")
+            if name.strip() == module:
+                times.append(int(total) / 1e6)
+    return min(times)
+
+
+@pytest.mark.parametrize(
+    "module",
+    ["aiida_cattools.cli", "aiida_cattools.data", "aiida_cattools.data.group"],
+)
+def test_import_time(module):
+    """The entry points and verdi commands load within the budget."""
+    assert import_time(module) < IMPORT_TIME_BUDGET
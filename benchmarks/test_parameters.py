@@ -0,0 +1,46 @@
+""" Benchmarks of the DiffParameters data type."""
+from aiida.orm import load_node
+
+from aiida_cattools.data import DiffParameters, cmdline_options
+
+# The options of the second synthetic node
+OPTIONS = {str(option): str(option) == "ignore-case" for option in cmdline_options}
+
+
+def test_constructor(benchmark):
+    """Validation and creation of an unstored node."""
+    parameters = benchmark(DiffParameters, OPTIONS)
+
+    assert parameters.get_dict() == OPTIONS
+
+
+def get_or_create():
+    """Look up the node of ``OPTIONS`` in the database."""
+    DiffParameters.clear_interned()
+    return DiffParameters.get_or_create(OPTIONS)
+
+
+def test_get_or_create(benchmark, synthetic_profile):
+    """Lookup of an existing node among many, in the database."""
+    parameters = benchmark(get_or_create)
+
+    assert parameters.pk == synthetic_profile["parameters"][1]
+
+
+def test_get_or_create_interned(benchmark, assert_speedup, synthetic_profile):
+    """Lookup of a node returned before."""
+    DiffParameters.clear_interned()
+
+    parameters = benchmark(DiffParameters.get_or_create, OPTIONS)
+
+    assert parameters.pk == synthetic_profile["parameters"][1]
+    assert_speedup(get_or_create, 100)
+
+
+def test_cmdline_params(benchmark, synthetic_profile):
+    """Command line of a stored node."""
+    parameters = load_node(synthetic_profile["parameters"][1])
+
+    params = benchmark(parameters.cmdline_params, "file1.txt", "file2.txt")
+
+    assert params == ["--ignore-case", "file1.txt", "file2.txt"]
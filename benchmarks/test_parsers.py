@@ -0,0 +1,48 @@
+""" Benchmarks of the streaming output parsers."""
+import io
+import os
+
+import pytest
+
+from aiida_cattools.utils import qe, vasp
+from aiida_cattools.utils.diff import summarize_diff
+from tests import TEST_DIR
+
+# Output file of every parser, with two ionic steps
+OUTPUTS = {"vasp": (vasp, vasp.OUTCAR), "qe": (qe, qe.STDOUT)}
+
+
+@pytest.fixture(scope="module")
+def outputs(tmp_path_factory, scale):
+    """Folders with output files of ``scale`` ionic steps, by code."""
+    folders = {}
+    for code, (_, filename) in OUTPUTS.items():
+        with open(
+            os.path.join(TEST_DIR, "input_files", code, filename), "rb"
+        ) as handle:
+            content = handle.read()
+        folders[code] = tmp_path_factory.mktemp(code)
+        (folders[code] / filename).write_bytes(content * (scale // 2))
+    return folders
+
+
+@pytest.mark.parametrize("code", list(OUTPUTS))
+def test_iter_ionic_steps(benchmark, outputs, scale, code):
+    """Parse all the ionic steps of an output file."""
+    module, _ = OUTPUTS[code]
+
+    steps = benchmark(lambda: list(module.iter_ionic_steps(outputs[code])))
+
+    assert len(steps) == scale // 2 * 2
+
+
+def test_summarize_diff(benchmark, scale):
+    """Summary of a diff with ``scale`` hunks."""
+    patch = b"".join(
+        b"%dc%d\n< old line\n---\n> new line\n" % (line, line)
+        for line in range(1, scale + 1)
+    )
+
+    summary = benchmark(lambda: summarize_diff(io.BytesIO(patch)))
+
+    assert summary["hunks"] == scale
@@ -3,19 +3,30 @@ Calculations provided by aiida_cattools.
 
 Register calculations via the "aiida.calculations" entry point in setup.json.
 """
+import hashlib
+import io
+
 from aiida.common import datastructures
-from aiida.engine import CalcJob
-from aiida.orm import SinglefileData
+from aiida.common.hashing import chunked_file_hash
+from aiida.engine import CalcJob, calcfunction, run_get_node, submit
+from aiida.manage.caching import enable_caching
+from aiida.orm import Dict, SinglefileData
 from aiida.plugins import DataFactory
 
+from .utils.diff import summarize_diff
+
 DiffParameters = DataFactory("cattools")
 
+REFERENCES_FOLDER = "references"
+TARGETS_FOLDER = "targets"
+
 
 class DiffCalculation(CalcJob):
     """
     AiiDA calculation plugin wrapping the diff executable.
 
-    Simple AiiDA plugin wrapper for 'diffing' two files.
+    Simple AiiDA plugin wrapper for 'diffing' two files, or many targets
+    against their references (or against ``file1``) in a single job.
     """
 
     @classmethod
@@ -34,22 +45,81 @@ class DiffCalculation(CalcJob):
         spec.input(
             "metadata.options.output_filename", valid_type=str, default="patch.diff"
         )
+        spec.input(
+            "metadata.options.summarize",
+            valid_type=bool,
+            default=False,
+            help="Parse the diffs into 'summary' dictionaries instead of keeping "
+            "the whole patches.",
+        )
+        spec.input(
+            "metadata.options.patch_threshold",
+            valid_type=int,
+            default=4096,
+            help="When summarizing, size in bytes above which the patch is kept "
+            "as a file; smaller patches are included in the summary.",
+        )
+        spec.input(
+            "metadata.options.keep_patch",
+            valid_type=bool,
+            default=False,
+            help="When summarizing, always keep the patch as a file.",
+        )
         spec.input(
             "parameters",
             valid_type=DiffParameters,
             help="Command line parameters for diff",
         )
         spec.input(
-            "file1", valid_type=SinglefileData, help="First file to be compared."
+            "file1",
+            valid_type=SinglefileData,
+            required=False,
+            help="First file to be compared, and default reference of the targets.",
         )
         spec.input(
-            "file2", valid_type=SinglefileData, help="Second file to be compared."
+            "file2",
+            valid_type=SinglefileData,
+            required=False,
+            help="Second file to be compared.",
+        )
+        spec.input_namespace(
+            "targets",
+            valid_type=SinglefileData,
+            dynamic=True,
+            help="Files compared, in the same job, with the reference of the same "
+            "label or with file1.",
+        )
+        spec.input_namespace(
+            "references",
+            valid_type=SinglefileData,
+            dynamic=True,
+            help="References of the targets with the same label.",
         )
+        spec.inputs.validator = validate_inputs
         spec.output(
             "cattools",
             valid_type=SinglefileData,
+            required=False,
             help="diff between file1 and file2.",
         )
+        spec.output_namespace(
+            "diffs",
+            valid_type=SinglefileData,
+            dynamic=True,
+            help="diff between every target and its reference, by label.",
+        )
+        spec.output(
+            "summary",
+            valid_type=Dict,
+            required=False,
+            help="Summary of the diff between file1 and file2.",
+        )
+        spec.output_namespace(
+            "summaries",
+            valid_type=Dict,
+            dynamic=True,
+            help="Summary of the diff of every target, by label.",
+        )
 
         spec.exit_code(
             300,
@@ -65,28 +135,142 @@ class DiffCalculation(CalcJob):
             needed by the calculation.
         :return: `aiida.common.datastructures.CalcInfo` instance
         """
+        # One diff per pair of files, executed one after the other by the same
+        # job script
+        calcinfo = datastructures.CalcInfo()
+        calcinfo.codes_info = []
+        calcinfo.local_copy_list = []
+        calcinfo.retrieve_list = []
+
+        copied = set()
+
+        def copy(node, path):
+            if path not in copied:
+                calcinfo.local_copy_list.append((node.uuid, node.filename, path))
+                copied.add(path)
+            return path
+
+        if "file2" in self.inputs:
+            self._append_diff(
+                calcinfo,
+                copy(self.inputs.file1, self.inputs.file1.filename),
+                copy(self.inputs.file2, self.inputs.file2.filename),
+                self.metadata.options.output_filename,
+            )
+
+        # Every target is placed in its own folder, so that files with the same
+        # name can be compared in the same job
+        for label, target in sorted(self.inputs.get("targets", {}).items()):
+            if label in self.inputs.get("references", {}):
+                reference = self.inputs.references[label]
+                reference_path = copy(
+                    reference, f"{REFERENCES_FOLDER}/{label}/{reference.filename}"
+                )
+            else:
+                reference_path = copy(self.inputs.file1, self.inputs.file1.filename)
+            self._append_diff(
+                calcinfo,
+                reference_path,
+                copy(target, f"{TARGETS_FOLDER}/{label}/{target.filename}"),
+                get_diff_filename(label, self.metadata.options.output_filename),
+            )
+
+        return calcinfo
+
+    def _append_diff(self, calcinfo, path1, path2, output_filename):
+        """Add the execution of diff between two files to the job."""
         codeinfo = datastructures.CodeInfo()
         codeinfo.cmdline_params = self.inputs.parameters.cmdline_params(
-            file1_name=self.inputs.file1.filename, file2_name=self.inputs.file2.filename
+            file1_name=path1, file2_name=path2
         )
         codeinfo.code_uuid = self.inputs.code.uuid
-        codeinfo.stdout_name = self.metadata.options.output_filename
+        codeinfo.stdout_name = output_filename
+        calcinfo.codes_info.append(codeinfo)
+        calcinfo.retrieve_list.append(output_filename)
 
-        # Prepare a `CalcInfo` to be returned to the engine
-        calcinfo = datastructures.CalcInfo()
-        calcinfo.codes_info = [codeinfo]
-        calcinfo.local_copy_list = [
-            (
-                self.inputs.file1.uuid,
-                self.inputs.file1.filename,
-                self.inputs.file1.filename,
-            ),
-            (
-                self.inputs.file2.uuid,
-                self.inputs.file2.filename,
-                self.inputs.file2.filename,
-            ),
+
+def get_diff_filename(label, output_filename):
+    """Name of the output file of the diff of the target ``label``."""
+    return f"{label}.{output_filename}"
+
+
+def validate_inputs(inputs, _):
+    """Check that there is something to compare and that every target has a reference."""
+    targets = inputs.get("targets", {})
+    references = inputs.get("references", {})
+    if "file2" in inputs and "file1" not in inputs:
+        return "file2 requires file1."
+    if "file2" not in inputs and not targets:
+        return "Either file1 and file2, or targets, are required."
+    missing = set(targets) - set(references)
+    if missing and "file1" not in inputs:
+        return f"No reference (nor file1) for the targets {sorted(missing)}."
+    unused = set(references) - set(targets)
+    if unused:
+        return f"References without target: {sorted(unused)}."
+    return None
+
+
+@calcfunction
+def identical_diff(file1, file2):  # pylint: disable=unused-argument
+    """Return the outputs of a diff between two files with the same content.
+
+    Used by :func:`run_diff` instead of a :class:`DiffCalculation`, so the
+    comparison keeps its provenance without running a job.
+    """
+    summary = summarize_diff(iter(()))
+    summary["patch"] = ""
+    return {
+        "cattools": SinglefileData(io.BytesIO(b""), filename="patch.diff"),
+        "summary": Dict(summary),
+    }
+
+
+def has_same_content(file1, file2):
+    """Check whether two ``SinglefileData`` nodes have the same content.
+
+    The file names are ignored. For stored nodes, the keys of the files in the
+    repository are content hashes, so the files are not read.
+    """
+    if file1.is_stored and file2.is_stored:
+        keys = [
+            node.base.repository.get_object(node.filename).key
+            for node in (file1, file2)
         ]
-        calcinfo.retrieve_list = [self.metadata.options.output_filename]
+        if None not in keys:
+            return keys[0] == keys[1]
+    return _content_hash(file1) == _content_hash(file2)
 
-        return calcinfo
+
+def _content_hash(node):
+    """Hash of the content of a ``SinglefileData``, read in chunks."""
+    with node.open(mode="rb") as handle:
+        return chunked_file_hash(handle, hashlib.sha256)
+
+
+def run_diff(inputs, submit_job=False):
+    """Compare two files, without a job if their content is identical.
+
+    If ``file1`` and ``file2`` have the same content (and no ``targets``
+    are given), :func:`identical_diff` is run with caching enabled, so the
+    same pair is only compared once. Otherwise a :class:`DiffCalculation` is
+    run or submitted.
+
+    :param inputs: inputs of :class:`DiffCalculation`
+    :param submit_job: submit the calculation to the daemon instead of running it
+    :returns: the process node
+    """
+    if (
+        "file2" in inputs
+        and not inputs.get("targets")
+        and has_same_content(inputs["file1"], inputs["file2"])
+    ):
+        with enable_caching(
+            identifier=identical_diff.process_class.build_process_type()
+        ):
+            _, node = identical_diff.run_get_node(inputs["file1"], inputs["file2"])
+            return node
+    if submit_job:
+        return submit(DiffCalculation, **inputs)
+    _, node = run_get_node(DiffCalculation, **inputs)
+    return node
@@ -5,16 +5,28 @@ Register new commands either via the "console_scripts" entry point or plug them
 directly into the 'verdi' command by using AiiDA-specific entry points like
 "aiida.cmdline.data" (both in the setup.json file).
 """
+import csv
+from datetime import timedelta
+import json
 import sys
 
 import click
 
 from aiida.cmdline.commands.cmd_data import verdi_data
+from aiida.cmdline.params import options
 from aiida.cmdline.params.types import DataParamType
-from aiida.cmdline.utils import decorators
+from aiida.cmdline.utils import decorators, echo
+from aiida.common import timezone
 from aiida.orm import QueryBuilder
 from aiida.plugins import DataFactory
 
+from .data import cmdline_options
+from .utils.export import EXPORT_FORMATS, guess_format, write_chunks
+from .utils.getters import QUERY_BATCH_SIZE
+from .utils.instrument import instrument, instrumented
+
+LIST_FORMATS = ("text", "json", "csv")
+
 
 # See aiida.cmdline.data entry point in setup.json
 @verdi_data.group("cattools")
@@ -23,22 +35,89 @@ def data_cli():
 
 
 @data_cli.command("list")
+@click.option(
+    "--enabled",
+    "-e",
+    multiple=True,
+    type=click.Choice(sorted(str(option) for option in cmdline_options)),
+    help="Only list the nodes with this option enabled (can be repeated).",
+)
+@click.option(
+    "--past-days",
+    type=click.IntRange(min=0),
+    help="Only list the nodes created in the past N days.",
+)
+@click.option("--limit", type=click.IntRange(min=0), help="Maximum number of nodes.")
+@click.option(
+    "--offset", type=click.IntRange(min=0), default=0, help="Number of nodes skipped."
+)
+@click.option(
+    "--format",
+    "-F",
+    "format_",
+    type=click.Choice(LIST_FORMATS),
+    default="text",
+    show_default=True,
+    help="Output format; json writes one object per line.",
+)
+@click.option(
+    "--batch-size",
+    type=click.IntRange(min=1),
+    default=1000,
+    show_default=True,
+    help="Number of rows fetched from the database at once.",
+)
 @decorators.with_dbenv()
-def list_():  # pylint: disable=redefined-builtin
+@instrumented
+def list_(  # pylint: disable=redefined-builtin,too-many-arguments
+    enabled, past_days, limit, offset, format_, batch_size
+):
     """
     Display all DiffParameters nodes
+
+    Only the identifiers and attributes are projected, and the rows are
+    written as they are fetched from the database, ordered by PK.
     """
     DiffParameters = DataFactory("cattools")
 
+    filters = {f"attributes.{option}": True for option in enabled}
+    if past_days is not None:
+        filters["ctime"] = {">": timezone.now() - timedelta(days=past_days)}
+
     qb = QueryBuilder()
-    qb.append(DiffParameters)
-    results = qb.all()
+    qb.append(
+        DiffParameters,
+        filters=filters,
+        project=["id", "uuid", "ctime", "label", "attributes"],
+    )
+    qb.order_by({DiffParameters: {"id": "asc"}})
+    qb.offset(offset)
+    if limit is not None:
+        qb.limit(limit)
+
+    options = sorted(str(option) for option in cmdline_options)
+    writer = None
+    if format_ == "csv":
+        writer = csv.writer(sys.stdout, lineterminator="\n")
+        writer.writerow(["pk", "uuid", "ctime", "label"] + options)
 
-    s = ""
-    for result in results:
-        obj = result[0]
-        s += f"{str(obj)}, pk: {obj.pk}\n"
-    sys.stdout.write(s)
+    for pk, uuid, ctime, label, attributes in qb.iterall(batch_size=batch_size):
+        if format_ == "json":
+            row = {
+                "pk": pk,
+                "uuid": uuid,
+                "ctime": ctime.isoformat(),
+                "label": label,
+                "parameters": attributes,
+            }
+            sys.stdout.write(json.dumps(row) + "\n")
+        elif format_ == "csv":
+            writer.writerow(
+                [pk, uuid, ctime.isoformat(), label]
+                + [bool(attributes.get(option)) for option in options]
+            )
+        else:
+            sys.stdout.write(f"uuid: {uuid} (pk: {pk})\n{attributes}, pk: {pk}\n")
 
 
 @data_cli.command("export")
@@ -50,6 +129,7 @@ def list_():  # pylint: disable=redefined-builtin
     help="Write output to file (default: print to stdout).",
 )
 @decorators.with_dbenv()
+@instrumented
 def export(node, outfile):
     """Export a DiffParameters node (identified by PK, UUID or label) to plain text."""
     string = str(node)
@@ -59,3 +139,91 @@ def export(node, outfile):
             f.write(string)
     else:
         click.echo(string)
+
+
+@data_cli.command("export-collection")
+@click.argument("outfile", type=click.Path(dir_okay=False))
+@options.GROUP(help="Only export the workchains in this group.")
+@click.option(
+    "--process-label",
+    "-L",
+    multiple=True,
+    help="Only export workchains with this process label, e.g. RelaxWorkChain "
+    "(can be repeated).",
+)
+@click.option(
+    "--past-days",
+    type=click.IntRange(min=0),
+    help="Only export the workchains created in the past N days.",
+)
+@click.option(
+    "--format",
+    "-F",
+    "format_",
+    type=click.Choice(EXPORT_FORMATS),
+    help="Output format (default: guessed from the file name).",
+)
+@click.option(
+    "--compression",
+    "-c",
+    help="Compression codec: e.g. zstd, snappy or none for Parquet (default: zstd), "
+    "gzip, bz2 or xz for CSV and JSONL (default: guessed from the file name).",
+)
+@click.option(
+    "--chunk-size",
+    type=click.IntRange(min=1),
+    default=QUERY_BATCH_SIZE,
+    show_default=True,
+    help="Number of rows queried and written at once.",
+)
+@decorators.with_dbenv()
+@instrumented
+def export_collection(  # pylint: disable=too-many-arguments
+    outfile, group, process_label, past_days, format_, compression, chunk_size
+):
+    """Export workchains as Simulation rows to a Parquet, CSV or JSONL file."""
+    # pandas is only imported by the commands that need it, to keep verdi fast
+    from .data.collection import Collection  # pylint: disable=import-outside-toplevel
+
+    filters = {}
+    if process_label:
+        filters["attributes.process_label"] = {"in": list(process_label)}
+    if past_days is not None:
+        filters["ctime"] = {">": timezone.now() - timedelta(days=past_days)}
+
+    format_ = format_ or guess_format(outfile)[0]
+    if format_ is None:
+        raise click.BadParameter(
+            "cannot guess the format from the file name, use --format",
+            param_hint="OUTFILE",
+        )
+
+    chunks = Collection.iter_workchains(
+        group=group, filters=filters, chunk_size=chunk_size
+    )
+    count = write_chunks(chunks, outfile, fmt=format_, compression=compression)
+    echo.echo_success(f"exported {count} simulations to {outfile}")
+
+
+@data_cli.command(
+    "profile",
+    context_settings={"ignore_unknown_options": True, "allow_interspersed_args": False},
+)
+@click.argument("command", nargs=-1, required=True, type=click.UNPROCESSED)
+@click.option(
+    "--json", "as_json", is_flag=True, help="Print the report as a JSON object."
+)
+@click.pass_context
+@decorators.with_dbenv()
+def profile(ctx, command, as_json):
+    """Run another cattools COMMAND and report what it costs.
+
+    The queries, rows fetched, calls to load_node, SQL statements, repository
+    bytes read and wall time are reported per operation on the standard
+    error, e.g. for "verdi data cattools profile export-collection out.pq".
+    """
+    with instrument(" ".join(command)) as report:
+        data_cli.main(
+            list(command), prog_name=ctx.parent.command_path, standalone_mode=False
+        )
+    click.echo(json.dumps(report.as_dict()) if as_json else report.format(), err=True)
@@ -5,9 +5,12 @@ Register data types via the "aiida.data" entry point in setup.json.
 """
 # You can directly use or subclass aiida.orm.data.Data
 # or any other data type listed under 'verdi data'
+import functools
+
 from voluptuous import Optional, Schema
 
-from aiida.orm import Dict
+from aiida.manage import get_profile
+from aiida.orm import Dict, QueryBuilder
 
 # A subset of diff's command line options
 cmdline_options = {
@@ -30,6 +33,9 @@ class DiffParameters(Dict):  # pylint: disable=too-many-ancestors
     # "voluptuous" schema  to add automatic validation
     schema = Schema(cmdline_options)
 
+    # Stored nodes by frozen options, see ``get_or_create``
+    _interned = {}
+
     # pylint: disable=redefined-builtin
     def __init__(self, dict=None, **kwargs):
         """
@@ -55,7 +61,49 @@ class DiffParameters(Dict):  # pylint: disable=too-many-ancestors
         :param type parameters_dict: dict
         :returns: validated dictionary
         """
-        return DiffParameters.schema(parameters_dict)
+        try:
+            key = _freeze(parameters_dict)
+            hash(key)
+        except (AttributeError, TypeError):
+            return DiffParameters.schema(parameters_dict)
+        # The schema is only applied once per set of options
+        return dict(_validate(key)[0])
+
+    @classmethod
+    def get_or_create(cls, parameters_dict):
+        """Return a stored node with the given options, storing one only if needed.
+
+        Nodes are looked up first in a table of the nodes already returned in
+        this interpreter, and then in the database by their content, so that
+        parametric sweeps do not store a duplicate node for every calculation.
+
+        :param parameters_dict: dictionary with commandline parameters
+        :returns: stored :class:`DiffParameters` node
+        """
+        key = (get_profile().name, _freeze(parameters_dict))
+        node = cls._interned.get(key)
+        if node is None:
+            node = cls(dict=parameters_dict)
+            content = node.get_dict()
+            query = QueryBuilder().append(
+                cls,
+                filters={
+                    f"attributes.{name}": value for name, value in content.items()
+                },
+                subclassing=False,
+            )
+            existing = next(
+                (found for found, in query.iterall() if found.get_dict() == content),
+                None,
+            )
+            node = node.store() if existing is None else existing
+            cls._interned[key] = node
+        return node
+
+    @classmethod
+    def clear_interned(cls):
+        """Forget the nodes returned by ``get_or_create``, e.g. after deleting nodes."""
+        cls._interned.clear()
 
     def cmdline_params(self, file1_name, file2_name):
         """Synthesize command line parameters.
@@ -68,16 +116,13 @@ class DiffParameters(Dict):  # pylint: disable=too-many-ancestors
         :param type file_name2: str
 
         """
-        parameters = []
-
-        pm_dict = self.get_dict()
-        for option, enabled in pm_dict.items():
-            if enabled:
-                parameters += ["--" + option]
+        options = self.__dict__.get("_cmdline_options")
+        if options is None:
+            options = _validate(_freeze(self.get_dict()))[1]
+            if self.is_stored:
+                self.__dict__["_cmdline_options"] = options
 
-        parameters += [file1_name, file2_name]
-
-        return [str(p) for p in parameters]
+        return list(options) + [str(file1_name), str(file2_name)]
 
     def __str__(self):
         """String representation of node.
@@ -91,3 +136,25 @@ class DiffParameters(Dict):  # pylint: disable=too-many-ancestors
         string = super().__str__()
         string += "\n" + str(self.get_dict())
         return string
+
+
+def _freeze(parameters_dict):
+    """Hashable key of a dictionary of options.
+
+    The type of every value is part of the key, as ``1 == True`` and both
+    hash the same, but only the latter is a valid option value.
+    """
+    return tuple(
+        sorted((name, type(value), value) for name, value in parameters_dict.items())
+    )
+
+
+@functools.lru_cache(maxsize=1024)
+def _validate(options):
+    """Validate frozen options and synthesize their command line arguments.
+
+    :returns: tuple with the validated dictionary and the tuple of arguments
+    """
+    validated = DiffParameters.schema({name: value for name, _, value in options})
+    arguments = tuple("--" + option for option, enabled in validated.items() if enabled)
+    return validated, arguments
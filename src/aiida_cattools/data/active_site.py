@@ -1,5 +1,80 @@
+import io
+
+import numpy as np
+
 from aiida.orm import StructureData
 
+from ..utils.fingerprint import FingerprintMixin
+from ..utils.geometry import SITE_KINDS, find_sites
+
+
+class ActiveSite(FingerprintMixin, StructureData):
+    """Slab structure together with its enumerated adsorption sites.
+
+    The site arrays returned by :func:`aiida_cattools.utils.geometry.find_sites`
+    are stored in the node repository as ``.npy`` files (as ``ArrayData``
+    does) and cached in memory once loaded, and the enumeration parameters are
+    stored in the ``site_parameters`` attribute.
+    """
+
+    SITE_ARRAYS = ("positions", "kinds", "atoms", "equivalence", "unique")
+
+    @classmethod
+    def from_support(cls, support, **kwargs):
+        """Enumerate the sites of a slab.
+
+        :param support: :class:`~aiida_cattools.data.support.Support` (or any
+            ``StructureData``) with the surface normal along z
+        :param kwargs: parameters passed to
+            :func:`~aiida_cattools.utils.geometry.find_sites`
+        :returns: an unstored :class:`ActiveSite` with the structure of ``support``
+        """
+        node = cls(cell=support.cell, pbc=support.pbc)
+        for kind in support.kinds:
+            node.append_kind(kind)
+        for site in support.sites:
+            node.append_site(site)
+
+        names = support.get_site_kindnames()
+        _, numbers = np.unique(names, return_inverse=True)
+        positions = np.array([site.position for site in support.sites])
+        node.set_sites(find_sites(positions, numbers, support.cell, **kwargs))
+        node.base.attributes.set("site_parameters", kwargs)
+        return node
+
+    def set_sites(self, sites):
+        """Store the site arrays in the repository of the (unstored) node.
+
+        :param sites: dictionary of arrays as returned by
+            :func:`~aiida_cattools.utils.geometry.find_sites`
+        """
+        for name in self.SITE_ARRAYS:
+            handle = io.BytesIO()
+            np.save(handle, sites[name], allow_pickle=False)
+            handle.seek(0)
+            self.base.repository.put_object_from_filelike(handle, f"{name}.npy")
+        self._sites = {name: sites[name] for name in self.SITE_ARRAYS}
+
+    def get_sites(self):
+        """Return the dictionary of site arrays, loading them only once."""
+        sites = getattr(self, "_sites", None)
+        if sites is None:
+            sites = {}
+            for name in self.SITE_ARRAYS:
+                with self.base.repository.open(f"{name}.npy", "rb") as handle:
+                    sites[name] = np.load(handle, allow_pickle=False)
+            self._sites = sites
+        return sites
+
+    def get_unique_sites(self):
+        """Return the site arrays restricted to one site per equivalence group."""
+        sites = self.get_sites()
+        return {
+            name: values[sites["unique"]]
+            for name, values in sites.items()
+            if name != "unique"
+        }
 
-class ActiveSite(StructureData):
-    pass
+    def get_site_kinds(self):
+        """Return the kind (``top``, ``bridge``, ``fcc``, ...) of every site."""
+        return np.array(SITE_KINDS)[self.get_sites()["kinds"]]
@@ -1,5 +1,102 @@
+import numpy as np
+
 from aiida.orm import StructureData
+from aiida.orm.nodes.data.structure import Site
+
+from ..utils.fingerprint import FingerprintMixin
+from ..utils.geometry import SITE_KINDS, iter_placements
+
+
+class Adsorbate(FingerprintMixin, StructureData):
+    """Molecule or fragment adsorbed on the sites of a slab.
+
+    The adsorbate binds to the surface through its ``anchor`` atom, stored as
+    an attribute (the first atom by default).
+    """
+
+    @property
+    def anchor(self):
+        """Index of the atom bonded to the adsorption site."""
+        return self.base.attributes.get("anchor", 0)
+
+    @anchor.setter
+    def anchor(self, value):
+        if not 0 <= value < len(self.sites):
+            raise ValueError(f"anchor {value} is not the index of a site")
+        self.base.attributes.set("anchor", int(value))
+
+    def iter_placements(  # pylint: disable=too-many-arguments,too-many-locals
+        self,
+        active_site,
+        heights=(2.0,),
+        angles=6,
+        tilts=(0.0,),
+        min_distance=1.5,
+        unique=True,
+        structure_class=StructureData,
+    ):
+        """Lazily generate the structures of the adsorbate on a slab.
+
+        The candidates are built one at a time, in the order of the sites, so
+        that they can be streamed into a filter without holding them all in
+        memory. Every structure has a ``placement`` attribute with the site
+        index and kind, the height and the orientation of the adsorbate.
+
+        :param active_site: :class:`~aiida_cattools.data.active_site.ActiveSite`
+            or :class:`~aiida_cattools.data.support.Support` (whose sites are
+            enumerated with the default parameters)
+        :param heights: heights (in Angstrom) of the anchor above the sites
+        :param angles: number of rotations about the surface normal
+        :param tilts: tilt angles (in degrees) away from the surface normal
+        :param min_distance: minimum distance between atoms of a candidate
+        :param unique: only use one site of every group of equivalent sites
+        :param structure_class: ``StructureData`` subclass of the candidates
+        :returns: generator of unstored ``structure_class`` nodes
+        """
+        if not hasattr(active_site, "get_sites"):
+            active_site = active_site.get_active_sites()
+        sites = active_site.get_sites()
+        indices = sites["unique"] if unique else np.arange(len(sites["kinds"]))
 
+        kinds = {kind.name: kind for kind in active_site.kinds}
+        for kind in self.kinds:
+            if kind.name in kinds and not kinds[kind.name].compare_with(kind)[0]:
+                raise ValueError(
+                    f"kind '{kind.name}' of the adsorbate differs from the slab one"
+                )
+            kinds.setdefault(kind.name, kind)
+        slab_sites = active_site.sites
+        names = self.get_site_kindnames()
+        positions = np.array([site.position for site in slab_sites])
 
-class Adsorbate(StructureData):
-    pass
+        placements = iter_placements(
+            np.array([site.position for site in self.sites]),
+            sites["positions"][indices],
+            positions,
+            active_site.cell,
+            anchor=self.anchor,
+            heights=heights,
+            angles=angles,
+            tilts=tilts,
+            min_distance=min_distance,
+        )
+        for index, height, azimuth, tilt, adsorbed in placements:
+            site = int(indices[index])
+            node = structure_class(cell=active_site.cell, pbc=active_site.pbc)
+            for kind in kinds.values():
+                node.append_kind(kind)
+            for slab_site in slab_sites:
+                node.append_site(slab_site)
+            for name, position in zip(names, adsorbed):
+                node.append_site(Site(kind_name=name, position=position.tolist()))
+            node.base.attributes.set(
+                "placement",
+                {
+                    "site": site,
+                    "site_kind": SITE_KINDS[sites["kinds"][site]],
+                    "height": float(height),
+                    "azimuth": float(azimuth),
+                    "tilt": float(tilt),
+                },
+            )
+            yield node
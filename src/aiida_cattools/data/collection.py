@@ -1,20 +1,715 @@
+from dataclasses import MISSING, fields
+import json
+from pathlib import Path
+
+import numpy as np
 import pandas as pd
 
-from aiida.orm import StructureData
+from aiida.common import timezone
+from aiida.manage import get_manager
+from aiida.orm import Dict, Group, QueryBuilder, WorkflowNode
+from aiida.orm.entities import EntityTypes
+
+from ..utils.getters import (
+    ENERGY_OUTPUTS,
+    QUERY_BATCH_SIZE,
+    SMEARING_OUTPUTS,
+    get_energies_from_pks,
+)
+from ..utils.harvest import MAX_CONCURRENCY, harvest_energies
+from ..utils.instrument import instrumented
+from ..utils.references import ReferenceEnergies, count_atoms
+from .group import CollectionGroup
+from .simulation import (
+    ENERGY_EXTRA,
+    EXTRAS_PREFIX,
+    FIELD_NAMES,
+    METADATA_FIELDS,
+    WORKFLOW_PROCESS_TYPE_PREFIX,
+    Simulation,
+    workchain_entry_point,
+)
+
+# Column dtypes of the ``Simulation`` fields. Repeated labels (facets, metals,
+# sites, functionals...) are stored as categoricals, which keeps the memory
+# footprint of large screening sets low and makes groupby operations fast.
+COLUMN_DTYPES = {
+    "global_uuid": "string",
+    "label": "string",
+    "wc_pk": "int64",
+    "comment": "string",
+    "former_path": "string",
+    "chem_formula": "category",
+    "surf_facet": "category",
+    "active_metal": "category",
+    "site_subst": "bool",
+    "vacancy": "bool",
+    "ads_site": "category",
+    "ads_formula": "category",
+    "functional": "category",
+    "wc_type": "category",
+    "wc_status": "category",
+    "final_energy": "float64",
+    "site_mos": "int64",
+}
+
+# Creation and modification times of the workchain node of every row, used to
+# refresh a snapshot incrementally.
+NODE_COLUMNS = {
+    "ctime": "datetime64[ns, UTC]",
+    "mtime": "datetime64[ns, UTC]",
+}
+
+# Columns read from the workchain nodes by ``Collection.iter_workchains``, and
+# the fields ``Collection.query`` filters on in the database: those of the node
+# itself and the metadata stored as extras by ``Collection.store_metadata``. The
+# final energy is read from the extras too, and from the outputs if not stored.
+WORKCHAIN_COLUMNS = {
+    "global_uuid": "uuid",
+    "wc_pk": "id",
+    "label": "label",
+    "comment": "description",
+    "wc_type": "process_type",
+    "wc_status": "attributes.process_state",
+    "ctime": "ctime",
+    "mtime": "mtime",
+    **{name: f"extras.{EXTRAS_PREFIX}{name}" for name in METADATA_FIELDS},
+    "final_energy": f"extras.{ENERGY_EXTRA}",
+}
+WORKCHAIN_PROJECTIONS = list(WORKCHAIN_COLUMNS.values())
+
+# Attributes of the output dictionaries (see ``ENERGY_OUTPUTS``) that the
+# filters of ``Collection.query`` on the final energy apply to.
+ENERGY_ATTRIBUTES = ["attributes." + ".".join(path) for path in ENERGY_OUTPUTS.values()]
+SMEARING_ATTRIBUTES = [
+    "attributes." + ".".join(path) for path in SMEARING_OUTPUTS.values()
+]
+
+# Defaults of the ``Simulation`` fields that have one (all but ``global_uuid``).
+_DEFAULTS = {f.name: f.default for f in fields(Simulation) if f.default is not MISSING}
+
+# Key of the collection metadata in the schema of the Parquet snapshots.
+SNAPSHOT_METADATA_KEY = b"aiida_cattools"
+
+# Columns that identify the clean slab an adsorbed configuration belongs to.
+SLAB_KEYS = (
+    "chem_formula",
+    "surf_facet",
+    "active_metal",
+    "site_subst",
+    "vacancy",
+    "functional",
+)
 
 
 class Collection:
-    # ? Inherit from pd.DataFrame? Or AiiDA group? Or create dataclass?
-    # ? Container of multiple simulations.
-    def __init__():
-        pass
+    """Columnar container of multiple simulations.
+
+    The fields of the contained :class:`Simulation` records are stored as typed
+    columns of a :class:`pandas.DataFrame` (see ``COLUMN_DTYPES``), so that the
+    usual analyses on a screening set are vectorized operations instead of
+    Python loops over dataclass instances.
+    """
+
+    def __init__(self, df=None, snapshot_time=None):
+        """
+        :param df: dataframe with one row per simulation and (a subset of) the
+            ``Simulation`` fields as columns. Missing columns are filled in
+            with the ``Simulation`` defaults.
+        :type df: :class:`pandas.DataFrame`
+        :param snapshot_time: time at which the rows were last synchronized
+            with the database, ``None`` if they never were
+        :type snapshot_time: :class:`datetime.datetime`
+        """
+        if df is None:
+            df = pd.DataFrame(columns=list(COLUMN_DTYPES))
+        self._df = _normalize(df)
+        self.snapshot_time = (
+            None if snapshot_time is None else pd.Timestamp(snapshot_time)
+        )
+
+    def __len__(self):
+        return len(self._df)
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}: {len(self)} simulations>"
+
+    @property
+    def df(self):
+        """The underlying :class:`pandas.DataFrame` (not a copy)."""
+        return self._df
+
+    @classmethod
+    def from_df(cls, df):
+        """Create a collection from a dataframe of ``Simulation`` fields."""
+        return cls(df)
+
+    def to_df(self):
+        """Return a copy of the data as a :class:`pandas.DataFrame`."""
+        return self._df.copy()
+
+    @classmethod
+    def from_simulations(cls, simulations):
+        """Create a collection from an iterable of :class:`Simulation`."""
+        rows = [sim.to_row() for sim in simulations]
+        columns = dict(zip(FIELD_NAMES, zip(*rows))) if rows else {}
+        return cls(pd.DataFrame(columns))
+
+    def to_simulations(self):
+        """Return the rows of the collection as a list of :class:`Simulation`."""
+        df = self._df[list(FIELD_NAMES)]
+        df = df.astype(object).where(df.notna(), None)
+        df["former_path"] = df["former_path"].map(Path)
+        return [
+            Simulation.from_row(row) for row in df.itertuples(index=False, name=None)
+        ]
+
+    @classmethod
+    @instrumented
+    def iter_workchains(cls, group=None, filters=None, chunk_size=QUERY_BATCH_SIZE):
+        """Stream workchains from the database as collections of ``chunk_size`` rows.
+
+        The nodes are read with a single query that only projects the needed
+        columns, and the final energies that are not stored as extras (see
+        :meth:`store_metadata`) with one more query per chunk, so that
+        arbitrarily many workchains can be exported with bounded memory.
 
-    def from_df():
-        pass
+        :param group: only include the workchains in this :class:`aiida.orm.Group`
+        :param filters: additional ``QueryBuilder`` filters on the workchains
+        :param chunk_size: number of rows per yielded collection
+        :returns: generator of :class:`Collection`
+        """
+        qb = _workchain_query(group, filters, WORKCHAIN_PROJECTIONS)
+        for rows in _iter_batches(qb, chunk_size):
+            yield cls._from_workchain_rows(rows)
 
-    def to_df():
-        pass
+    @classmethod
+    @instrumented
+    def from_workchains(cls, group=None, filters=None, chunk_size=QUERY_BATCH_SIZE):
+        """Create a collection of workchains from the database.
+
+        See :meth:`iter_workchains` for the parameters.
+        """
+        chunks = [chunk.df for chunk in cls.iter_workchains(group, filters, chunk_size)]
+        if not chunks:
+            return cls()
+        return cls(pd.concat(chunks, ignore_index=True), snapshot_time=timezone.now())
+
+    @classmethod
+    @instrumented
+    def query(cls, filters=None, columns=None, group=None, chunk_size=QUERY_BATCH_SIZE):
+        """Select the workchains whose ``Simulation`` fields match filters.
+
+        The filters are translated into a single ``QueryBuilder`` query, e.g.::
+
+            Collection.query(
+                {
+                    "active_metal": "Pt",
+                    "surf_facet": {"in": ["111", "100"]},
+                    "final_energy": {">": -300, "<": -100},
+                },
+                columns=["ads_formula", "final_energy"],
+            )
+
+        The fields of the workchain node (label, state, type...) and the
+        metadata persisted as extras by :meth:`store_metadata` are filtered on
+        the node, and a filter on ``final_energy`` joins the output dictionary
+        of the workchain (see ``ENERGY_OUTPUTS``) in the same query; for
+        Quantum ESPRESSO outputs, it applies to their free energy, which is
+        within half the smearing contribution of the final energy (see
+        ``SMEARING_OUTPUTS``). As the energies parsed from the retrieved files
+        are only stored as extras, a second query selects the workchains whose
+        stored energy matches, and a workchain is included if either of its
+        energies does. Workchains
+        whose metadata was never stored do not match filters on it.
+
+        :param filters: mapping of field names to a value or to a dictionary
+            of ``QueryBuilder`` operators, e.g. ``{"like": "Pt%"}``
+        :param columns: only fetch these fields (and ``wc_pk``), the others
+            get the ``Simulation`` defaults; all of them by default
+        :param group: only include the workchains in this :class:`aiida.orm.Group`
+        :param chunk_size: number of rows fetched per batch
+        :raises ValueError: if a filter or column is not a ``Simulation`` field
+        """
+        filters = dict(filters or {})
+        columns = list(FIELD_NAMES if columns is None else columns)
+        unknown = sorted(set(filters).union(columns).difference(FIELD_NAMES))
+        if unknown:
+            raise ValueError(
+                f"Unknown fields {unknown}, valid fields are {FIELD_NAMES}"
+            )
+
+        energy_filter = filters.pop("final_energy", None)
+        node_filters = {
+            WORKCHAIN_COLUMNS[name]: _convert_filter(name, condition)
+            for name, condition in filters.items()
+        }
+        names = ["wc_pk"] + [
+            c for c in columns if c in WORKCHAIN_COLUMNS and c != "wc_pk"
+        ]
+        qb = _workchain_query(
+            group, node_filters, [WORKCHAIN_COLUMNS[name] for name in names]
+        )
+        queries = [(qb, names)]
+        if energy_filter is not None:
+            qb.append(
+                Dict,
+                with_incoming="workchain",
+                edge_filters={"label": {"in": list(ENERGY_OUTPUTS)}},
+                filters={"or": [{key: energy_filter} for key in ENERGY_ATTRIBUTES]},
+                project=ENERGY_ATTRIBUTES + SMEARING_ATTRIBUTES,
+            )
+            queries = [
+                (
+                    qb,
+                    names
+                    + [f"final_energy_{label}" for label in ENERGY_OUTPUTS]
+                    + [f"smearing_{label}" for label in SMEARING_OUTPUTS],
+                )
+            ]
+            stored = [name for name in names if name != "final_energy"]
+            stored.append("final_energy")
+            node_filters[WORKCHAIN_COLUMNS["final_energy"]] = energy_filter
+            qb = _workchain_query(
+                group, node_filters, [WORKCHAIN_COLUMNS[name] for name in stored]
+            )
+            queries.append((qb, stored))
+
+        chunks = [
+            cls._from_workchain_rows(rows, projected, "final_energy" in columns).df
+            for query, projected in queries
+            for rows in _iter_batches(query, chunk_size)
+        ]
+        if not chunks:
+            return cls()
+        df = pd.concat(chunks, ignore_index=True)
+        if len(queries) > 1:
+            df = df.drop_duplicates("wc_pk").sort_values("wc_pk", ignore_index=True)
+        return cls(df, snapshot_time=timezone.now())
+
+    @classmethod
+    def _from_workchain_rows(cls, rows, columns=tuple(WORKCHAIN_COLUMNS), energy=True):
+        """Build a collection from rows projected from ``WORKCHAIN_COLUMNS``.
+
+        :param rows: rows of values of ``columns``, possibly followed by the
+            ``final_energy_<label>`` of every output in ``ENERGY_OUTPUTS`` and
+            the ``smearing_<label>`` of every output in ``SMEARING_OUTPUTS``
+        :param columns: names of the projected columns
+        :param energy: whether to set the final energies, with one more query
+            for those that are neither projected nor stored as extras
+        """
+        df = pd.DataFrame(rows, columns=list(columns))
+        for name in METADATA_FIELDS:
+            if name in df.columns:
+                default = str(Path()) if name == "former_path" else _DEFAULTS[name]
+                df[name] = df[name].astype(object).where(df[name].notna(), default)
+        if "wc_type" in df.columns:
+            df["wc_type"] = df["wc_type"].map(workchain_entry_point)
+        if "wc_status" in df.columns:
+            df["wc_status"] = df["wc_status"].fillna("")
+
+        projected = [f"final_energy_{label}" for label in ENERGY_OUTPUTS]
+        if projected[0] in df.columns:
+            smearing = [f"smearing_{label}" for label in SMEARING_OUTPUTS]
+            for label, column in zip(SMEARING_OUTPUTS, smearing):
+                energy = pd.to_numeric(df[f"final_energy_{label}"])
+                df[f"final_energy_{label}"] = energy - 0.5 * pd.to_numeric(
+                    df[column]
+                ).fillna(0.0)
+            df["final_energy"] = df[projected].bfill(axis=1).iloc[:, 0]
+            df = df.drop(columns=projected + smearing)
+        elif energy:
+            stored = pd.to_numeric(
+                df.get("final_energy", pd.Series(np.nan, index=df.index))
+            )
+            missing = df.loc[stored.isna(), "wc_pk"].tolist()
+            if missing:
+                energies, _ = get_energies_from_pks(missing)
+                stored = stored.fillna(df["wc_pk"].map(energies))
+            df["final_energy"] = stored
+        if "final_energy" in df.columns:
+            df["final_energy"] = df["final_energy"].astype(float).fillna(0.0)
+        return cls(df)
+
+    @instrumented
+    def store_metadata(self, batch_size=QUERY_BATCH_SIZE):
+        """Persist the metadata of the rows as extras of their workchain nodes.
+
+        The ``METADATA_FIELDS`` of every row are stored as the top-level extras
+        ``cattools_<field>`` of the workchain with PK ``wc_pk``, which
+        :meth:`query` can then filter on, and so is the ``final_energy`` if it
+        is not 0 (a stored energy is kept otherwise). The other extras of the nodes are
+        kept: they are read with one query per batch, and all the nodes are
+        updated with bulk updates in a single transaction instead of one
+        ``set_many`` per node.
+
+        :param batch_size: maximum number of PKs per query
+        :returns: the PKs of the updated workchains
+        :rtype: list
+        """
+        df = self._df[self._df["wc_pk"] != 0].drop_duplicates("wc_pk", keep="last")
+        values = df[list(METADATA_FIELDS)].astype(object)
+        values["former_path"] = values["former_path"].map(str)
+        values = values.where(values.notna(), None)
+        metadata = {
+            pk: {
+                EXTRAS_PREFIX + name: value for name, value in zip(METADATA_FIELDS, row)
+            }
+            for pk, row in zip(
+                df["wc_pk"].tolist(), values.itertuples(index=False, name=None)
+            )
+        }
+        energies = df["final_energy"].astype(float)
+        for pk, energy in zip(df["wc_pk"].tolist(), energies.tolist()):
+            if energy and not np.isnan(energy):
+                metadata[pk][ENERGY_EXTRA] = energy
+        pks = list(metadata)
+
+        storage = get_manager().get_profile_storage()
+        updated = []
+        with storage.transaction():
+            for start in range(0, len(pks), batch_size):
+                qb = QueryBuilder()
+                qb.append(
+                    WorkflowNode,
+                    filters={"id": {"in": pks[start : start + batch_size]}},
+                    project=["id", "extras"],
+                )
+                rows = [
+                    {"id": pk, "extras": {**(extras or {}), **metadata[pk]}}
+                    for pk, extras in qb.iterall()
+                ]
+                storage.bulk_update(EntityTypes.NODE, rows)
+                updated += [row["id"] for row in rows]
+        return sorted(updated)
+
+    def to_group(self, label, batch_size=QUERY_BATCH_SIZE):
+        """Persist the collection as a group of its workchains.
+
+        See :meth:`~aiida_cattools.data.group.CollectionGroup.add_collection`.
+
+        :param label: label of the group, which is created if it does not exist
+        :param batch_size: maximum number of PKs per query
+        :returns: :class:`~aiida_cattools.data.group.CollectionGroup`
+        """
+        group, _ = CollectionGroup.collection.get_or_create(label=label)
+        group.add_collection(self, batch_size=batch_size)
+        return group
 
     # ? to_csv and from_csv should be done outside from df class.
 
-    pass
+    def to_parquet(self, path, compression="zstd"):
+        """Write a snapshot of the collection to a Parquet file.
+
+        The snapshot time is stored in the file metadata, so that a collection
+        loaded with :meth:`from_parquet` can be brought up to date with
+        :meth:`refresh`.
+
+        :param path: path of the Parquet file
+        :param compression: compression codec passed to ``pyarrow``
+        """
+        import pyarrow as pa  # pylint: disable=import-outside-toplevel
+        import pyarrow.parquet as pq  # pylint: disable=import-outside-toplevel
+
+        table = pa.Table.from_pandas(self._df, preserve_index=False)
+        snapshot_time = self.snapshot_time
+        metadata = {
+            "snapshot_time": None
+            if snapshot_time is None
+            else snapshot_time.isoformat()
+        }
+        table = table.replace_schema_metadata(
+            {**table.schema.metadata, SNAPSHOT_METADATA_KEY: json.dumps(metadata)}
+        )
+        pq.write_table(table, path, compression=compression)
+
+    @classmethod
+    def from_parquet(cls, path, columns=None, memory_map=True):
+        """Load a snapshot written by :meth:`to_parquet`.
+
+        :param path: path of the Parquet file
+        :param columns: only read these columns (all by default)
+        :param memory_map: memory-map the file instead of reading it in memory
+        """
+        import pyarrow.parquet as pq  # pylint: disable=import-outside-toplevel
+
+        table = pq.read_table(path, columns=columns, memory_map=memory_map)
+        metadata = json.loads(
+            (table.schema.metadata or {}).get(SNAPSHOT_METADATA_KEY, b"{}")
+        )
+        return cls(table.to_pandas(), snapshot_time=metadata.get("snapshot_time"))
+
+    @instrumented
+    def refresh(self, group=None, batch_size=QUERY_BATCH_SIZE):
+        """Update the rows whose workchains were modified since the last snapshot.
+
+        Only the rows whose workchain node has a ``mtime`` later than
+        :attr:`snapshot_time` are updated (label, status, times and final
+        energy). A collection does not keep the filters it was queried with,
+        so new workchains are only picked up from a ``group``: its workchains
+        that are not in the collection yet are appended as new rows. Without
+        a group, the collection is never extended; re-run :meth:`query` (or
+        :meth:`~aiida_cattools.data.group.CollectionGroup.to_collection`) to
+        include the workchains created since.
+
+        :param group: :class:`aiida.orm.Group` (or its PK) the collection tracks
+        :param batch_size: maximum number of PKs per query
+        :returns: the PKs of the updated and of the new rows
+        :rtype: list
+        """
+        now = timezone.now()
+        since = self.snapshot_time
+        pks = self._df["wc_pk"].unique().tolist()
+
+        changed = []
+        for start in range(0, len(pks), batch_size):
+            filters = {"id": {"in": pks[start : start + batch_size]}}
+            if since is not None:
+                filters["mtime"] = {">": since.to_pydatetime()}
+            changed += _query_nodes(WorkflowNode, filters)
+
+        new = []
+        if group is not None:
+            qb = QueryBuilder()
+            qb.append(Group, filters={"id": getattr(group, "pk", group)}, tag="group")
+            qb.append(WorkflowNode, with_group="group", project=["id"])
+            new_pks = sorted(set(qb.all(flat=True)).difference(pks))
+            for start in range(0, len(new_pks), batch_size):
+                filters = {"id": {"in": new_pks[start : start + batch_size]}}
+                new += _query_nodes(WorkflowNode, filters)
+
+        updates = pd.DataFrame(
+            changed + new, columns=["wc_pk", "label", "wc_status", "ctime", "mtime"]
+        )
+        energies, _ = get_energies_from_pks(updates["wc_pk"], batch_size=batch_size)
+        updates["final_energy"] = updates["wc_pk"].map(energies)
+
+        df = self._df.astype({"label": object, "wc_status": object})
+        if changed:
+            known = updates[: len(changed)].set_index("wc_pk")
+            mask = df["wc_pk"].isin(known.index)
+            for column in known.columns:
+                values = df.loc[mask, "wc_pk"].map(known[column])
+                if column == "final_energy":
+                    values = values.fillna(df.loc[mask, column])
+                df.loc[mask, column] = values
+        if new:
+            df = pd.concat([df, _normalize(updates[len(changed) :])], ignore_index=True)
+
+        self._df = _normalize(df)
+        self.snapshot_time = pd.Timestamp(now)
+        return updates["wc_pk"].tolist()
+
+    @instrumented
+    def harvest_energies(self, max_concurrency=MAX_CONCURRENCY, executor=None):
+        """Set the final energies, parsing the retrieved files concurrently if needed.
+
+        Unlike :meth:`refresh`, the energies of the workchains without energy
+        output are read from the files retrieved by their last calculation
+        (see :func:`~aiida_cattools.utils.harvest.iter_energies`). The rows
+        without an energy keep their current ``final_energy``.
+
+        :param max_concurrency: maximum number of files read or parsed at once
+        :param executor: :class:`concurrent.futures.Executor` parsing the files
+        :returns: mapping of the ``wc_pk`` without energy to the reason why
+        :rtype: dict
+        """
+        pks = self._df.loc[self._df["wc_pk"] != 0, "wc_pk"].unique().tolist()
+        energies, missing = harvest_energies(pks, max_concurrency, executor)
+        values = self._df["wc_pk"].map(energies)
+        self._df["final_energy"] = values.fillna(self._df["final_energy"])
+        return missing
+
+    def groupby(self, by=("surf_facet", "active_metal", "ads_site"), **kwargs):
+        """Group the simulations, e.g. by facet, metal and adsorption site.
+
+        :param by: column name or sequence of column names
+        :returns: :class:`pandas.core.groupby.DataFrameGroupBy`
+        """
+        if not isinstance(by, str):
+            by = list(by)
+        kwargs.setdefault("observed", True)
+        return self._df.groupby(by, **kwargs)
+
+    def adsorption_energies(self, references, slab_keys=SLAB_KEYS):
+        """Compute E_slab+ads - E_slab - sum(E_ref) for every adsorbed system.
+
+        Each row with a non-empty ``ads_formula`` is matched to the clean slab
+        (row with an empty ``ads_formula``) that shares the ``slab_keys``
+        columns, with a single merge for the whole collection. If a clean slab
+        was computed more than once, its lowest energy is the reference, so
+        the result does not depend on the order of the rows.
+
+        :param references: :class:`~aiida_cattools.utils.references.ReferenceEnergies`
+            (matched on the ``functional`` of every row), mapping from
+            ``ads_formula`` to the sum of the reference energies of the
+            adsorbate, or a :class:`pandas.Series` indexed by ``ads_formula``
+        :param slab_keys: columns that identify the clean slab of a row
+        :returns: adsorption energies indexed like the collection, NaN for
+            clean slabs and for rows without a slab or reference energy
+        :rtype: :class:`pandas.Series`
+        """
+        df = self._df
+        slab_keys = list(slab_keys)
+        is_clean = df["ads_formula"].astype("string").fillna("") == ""
+
+        slabs = (
+            df.loc[is_clean]
+            .groupby(slab_keys, observed=True, dropna=False)["final_energy"]
+            .min()
+            .rename("slab_energy")
+            .reset_index()
+        )
+        adsorbed = df.loc[~is_clean, slab_keys + ["ads_formula", "final_energy"]]
+        # slabs are unique on the keys, so the left merge keeps the row order
+        merged = adsorbed.merge(slabs, on=slab_keys, how="left")
+        merged.index = adsorbed.index
+
+        if isinstance(references, ReferenceEnergies):
+            ref_energy = references.get_energies(
+                merged["ads_formula"], df.loc[adsorbed.index, "functional"]
+            )
+        else:
+            ref_energy = (
+                merged["ads_formula"]
+                .astype(object)
+                .map(pd.Series(references, dtype=float))
+            )
+        energies = merged["final_energy"] - merged["slab_energy"] - ref_energy
+
+        result = pd.Series(np.nan, index=df.index, name="ads_energy")
+        result.loc[energies.index] = energies.to_numpy(dtype=float)
+        return result
+
+    def formation_energies(self, references, per_atom=False):
+        """Compute E - sum(n_i mu_i) over the atoms of the substrate and adsorbate.
+
+        The composition of every row is the sum of its ``chem_formula`` and
+        ``ads_formula``, and the chemical potentials ``mu_i`` are those of its
+        ``functional``, all from a single matrix product per column.
+
+        :param references: :class:`~aiida_cattools.utils.references.ReferenceEnergies`
+        :param per_atom: divide the energies by the number of atoms
+        :returns: formation energies indexed like the collection, NaN for rows
+            with elements or functionals without reference
+        :rtype: :class:`pandas.Series`
+        """
+        df = self._df
+        functionals = df["functional"]
+        energies = (
+            df["final_energy"].to_numpy(dtype=float)
+            - references.get_energies(df["chem_formula"], functionals)
+            - references.get_energies(df["ads_formula"], functionals)
+        )
+        if per_atom:
+            atoms = count_atoms(df["chem_formula"]) + count_atoms(df["ads_formula"])
+            with np.errstate(divide="ignore", invalid="ignore"):
+                energies = np.where(atoms > 0, energies / atoms, np.nan)
+        return pd.Series(energies, index=df.index, name="formation_energy")
+
+    def min_energy_sites(
+        self,
+        by=("chem_formula", "surf_facet", "active_metal", "ads_formula"),
+        energies=None,
+    ):
+        """Select the most stable row (e.g. adsorption site) of every group.
+
+        :param by: columns that define the groups
+        :param energies: energies to minimize, indexed like the collection;
+            defaults to the ``final_energy`` column. Rows with a NaN energy
+            (e.g. the clean slabs of :meth:`adsorption_energies`) are ignored.
+        :type energies: :class:`pandas.Series`
+        :returns: a new collection with one row per group
+        """
+        df = self._df
+        if energies is None:
+            energies = df["final_energy"]
+        energies = energies.dropna()
+        keys = [df.loc[energies.index, key] for key in by]
+        idx = energies.groupby(keys, observed=True).idxmin()
+        return self.__class__(df.loc[idx.to_numpy()])
+
+
+def _workchain_query(group, filters, projections):
+    """Return the query of the workchains, tagged ``workchain``, ordered by PK."""
+    qb = QueryBuilder()
+    if group is not None:
+        qb.append(Group, filters={"id": getattr(group, "pk", group)}, tag="group")
+    qb.append(
+        WorkflowNode,
+        filters=filters or {},
+        project=projections,
+        tag="workchain",
+        **({"with_group": "group"} if group is not None else {}),
+    )
+    qb.order_by({"workchain": {"id": "asc"}})
+    return qb
+
+
+def _iter_batches(qb, batch_size):
+    """Yield the rows of a query as lists of (at most) ``batch_size`` rows."""
+    rows = []
+    for row in qb.iterall(batch_size=batch_size):
+        rows.append(row)
+        if len(rows) == batch_size:
+            yield rows
+            rows = []
+    if rows:
+        yield rows
+
+
+def _convert_filter(name, condition):
+    """Convert the values of a ``Collection.query`` filter to those in the database.
+
+    Workchain types are stored as process types, and paths as strings; the
+    values nested in dictionaries of operators and in lists are converted too.
+    """
+    if isinstance(condition, dict):
+        return {key: _convert_filter(name, value) for key, value in condition.items()}
+    if isinstance(condition, (list, tuple)):
+        return [_convert_filter(name, value) for value in condition]
+    if name == "wc_type":
+        return WORKFLOW_PROCESS_TYPE_PREFIX + workchain_entry_point(condition)
+    if name == "former_path":
+        return str(condition)
+    return condition
+
+
+def _query_nodes(entity_type, filters):
+    """Project the columns refreshed from the database for the matching nodes."""
+    qb = QueryBuilder()
+    qb.append(
+        entity_type,
+        filters=filters,
+        project=["id", "label", "attributes.process_state", "ctime", "mtime"],
+    )
+    return [
+        dict(zip(("wc_pk", "label", "wc_status", "ctime", "mtime"), row))
+        for row in qb.iterall()
+    ]
+
+
+def _normalize(df):
+    """Fill in missing columns with the defaults and enforce the dtypes."""
+    df = df.copy()
+    for name, dtype in NODE_COLUMNS.items():
+        if name not in df.columns:
+            df[name] = pd.NaT
+        df[name] = pd.to_datetime(df[name], utc=True).astype(dtype)
+    for field in fields(Simulation):
+        if field.name in df.columns:
+            continue
+        if field.default is MISSING:
+            df[field.name] = [field.default_factory() for _ in range(len(df))]
+        else:
+            df[field.name] = field.default
+    for name, dtype in COLUMN_DTYPES.items():
+        column = df[name]
+        if name == "wc_type":
+            column = column.map(workchain_entry_point)
+        elif name == "former_path":
+            column = column.map(str)
+        elif dtype == "bool":
+            column = column.fillna(False).map(bool)
+        df[name] = column.astype(dtype)
+    return df
@@ -0,0 +1,163 @@
+"""Persistent collections of workchains, backed by AiiDA groups."""
+from aiida.common.exceptions import ModificationNotAllowed
+from aiida.manage import get_manager
+from aiida.orm import Group, QueryBuilder, WorkflowNode
+from aiida.orm.entities import EntityTypes
+
+from ..utils.getters import QUERY_BATCH_SIZE
+from ..utils.instrument import instrumented
+
+
+class CollectionGroup(Group):
+    """Group of the workchains of a persistent collection.
+
+    The ``add_nodes`` and ``remove_nodes`` methods of :class:`aiida.orm.Group`
+    need loaded nodes, and remove them with one statement per node. Here, the
+    members are given as PKs (or nodes), and thousands of them are added or
+    removed in a single transaction, with one query and one statement per
+    batch. The metadata of the simulations is stored as extras of the
+    workchains, so that the whole collection is read back with a single query
+    joining the group and its workchains.
+
+    Usage::
+
+        group, _ = CollectionGroup.collection.get_or_create(label="screening")
+        group.add_collection(collection)
+        collection = group.to_collection()
+    """
+
+    @instrumented
+    def add_workchains(self, workchains, batch_size=QUERY_BATCH_SIZE):
+        """Add workchains to the group in a single transaction.
+
+        :param workchains: iterable of workchain nodes or PKs
+        :param batch_size: maximum number of PKs per query
+        :returns: the PKs of the workchains that were not in the group yet
+        :rtype: list
+        :raises ValueError: if a PK is not the one of a workflow node, in
+            which case no workchain is added
+        """
+        self._check_stored()
+        pks = _unique_pks(workchains)
+        storage = get_manager().get_profile_storage()
+        added = []
+        with storage.transaction():
+            for start in range(0, len(pks), batch_size):
+                batch = pks[start : start + batch_size]
+                unknown = set(batch).difference(_workflow_pks(batch))
+                if unknown:
+                    raise ValueError(f"No workchains with PKs {sorted(unknown)}")
+                members = set(self._member_pks(batch))
+                new = [pk for pk in batch if pk not in members]
+                storage.bulk_insert(
+                    EntityTypes.GROUP_NODE,
+                    [{"dbgroup_id": self.pk, "dbnode_id": pk} for pk in new],
+                )
+                added += new
+        return added
+
+    @instrumented
+    def remove_workchains(self, workchains, batch_size=QUERY_BATCH_SIZE):
+        """Remove workchains from the group in a single transaction.
+
+        The SQLAlchemy storage backends (``core.psql_dos``, ``core.sqlite_dos``...)
+        expose the table of the group memberships, from which the members are
+        deleted with one statement per batch, without loading the nodes. With
+        the other backends, the members of every batch are loaded with one
+        query and removed with :meth:`aiida.orm.Group.remove_nodes`.
+
+        :param workchains: iterable of workchain nodes or PKs
+        :param batch_size: maximum number of PKs per statement
+        :returns: the PKs of the workchains that were in the group
+        :rtype: list
+        """
+        self._check_stored()
+        pks = _unique_pks(workchains)
+        storage = get_manager().get_profile_storage()
+        table = self._membership_table()
+        removed = []
+        with storage.transaction() as session:
+            for start in range(0, len(pks), batch_size):
+                members = self._member_pks(pks[start : start + batch_size])
+                if not members:
+                    continue
+                if table is not None:
+                    session.execute(
+                        table.delete().where(
+                            (table.c.dbgroup_id == self.pk)
+                            & table.c.dbnode_id.in_(members)
+                        )
+                    )
+                else:
+                    self.remove_nodes(_load_workflows(members))
+                removed += members
+        return removed
+
+    @instrumented
+    def add_collection(self, collection, batch_size=QUERY_BATCH_SIZE):
+        """Store the metadata of a collection and add its workchains to the group.
+
+        The metadata is stored first (see
+        :meth:`~aiida_cattools.data.collection.Collection.store_metadata`), and
+        the workchains are then added in a second transaction, as the
+        transactions of the storage backend cannot be nested.
+
+        :param collection: :class:`~aiida_cattools.data.collection.Collection`
+            whose rows have a ``wc_pk``
+        :returns: the PKs of the workchains that were not in the group yet
+        :rtype: list
+        """
+        self._check_stored()
+        pks = collection.store_metadata(batch_size=batch_size)
+        return self.add_workchains(pks, batch_size=batch_size)
+
+    def to_collection(self, filters=None, columns=None, chunk_size=QUERY_BATCH_SIZE):
+        """Read the workchains of the group as a collection.
+
+        The members and their fields are read with one query; only the final
+        energies that are not stored as extras need one more query per chunk.
+        See :meth:`~aiida_cattools.data.collection.Collection.query` for the
+        parameters.
+
+        :rtype: :class:`~aiida_cattools.data.collection.Collection`
+        """
+        from .collection import Collection  # pylint: disable=import-outside-toplevel
+
+        return Collection.query(filters, columns, group=self, chunk_size=chunk_size)
+
+    def _check_stored(self):
+        if not self.is_stored:
+            raise ModificationNotAllowed("the group has to be stored first")
+
+    def _membership_table(self):
+        """Return the membership table of a SQLAlchemy storage backend, or ``None``."""
+        model = getattr(self.backend_entity, "GROUP_NODE_CLASS", None)
+        return getattr(model, "__table__", None)
+
+    def _member_pks(self, pks):
+        """Return the PKs among ``pks`` of the nodes in the group."""
+        qb = QueryBuilder()
+        qb.append(Group, filters={"id": self.pk}, tag="group")
+        qb.append(
+            WorkflowNode,
+            with_group="group",
+            filters={"id": {"in": list(pks)}},
+            project=["id"],
+        )
+        return qb.all(flat=True)
+
+
+def _unique_pks(workchains):
+    return list(dict.fromkeys(int(getattr(wc, "pk", wc)) for wc in workchains))
+
+
+def _load_workflows(pks):
+    qb = QueryBuilder()
+    qb.append(WorkflowNode, filters={"id": {"in": list(pks)}})
+    return qb.all(flat=True)
+
+
+def _workflow_pks(pks):
+    qb = QueryBuilder()
+    qb.append(WorkflowNode, filters={"id": {"in": list(pks)}}, project=["id"])
+    return qb.all(flat=True)
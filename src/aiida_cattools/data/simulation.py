@@ -1,16 +1,48 @@
 import uuid
-from dataclasses import dataclass
+from dataclasses import dataclass, field, fields
 from pathlib import Path
 from pprint import pprint
-from typing import Optional, Union  # Protocol
+from typing import Optional  # Protocol
 
 from aiida.common.exceptions import NotExistentAttributeError
 from aiida.orm import load_node
 from aiida.orm.utils import OrmEntityLoader
-from aiida_quantumespresso.workflows.pw.relax import PwRelaxWorkChain
-from aiida_vasp.workchains.relax import RelaxWorkChain
+from aiida.plugins import WorkflowFactory
+from aiida.plugins.entry_point import get_entry_point_from_class
 
-from ..utils.getters import get_energy_from_pk
+from ..utils.getters import get_energies_from_pks, get_energy_from_pk
+
+# Supported workchain types: entry points in the ``aiida.workflows`` group, by
+# class name. The workchain classes are only loaded when needed (see
+# :meth:`Simulation.get_workchain_class`), as importing aiida-vasp and
+# aiida-quantumespresso takes seconds.
+WC_TYPES = {
+    "RelaxWorkChain": "vasp.relax",
+    "PwRelaxWorkChain": "quantumespresso.pw.relax",
+}
+WORKFLOW_PROCESS_TYPE_PREFIX = "aiida.workflows:"
+
+# Fields that are not stored by the workchain node itself (as its label, PK,
+# state...) nor by its outputs (final energy). They are persisted as top-level
+# extras ``cattools_<field>`` of the workchain (see :meth:`Simulation.to_extras`),
+# so that a filter on one of them is a single JSON lookup in the database.
+METADATA_FIELDS = (
+    "former_path",
+    "chem_formula",
+    "surf_facet",
+    "active_metal",
+    "site_subst",
+    "vacancy",
+    "ads_site",
+    "ads_formula",
+    "functional",
+    "site_mos",
+)
+EXTRAS_PREFIX = "cattools_"
+# The final energy is stored too, when there is one (not 0), so that the rows
+# of a collection can be read back without querying the outputs of every
+# workchain, nor parsing again the files of those without energy output.
+ENERGY_EXTRA = EXTRAS_PREFIX + "final_energy"
 
 # ? Should this inherit from any AiiDA data type at all?
 # ? Should this contain the catalyst/chemistry specifications
@@ -42,12 +74,38 @@ from ..utils.getters import get_energy_from_pk
 ]
 
 
+def _slotted(cls):
+    """Recreate a dataclass with ``__slots__`` instead of a per-instance ``__dict__``.
+
+    Equivalent to ``@dataclass(slots=True)``, which is only available from
+    Python 3.10 on. The field defaults are kept by the generated ``__init__``.
+    """
+    names = tuple(f.name for f in fields(cls))
+    namespace = {
+        key: value
+        for key, value in cls.__dict__.items()
+        if key not in names + ("__dict__", "__weakref__")
+    }
+    namespace["__slots__"] = names
+    qualname = getattr(cls, "__qualname__", None)
+    cls = type(cls)(cls.__name__, cls.__bases__, namespace)
+    if qualname is not None:
+        cls.__qualname__ = qualname
+    return cls
+
+
+@_slotted
 @dataclass
 class Simulation:
-    """Dataclass that compiles all the data associated with a simulation."""
+    """Dataclass that compiles all the data associated with a simulation.
+
+    Instances use ``__slots__``, as hundreds of thousands of them are held in
+    memory for screening sets; :meth:`to_row` and :meth:`from_row` convert them
+    to and from the rows of a :class:`~aiida_cattools.data.collection.Collection`.
+    """
 
     # ? General data
-    global_uuid: Optional[str] = str(uuid.uuid4())
+    global_uuid: Optional[str] = field(default_factory=lambda: str(uuid.uuid4()))
     label: Optional[str] = ""
     wc_pk: Optional[int] = 0
     comment: Optional[str] = ""
@@ -57,14 +115,14 @@ class Simulation:
     chem_formula: Optional[str] = ""
     surf_facet: Optional[str] = ""
     active_metal: Optional[str] = ""  # Possibly instance of mendeleev
-    site_subst: Optional[bool] = ""
+    site_subst: Optional[bool] = False
     vacancy: Optional[bool] = False
     ads_site: Optional[str] = ""
     ads_formula: Optional[str] = ""
 
     # ? Simulation specifications
     functional: Optional[str] = "pbe"
-    wc_type: Optional[Union[RelaxWorkChain, PwRelaxWorkChain]] = RelaxWorkChain
+    wc_type: Optional[str] = "vasp.relax"  # entry point of the workchain
     wc_status: Optional[str] = ""  # ! # Possibly instance of CalcJobState
     # input_wc_sd_pk: Optional[int] # ? Add here, outside, or with getter method?
 
@@ -75,5 +133,74 @@ class Simulation:
     def set_output_energy(self):
         self.final_energy = get_energy_from_pk(input_pk=self.wc_pk)
 
+    @staticmethod
+    def set_output_energies(simulations):
+        """Set the final energy of many simulations with a single bulk query.
+
+        Simulations whose workchain has no energy output keep their current
+        ``final_energy``.
+
+        :param simulations: iterable of :class:`Simulation` instances
+        :returns: mapping of the ``wc_pk`` without energy to the reason why
+        :rtype: dict
+        """
+        simulations = list(simulations)
+        energies, missing = get_energies_from_pks(sim.wc_pk for sim in simulations)
+        for sim in simulations:
+            if sim.wc_pk in energies:
+                sim.final_energy = energies[sim.wc_pk]
+        return missing
+
     def get_output_energy(self):
         return self.final_energy
+
+    def get_workchain_class(self):
+        """Load the workchain class of the ``wc_type`` entry point."""
+        return WorkflowFactory(workchain_entry_point(self.wc_type))
+
+    def to_extras(self):
+        """Return the ``METADATA_FIELDS`` and energy as extras of the workchain node."""
+        extras = {EXTRAS_PREFIX + name: getattr(self, name) for name in METADATA_FIELDS}
+        extras[EXTRAS_PREFIX + "former_path"] = str(self.former_path)
+        if self.final_energy:
+            extras[ENERGY_EXTRA] = float(self.final_energy)
+        return extras
+
+    def store_metadata(self):
+        """Persist the ``METADATA_FIELDS`` and energy as extras of the workchain node.
+
+        See :meth:`~aiida_cattools.data.collection.Collection.store_metadata`
+        to store those of many simulations at once.
+        """
+        load_node(self.wc_pk).base.extras.set_many(self.to_extras())
+
+    def to_row(self):
+        """Return the field values as a tuple, in the order of ``FIELD_NAMES``."""
+        return tuple(getattr(self, name) for name in FIELD_NAMES)
+
+    @classmethod
+    def from_row(cls, row):
+        """Create a simulation from a sequence of values ordered as ``FIELD_NAMES``."""
+        return cls(*row)
+
+
+FIELD_NAMES = tuple(f.name for f in fields(Simulation))
+
+
+def workchain_entry_point(wc_type):
+    """Return the entry point name of a workchain type.
+
+    :param wc_type: entry point name, workchain class, class name in
+        ``WC_TYPES`` (as in older collections) or process type of a node
+    :returns: the entry point name, or ``wc_type`` itself if it is not known
+    """
+    if isinstance(wc_type, type):
+        _, entry_point = get_entry_point_from_class(
+            wc_type.__module__, wc_type.__name__
+        )
+        return entry_point.name if entry_point is not None else wc_type.__name__
+    if not isinstance(wc_type, str):
+        return wc_type
+    if wc_type.startswith(WORKFLOW_PROCESS_TYPE_PREFIX):
+        return wc_type[len(WORKFLOW_PROCESS_TYPE_PREFIX) :]
+    return WC_TYPES.get(wc_type, wc_type)
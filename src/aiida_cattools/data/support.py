@@ -1,5 +1,45 @@
-from aiida.orm import StructureData
+import json
 
+from aiida.orm import StructureData, load_node
 
-class Support(StructureData):
-    pass
+from ..utils.fingerprint import FingerprintMixin
+from .active_site import ActiveSite
+
+
+class Support(FingerprintMixin, StructureData):
+    """Slab on which adsorbates are placed."""
+
+    def get_active_sites(self, **kwargs):
+        """Return the adsorption sites of the slab, enumerating them only once.
+
+        The result is cached on the instance and, for stored supports, the UUID
+        of the stored :class:`ActiveSite` is kept in the ``active_sites`` extra,
+        keyed by the enumeration parameters, so later sessions reuse it.
+
+        :param kwargs: parameters passed to
+            :func:`~aiida_cattools.utils.geometry.find_sites`
+        :returns: :class:`~aiida_cattools.data.active_site.ActiveSite`
+        """
+        key = json.dumps(kwargs, sort_keys=True)
+        cache = self.__dict__.setdefault("_active_sites", {})
+        if key in cache:
+            return cache[key]
+
+        uuid = (
+            self.base.extras.get("active_sites", {}).get(key)
+            if self.is_stored
+            else None
+        )
+        if uuid is not None:
+            active_sites = load_node(uuid)
+        else:
+            active_sites = ActiveSite.from_support(self, **kwargs)
+            if self.is_stored:
+                active_sites.base.extras.set("support_uuid", self.uuid)
+                active_sites.store()
+                extra = self.base.extras.get("active_sites", {})
+                extra[key] = active_sites.uuid
+                self.base.extras.set("active_sites", extra)
+
+        cache[key] = active_sites
+        return active_sites
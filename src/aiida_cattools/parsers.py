@@ -5,10 +5,14 @@ Register parsers via the "aiida.parsers" entry point in setup.json.
 """
 from aiida.common import exceptions
 from aiida.engine import ExitCode
-from aiida.orm import SinglefileData
+from aiida.orm import Dict, SinglefileData
 from aiida.parsers.parser import Parser
 from aiida.plugins import CalculationFactory
 
+from .calculations import get_diff_filename
+from .utils.diff import summarize_diff
+from .utils.instrument import instrumented
+
 DiffCalculation = CalculationFactory("cattools")
 
 
@@ -30,6 +34,7 @@ class DiffParser(Parser):
         if not issubclass(node.process_class, DiffCalculation):
             raise exceptions.ParsingError("Can only parse DiffCalculation")
 
+    @instrumented
     def parse(self, **kwargs):
         """
         Parse outputs, store results in database.
@@ -37,10 +42,15 @@ class DiffParser(Parser):
         :returns: an exit code, if parsing fails (or nothing if parsing succeeds)
         """
         output_filename = self.node.get_option("output_filename")
+        outputs = {}
+        if "file2" in self.node.inputs:
+            outputs["cattools"] = output_filename
+        for label in getattr(self.node.inputs, "targets", {}):
+            outputs[f"diffs.{label}"] = get_diff_filename(label, output_filename)
 
         # Check that folder content is as expected
         files_retrieved = self.retrieved.list_object_names()
-        files_expected = [output_filename]
+        files_expected = list(outputs.values())
         # Note: set(A) <= set(B) checks whether A is a subset of B
         if not set(files_expected) <= set(files_retrieved):
             self.logger.error(
@@ -48,10 +58,37 @@ class DiffParser(Parser):
             )
             return self.exit_codes.ERROR_MISSING_OUTPUT_FILES
 
-        # add output file
-        self.logger.info(f"Parsing '{output_filename}'")
-        with self.retrieved.open(output_filename, "rb") as handle:
-            output_node = SinglefileData(file=handle)
-        self.out("cattools", output_node)
+        summarize = self.node.get_option("summarize")
+        for link_label, filename in outputs.items():
+            self.logger.info(f"Parsing '{filename}'")
+            if summarize:
+                self._parse_summary(link_label, filename)
+            else:
+                with self.retrieved.open(filename, "rb") as handle:
+                    output_node = SinglefileData(file=handle)
+                self.out(link_label, output_node)
 
         return ExitCode(0)
+
+    def _parse_summary(self, link_label, filename):
+        """Attach the summary of a diff and, if needed, the patch itself.
+
+        The patch is kept as a file if requested or above the size threshold,
+        and otherwise included in the summary.
+        """
+        with self.retrieved.open(filename, "rb") as handle:
+            summary = summarize_diff(handle)
+
+        threshold = self.node.get_option("patch_threshold")
+        if self.node.get_option("keep_patch") or summary["size"] > threshold:
+            with self.retrieved.open(filename, "rb") as handle:
+                self.out(link_label, SinglefileData(file=handle))
+        else:
+            content = self.retrieved.get_object_content(filename, mode="rb")
+            summary["patch"] = content.decode(errors="replace")
+
+        namespace, _, label = link_label.rpartition(".")
+        if namespace:
+            self.out(f"summaries.{label}", Dict(summary))
+        else:
+            self.out("summary", Dict(summary))
@@ -0,0 +1,358 @@
+"""Throttled submission of campaigns of simulations to the AiiDA daemon.
+
+A :class:`CampaignSubmitter` keeps at most ``max_active`` unfinished processes
+per computer and queue, spaces the submissions with a token bucket and submits
+new simulations as the previous ones finish. Every submission is recorded in a
+JSON-lines state file before and after calling ``submit``. The
+``global_uuid`` of the simulation is written in the description of the
+process at submission, and in the ``SIMULATION_EXTRA`` extra of its node
+afterwards, so that a driver that crashed can be restarted with the same
+state file without submitting any simulation twice.
+
+The ``global_uuid`` of a row is only kept by the collections read from a
+file or dataframe that has the column; the others get new random ones. So
+the identifiers of the rows are recorded too, in an identities file next to
+the state file, and the rows of a collection rebuilt from its source get
+them back by their label and metadata (see ``IDENTITY_FIELDS``).
+"""
+from collections import Counter
+import json
+import os
+from pathlib import Path
+import time
+
+from aiida.engine import submit as engine_submit
+from aiida.orm import AbstractCode, ProcessNode, QueryBuilder
+
+from ..data.simulation import METADATA_FIELDS
+from .getters import QUERY_BATCH_SIZE
+
+SIMULATION_EXTRA = "cattools_simulation"
+# Columns identifying a row of a collection across runs, when it has no
+# stored ``global_uuid``
+IDENTITY_FIELDS = ("label",) + METADATA_FIELDS
+TERMINATED_STATES = ("finished", "excepted", "killed")
+DEFAULT_KEY = "default"
+
+
+class TokenBucket:
+    """Token bucket limiting the average rate of an operation while allowing bursts.
+
+    :param rate: tokens added per second
+    :param capacity: maximum number of tokens, i.e. the largest burst
+    :param clock: function returning the current time in seconds
+    :param sleep: function waiting for a number of seconds
+    """
+
+    def __init__(self, rate, capacity=1, clock=time.monotonic, sleep=time.sleep):
+        if rate <= 0 or capacity < 1:
+            raise ValueError("the rate must be positive and the capacity at least 1")
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(capacity)
+        self._last = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def try_acquire(self):
+        """Take a token if one is available, without waiting.
+
+        :returns: whether a token was taken
+        """
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    def acquire(self):
+        """Take a token, waiting until one is available."""
+        while not self.try_acquire():
+            self._sleep((1 - self._tokens) / self.rate)
+
+
+class CampaignSubmitter:  # pylint: disable=too-many-instance-attributes
+    """Submit the pending simulations of a collection with throttling.
+
+    The simulations without workchain (``wc_pk == 0``) are pending. For each
+    of them, ``build`` is called with the :class:`~.simulation.Simulation` and
+    must return the ``ProcessBuilder`` to submit; the computer and queue of the
+    process are read from the first code and the ``queue_name`` option in the
+    builder, unless a ``key`` function is given.
+
+    Usage::
+
+        submitter = CampaignSubmitter(collection, build, "campaign.jsonl", max_active=200)
+        submitter.run()
+
+    :param collection: :class:`~aiida_cattools.data.collection.Collection`,
+        whose ``wc_pk`` and ``wc_status`` columns are updated
+    :param build: function returning the builder of a simulation
+    :param state_file: path of the JSON-lines file recording the submissions;
+        the identities of the rows are recorded in the file with the
+        ``.identities.jsonl`` suffix instead
+    :param max_active: maximum number of unfinished processes per computer and
+        queue, or mapping of ``"computer:queue"`` keys to limits (with an
+        optional ``"default"``)
+    :param rate: average number of submissions per second
+    :param burst: maximum number of submissions in a burst
+    :param poll_interval: seconds between checks of the active processes
+        when no submission is possible
+    :param key: function returning the throttling key of a builder
+    :param submit: function submitting a builder and returning the process node
+    :param clock: function returning the current time in seconds
+    :param sleep: function waiting for a number of seconds
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        collection,
+        build,
+        state_file,
+        max_active=100,
+        rate=1.0,
+        burst=10,
+        poll_interval=30.0,
+        key=None,
+        submit=engine_submit,
+        clock=time.monotonic,
+        sleep=time.sleep,
+    ):
+        self.collection = collection
+        self.build = build
+        self.state_file = state_file
+        self.identities_file = Path(state_file).with_suffix(".identities.jsonl")
+        self.max_active = max_active
+        self.poll_interval = poll_interval
+        self.key = key or resource_key
+        self._submit = submit
+        self._sleep = sleep
+        self.bucket = TokenBucket(rate, burst, clock=clock, sleep=sleep)
+        # global_uuid -> {"key": ..., "pk": ...} of the submitted simulations
+        self.submitted = {}
+
+    def limit(self, key):
+        """Return the maximum number of active processes for a key."""
+        if isinstance(self.max_active, dict):
+            return self.max_active.get(key, self.max_active.get(DEFAULT_KEY, 100))
+        return self.max_active
+
+    def resume(self):
+        """Read the state file and recover the submissions of a crashed driver.
+
+        Simulations recorded as being submitted, but without process, are
+        looked up by the extra or the description of their process node; if
+        none is found, they are submitted again.
+        """
+        self._restore_identities()
+        self.submitted = {}
+        unconfirmed = {}
+        if os.path.exists(self.state_file):
+            with open(self.state_file, encoding="utf8") as handle:
+                for line in handle:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    if record["pk"] is None:
+                        unconfirmed[record["uuid"]] = record["key"]
+                    else:
+                        unconfirmed.pop(record["uuid"], None)
+                        self.submitted[record["uuid"]] = record
+
+        if unconfirmed:
+            # only the simulations being submitted when the driver stopped
+            query = QueryBuilder().append(
+                ProcessNode,
+                filters={
+                    "or": [{f"extras.{SIMULATION_EXTRA}": {"in": list(unconfirmed)}}]
+                    + [
+                        {"description": {"like": f"%{_description_tag(uuid)}%"}}
+                        for uuid in unconfirmed
+                    ]
+                },
+                project=["id", f"extras.{SIMULATION_EXTRA}", "description"],
+            )
+            found = []
+            for pk, tagged, description in query.iterall():
+                for uuid in unconfirmed:
+                    if uuid == tagged or _description_tag(uuid) in (description or ""):
+                        record = {"uuid": uuid, "key": unconfirmed[uuid], "pk": pk}
+                        self.submitted[uuid] = record
+                        found.append(record)
+            self._record(found)
+        self._update_collection()
+
+    def _restore_identities(self):
+        """Give the rows of the collection the ``global_uuid`` of previous runs.
+
+        The rows are matched by their key (see :func:`identity_keys`), and the
+        identifiers of the rows seen for the first time are recorded.
+        """
+        identities = {}
+        if os.path.exists(self.identities_file):
+            with open(self.identities_file, encoding="utf8") as handle:
+                for line in handle:
+                    if line.strip():
+                        record = json.loads(line)
+                        identities[record["key"]] = record["uuid"]
+
+        df = self.collection.df
+        uuids = df["global_uuid"].tolist()
+        new = []
+        for index, key in enumerate(identity_keys(df)):
+            if key in identities:
+                uuids[index] = identities[key]
+            else:
+                new.append({"key": key, "uuid": uuids[index]})
+        df.loc[:, "global_uuid"] = uuids
+        _append(self.identities_file, new)
+
+    def pending(self):
+        """Return the simulations that still have to be submitted."""
+        return [
+            simulation
+            for simulation in self.collection.to_simulations()
+            if not simulation.wc_pk and simulation.global_uuid not in self.submitted
+        ]
+
+    def active_counts(self):
+        """Count the submitted processes that are not terminated, per key.
+
+        :rtype: :class:`collections.Counter`
+        """
+        keys = {record["pk"]: record["key"] for record in self.submitted.values()}
+        pks = list(keys)
+        counts = Counter()
+        for start in range(0, len(pks), QUERY_BATCH_SIZE):
+            query = QueryBuilder().append(
+                ProcessNode,
+                filters={
+                    "id": {"in": pks[start : start + QUERY_BATCH_SIZE]},
+                    "attributes.process_state": {"!in": TERMINATED_STATES},
+                },
+                project=["id"],
+            )
+            counts.update(keys[pk] for pk, in query.iterall())
+        return counts
+
+    def run(self, wait=True):
+        """Submit all the pending simulations.
+
+        :param wait: also wait until all the submitted processes terminate
+        :returns: mapping of the ``global_uuid`` of the simulations to the PK
+            of their process
+        :rtype: dict
+        """
+        self.resume()
+        queue = [(simulation, self.build(simulation)) for simulation in self.pending()]
+        while queue:
+            active = self.active_counts()
+            waiting = []
+            for simulation, builder in queue:
+                key = self.key(builder)
+                if active[key] >= self.limit(key):
+                    waiting.append((simulation, builder))
+                    continue
+                self.bucket.acquire()
+                self._submit_one(simulation, builder, key)
+                active[key] += 1
+            if len(waiting) == len(queue):
+                self._sleep(self.poll_interval)
+            queue = waiting
+            self._update_collection()
+
+        while wait and self.active_counts():
+            self._sleep(self.poll_interval)
+        return {uuid: record["pk"] for uuid, record in self.submitted.items()}
+
+    def _submit_one(self, simulation, builder, key):
+        """Submit a simulation, recording it before and after the submission."""
+        uuid = simulation.global_uuid
+        metadata = builder.setdefault("metadata", {})
+        description = metadata.get("description") or ""
+        metadata["description"] = f"{description}\n{_description_tag(uuid)}".strip()
+        self._record([{"uuid": uuid, "key": key, "pk": None}])
+        node = self._submit(builder)
+        node.base.extras.set(SIMULATION_EXTRA, uuid)
+        record = {"uuid": uuid, "key": key, "pk": node.pk}
+        self._record([record])
+        self.submitted[uuid] = record
+
+    def _record(self, records):
+        """Append records to the state file."""
+        _append(self.state_file, records)
+
+    def _update_collection(self):
+        """Set the process PK and status of the submitted simulations."""
+        df = self.collection.df
+        pks = df["global_uuid"].map(
+            {uuid: record["pk"] for uuid, record in self.submitted.items()}
+        )
+        submitted = pks.notna() & (df["wc_pk"] == 0)
+        if not submitted.any():
+            return
+        status = df["wc_status"]
+        if hasattr(status, "cat") and "submitted" not in status.cat.categories:
+            df["wc_status"] = status.cat.add_categories("submitted")
+        df.loc[submitted, "wc_pk"] = pks[submitted].astype("int64")
+        df.loc[submitted, "wc_status"] = "submitted"
+
+
+def identity_keys(df):
+    """Return the key identifying each row of a collection dataframe across runs.
+
+    The key is made of the ``IDENTITY_FIELDS`` of the row and of its rank
+    among the rows with the same fields.
+
+    :rtype: list of strings
+    """
+    ranks = Counter()
+    keys = []
+    for row in df[list(IDENTITY_FIELDS)].astype(str).itertuples(False, None):
+        key = json.dumps(row)
+        keys.append(f"{key}#{ranks[key]}")
+        ranks[key] += 1
+    return keys
+
+
+def _append(path, records):
+    """Append records to a JSON-lines file and make sure they reach the disk."""
+    if not records:
+        return
+    with open(path, "a", encoding="utf8") as handle:
+        for record in records:
+            handle.write(json.dumps(record) + "\n")
+        handle.flush()
+        os.fsync(handle.fileno())
+
+
+def _description_tag(uuid):
+    """Return the line identifying a simulation in the description of its process."""
+    return f"{SIMULATION_EXTRA}: {uuid}"
+
+
+def resource_key(builder):
+    """Return the ``"computer:queue"`` key of a process builder.
+
+    The computer is the one of the first code found in the inputs (searching
+    nested namespaces), and the queue the first ``queue_name`` option.
+    """
+    computer, queue = None, None
+    stack = [builder]
+    while stack and (computer is None or queue is None):
+        inputs = stack.pop(0)
+        for name, value in inputs.items():
+            if computer is None and isinstance(value, AbstractCode):
+                computer = value.computer.label
+            elif queue is None and name == "queue_name" and value:
+                queue = value
+            elif hasattr(value, "items"):
+                stack.append(value)
+    if computer is None:
+        return DEFAULT_KEY
+    return f"{computer}:{queue or ''}"
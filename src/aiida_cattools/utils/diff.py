@@ -0,0 +1,83 @@
+"""Streaming summary of the output of diff, in the normal or unified format."""
+import re
+
+# Hunk headers: "3,4c3" (normal) and "@@ -3,2 +3 @@" (unified)
+NORMAL_HUNK = re.compile(rb"^(\d+)(?:,(\d+))?([acd])(\d+)(?:,(\d+))?\s*$")
+UNIFIED_HUNK = re.compile(rb"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+MAX_HUNKS = 1000
+
+
+def summarize_diff(handle, max_hunks=MAX_HUNKS):
+    """Summarize a diff, reading it line by line.
+
+    :param handle: binary file handle with the output of diff
+    :param max_hunks: maximum number of hunks listed in the summary (all of
+        them are counted)
+    :returns: dictionary with the ``identical`` flag, the numbers of ``added``
+        and ``removed`` lines and of ``hunks``, the ``size`` of the patch in
+        bytes and the list of ``hunk_ranges``, each
+        ``[old_start, old_count, new_start, new_count]``
+    """
+    summary = {
+        "identical": True,
+        "format": None,
+        "added": 0,
+        "removed": 0,
+        "hunks": 0,
+        "size": 0,
+        "hunk_ranges": [],
+        "truncated": False,
+    }
+    # Lines left in the current unified hunk, which tell its body apart from
+    # the file headers ("--- a/file") of a recursive diff
+    old_left = new_left = 0
+    for line in handle:
+        summary["size"] += len(line)
+        if old_left or new_left:
+            if line.startswith(b"-"):
+                summary["removed"] += 1
+                old_left -= 1
+            elif line.startswith(b"+"):
+                summary["added"] += 1
+                new_left -= 1
+            elif not line.startswith(b"\\"):
+                old_left, new_left = old_left - 1, new_left - 1
+        elif line.startswith(b"<"):
+            summary["removed"] += 1
+        elif line.startswith(b">"):
+            summary["added"] += 1
+        elif line.startswith(b"@@"):
+            match = UNIFIED_HUNK.match(line)
+            if match:
+                summary["format"] = "unified"
+                old, old_left, new, new_left = match.groups()
+                old_left, new_left = _count(old_left), _count(new_left)
+                _add_hunk(summary, int(old), old_left, int(new), new_left, max_hunks)
+        elif line[:1].isdigit():
+            match = NORMAL_HUNK.match(line)
+            if match:
+                summary["format"] = "normal"
+                old, old_end, kind, new, new_end = match.groups()
+                old_count = 0 if kind == b"a" else _span(old, old_end)
+                new_count = 0 if kind == b"d" else _span(new, new_end)
+                _add_hunk(summary, int(old), old_count, int(new), new_count, max_hunks)
+    summary["identical"] = summary["hunks"] == 0 and summary["size"] == 0
+    return summary
+
+
+def _add_hunk(summary, old, old_count, new, new_count, max_hunks):
+    summary["hunks"] += 1
+    if len(summary["hunk_ranges"]) < max_hunks:
+        summary["hunk_ranges"].append([old, old_count, new, new_count])
+    else:
+        summary["truncated"] = True
+
+
+def _count(count):
+    """Number of lines of a unified hunk range, 1 if omitted."""
+    return 1 if count is None else int(count)
+
+
+def _span(start, end):
+    """Number of lines of a normal hunk range ``start[,end]``."""
+    return 1 if end is None else int(end) - int(start) + 1
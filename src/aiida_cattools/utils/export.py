@@ -0,0 +1,118 @@
+"""Chunked writers of collections of simulations to Parquet, CSV and JSON lines.
+
+Every chunk is written as soon as it is produced (e.g. by
+:meth:`~aiida_cattools.data.collection.Collection.iter_workchains`), so the
+memory needed does not grow with the number of exported rows.
+"""
+import bz2
+import gzip
+import lzma
+from pathlib import Path
+
+from .instrument import instrumented
+
+EXPORT_FORMATS = ("parquet", "csv", "jsonl")
+# Compression of the text formats, by codec and by file suffix
+TEXT_COMPRESSION = {"gzip": gzip.open, "bz2": bz2.open, "xz": lzma.open}
+TEXT_SUFFIXES = {".gz": "gzip", ".bz2": "bz2", ".xz": "xz"}
+
+
+def guess_format(path):
+    """Guess the export format and text compression from a file name.
+
+    :returns: tuple ``(format, compression)``, with ``None`` for what could
+        not be guessed
+    """
+    suffixes = Path(path).suffixes
+    compression = TEXT_SUFFIXES.get(suffixes[-1]) if suffixes else None
+    if compression:
+        suffixes = suffixes[:-1]
+    suffix = suffixes[-1].lstrip(".") if suffixes else ""
+    fmt = {"pq": "parquet", "ndjson": "jsonl", "json": "jsonl"}.get(suffix, suffix)
+    return (fmt if fmt in EXPORT_FORMATS else None), compression
+
+
+@instrumented
+def write_chunks(chunks, path, fmt=None, compression=None):
+    """Write collections (or dataframes) one after the other to a single file.
+
+    :param chunks: iterable of :class:`~aiida_cattools.data.collection.Collection`
+        or :class:`pandas.DataFrame` with the same columns
+    :param path: output file
+    :param fmt: one of ``EXPORT_FORMATS``, guessed from ``path`` by default
+    :param compression: for Parquet, the codec passed to ``pyarrow`` (``zstd``
+        by default); for the text formats, one of ``TEXT_COMPRESSION`` (guessed
+        from a ``.gz``, ``.bz2`` or ``.xz`` suffix by default)
+    :returns: number of rows written
+    """
+    guessed, text_compression = guess_format(path)
+    fmt = fmt or guessed
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(
+            f"Unknown export format for '{path}', use one of {EXPORT_FORMATS}"
+        )
+    if fmt == "parquet":
+        return _write_parquet(chunks, path, compression or "zstd")
+
+    compression = compression or text_compression
+    if compression in (None, "none"):
+        handle = open(path, "w", encoding="utf8", newline="")
+    elif compression in TEXT_COMPRESSION:
+        handle = TEXT_COMPRESSION[compression](path, "wt", encoding="utf8", newline="")
+    else:
+        raise ValueError(
+            f"Unknown compression '{compression}' for {fmt}, "
+            f"use one of {tuple(TEXT_COMPRESSION)}"
+        )
+
+    count = 0
+    with handle:
+        for chunk in chunks:
+            df = _export_df(chunk)
+            if fmt == "csv":
+                df.to_csv(handle, header=count == 0, index=False)
+            elif len(df):
+                lines = df.to_json(orient="records", lines=True, date_format="iso")
+                handle.write(lines if lines.endswith("\n") else lines + "\n")
+            count += len(df)
+    return count
+
+
+def _write_parquet(chunks, path, compression):
+    """Write the chunks as the row groups of a Parquet file."""
+    import pyarrow as pa  # pylint: disable=import-outside-toplevel
+    import pyarrow.parquet as pq  # pylint: disable=import-outside-toplevel
+
+    from ..data.collection import Collection  # pylint: disable=import-outside-toplevel
+
+    writer = None
+    count = 0
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(_export_df(chunk), preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema, compression=compression)
+            else:
+                table = table.cast(writer.schema)
+            writer.write_table(table)
+            count += table.num_rows
+        if writer is None:
+            table = pa.Table.from_pandas(
+                _export_df(Collection().df), preserve_index=False
+            )
+            writer = pq.ParquetWriter(path, table.schema, compression=compression)
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
+
+
+def _export_df(chunk):
+    """Dataframe of a chunk, with plain string columns instead of categoricals.
+
+    The categories differ from chunk to chunk, while the schema of the rows
+    must not (Parquet dictionary-encodes the strings anyway).
+    """
+    df = getattr(chunk, "df", chunk)
+    categorical = df.select_dtypes("category").columns
+    return df.astype({name: "string" for name in categorical})
@@ -0,0 +1,337 @@
+"""Structure fingerprints and a local index to detect duplicate configurations.
+
+A fingerprint is the chemical formula of a structure together with its
+species-resolved radial distribution function, histogrammed in ``bins`` bins
+up to ``r_max`` with a Gaussian smearing (so that small displacements give
+small changes). It does not depend on the order of the atoms, nor on rigid
+translations of the structure.
+"""
+from math import ceil
+import sqlite3
+
+import numpy as np
+
+from aiida.orm.nodes.data.structure import get_formula
+
+from .geometry import neighbor_pairs
+
+R_MAX = 6.0
+BINS = 48
+SIGMA = 0.1
+TOLERANCE = 0.005
+
+
+def get_fingerprint(  # pylint: disable=too-many-arguments,too-many-locals
+    positions,
+    symbols,
+    cell,
+    pbc=(True, True, True),
+    r_max=R_MAX,
+    bins=BINS,
+    sigma=SIGMA,
+):
+    """Compute the fingerprint of a periodic structure.
+
+    :param positions: (N, 3) array of cartesian positions
+    :param symbols: the N chemical symbols of the atoms
+    :param cell: (3, 3) array with the cell vectors as rows
+    :param pbc: periodicity along the three cell vectors
+    :param r_max: largest distance included in the radial distribution
+    :param bins: number of bins of the radial distribution
+    :param sigma: width (in Angstrom) of the Gaussian smearing of the distances
+    :returns: tuple ``(formula, vector)``, ``vector`` being a float array with
+        ``bins`` values per pair of species (in alphabetical order), every
+        pair being normalized to a distribution of distances
+    :raises ValueError: if the periodic cell vectors are linearly dependent
+    """
+    positions = np.asarray(positions, dtype=float)
+    cell = np.asarray(cell, dtype=float)
+    species, numbers = np.unique(symbols, return_inverse=True)
+    numbers = numbers.reshape(-1)
+    formula = get_formula(list(symbols), mode="hill")
+
+    # Periodic images within r_max of the cell: the number of repetitions along
+    # every vector is given by the distance between the opposite faces
+    spanning = _spanning_cell(cell, pbc)
+    volume = abs(np.linalg.det(spanning))
+    repetitions = [
+        ceil(
+            r_max * np.linalg.norm(np.cross(spanning[i - 2], spanning[i - 1])) / volume
+        )
+        if periodic
+        else 0
+        for i, periodic in enumerate(pbc)
+    ]
+    shifts = (
+        np.array(
+            np.meshgrid(*(np.arange(-n, n + 1) for n in repetitions), indexing="ij")
+        )
+        .reshape(3, -1)
+        .T
+        @ cell
+    )
+    images = (positions[None, :, :] + shifts[:, None, :]).reshape(-1, 3)
+
+    atom, image, distances = neighbor_pairs(images, r_max, queries=positions)
+    keep = distances > 1e-8
+    first, second = numbers[atom[keep]], numbers[image[keep] % len(positions)]
+    low, high = np.minimum(first, second), np.maximum(first, second)
+    # Index of the (low, high) pair of species in the upper triangle
+    pairs = low * len(species) - low * (low - 1) // 2 + high - low
+
+    # Gaussian smearing of every distance over the neighboring bins
+    width = r_max / bins
+    center = np.floor(distances[keep] / width).astype(int)
+    offsets = np.arange(-ceil(3 * sigma / width), ceil(3 * sigma / width) + 1)
+    index = center[:, None] + offsets
+    weights = np.exp(
+        -0.5 * (((index + 0.5) * width - distances[keep][:, None]) / sigma) ** 2
+    )
+    weights /= weights.sum(axis=1, keepdims=True)
+    inside = (index >= 0) & (index < bins)
+    vector = np.zeros((len(species) * (len(species) + 1) // 2, bins))
+    np.add.at(
+        vector,
+        (np.broadcast_to(pairs[:, None], index.shape)[inside], index[inside]),
+        weights[inside],
+    )
+    # Every pair of species gives a distribution of distances
+    totals = vector.sum(axis=1, keepdims=True)
+    return formula, np.divide(vector, totals, where=totals > 0).reshape(-1)
+
+
+def _spanning_cell(cell, pbc, eps=1e-10):
+    """Return the cell with its non-periodic vectors made orthonormal.
+
+    Only the periodic vectors matter for the periodic images, and the others
+    may be degenerate (e.g. zero for a 2-D structure or a molecule), so they
+    are replaced by unit vectors orthogonal to the periodic ones.
+    """
+    periodic = np.asarray(pbc, dtype=bool)
+    spanning = cell.copy()
+    if periodic.any():
+        _, singular, basis = np.linalg.svd(cell[periodic])
+        if singular.min() <= eps:
+            raise ValueError("the periodic vectors of the cell are linearly dependent")
+        spanning[~periodic] = basis[periodic.sum() :]
+    else:
+        spanning = np.eye(3)
+    return spanning
+
+
+def get_structure_fingerprint(structure, r_max=R_MAX, bins=BINS):
+    """Compute the fingerprint of a ``StructureData`` node.
+
+    :param structure: :class:`aiida.orm.StructureData`
+    :returns: tuple ``(formula, vector)``, see :func:`get_fingerprint`
+    """
+    symbols = [
+        structure.get_kind(name).symbol for name in structure.get_site_kindnames()
+    ]
+    positions = [site.position for site in structure.sites]
+    return get_fingerprint(
+        positions, symbols, structure.cell, structure.pbc, r_max=r_max, bins=bins
+    )
+
+
+def fingerprint_distance(first, second):
+    """Root mean square difference between two fingerprint vectors."""
+    return float(np.sqrt(np.mean((np.asarray(first) - np.asarray(second)) ** 2)))
+
+
+class FingerprintMixin:
+    """Mixin giving ``StructureData`` subclasses a persisted ``fingerprint``.
+
+    The fingerprint with the default parameters is saved in the ``fingerprint``
+    attribute when the node is stored, as the structure cannot change anymore;
+    the fingerprints computed afterwards with other parameters are saved in the
+    ``fingerprint`` extra. Nothing is cached on unstored nodes, whose sites and
+    cell may still change.
+    """
+
+    def store(self, *args, **kwargs):
+        """Store the node, with the fingerprint of its final structure.
+
+        The structures whose fingerprint is not defined (see
+        :func:`get_fingerprint`) are stored without it.
+        """
+        if not self.is_stored:
+            try:
+                fingerprint = _fingerprint_dict(
+                    *get_structure_fingerprint(self), R_MAX, BINS
+                )
+            except ValueError:
+                fingerprint = None
+            # a fingerprint copied from a cloned node may be stale
+            if "fingerprint" in self.base.attributes.keys():
+                self.base.attributes.delete("fingerprint")
+            if fingerprint is not None:
+                self.base.attributes.set("fingerprint", fingerprint)
+        return super().store(*args, **kwargs)
+
+    def get_fingerprint(self, r_max=R_MAX, bins=BINS):
+        """Return the fingerprint of the structure.
+
+        For a stored node, it is read from the ``fingerprint`` attribute or
+        extra if computed with the same parameters, and saved in the extra
+        otherwise.
+
+        :returns: tuple ``(formula, vector)``, see :func:`get_fingerprint`
+        """
+        if self.is_stored:
+            for saved in (
+                self.base.attributes.get("fingerprint", None),
+                self.base.extras.get("fingerprint", None),
+            ):
+                if saved and saved["r_max"] == r_max and saved["bins"] == bins:
+                    return saved["formula"], np.array(saved["vector"])
+
+        formula, vector = get_structure_fingerprint(self, r_max=r_max, bins=bins)
+        if self.is_stored:
+            self.base.extras.set(
+                "fingerprint", _fingerprint_dict(formula, vector, r_max, bins)
+            )
+        return formula, vector
+
+
+def _fingerprint_dict(formula, vector, r_max, bins):
+    """Return the JSON-serializable record of a fingerprint."""
+    return {"formula": formula, "r_max": r_max, "bins": bins, "vector": vector.tolist()}
+
+
+class FingerprintIndex:
+    """Local index of structure fingerprints, persisted in a sqlite file.
+
+    The fingerprints are grouped by formula and held in memory as NumPy
+    matrices, so a lookup compares a vector with all the structures of the
+    same composition in a single vectorized operation.
+
+    Usage::
+
+        index = FingerprintIndex("fingerprints.sqlite")
+        if not index.find(candidate):
+            index.add(candidate)
+
+    :param path: sqlite file (``":memory:"`` for a temporary index)
+    :param r_max: largest distance of the fingerprints
+    :param bins: number of bins of the fingerprints
+    """
+
+    def __init__(self, path=":memory:", r_max=R_MAX, bins=BINS):
+        self.r_max = r_max
+        self.bins = bins
+        self._connection = sqlite3.connect(str(path))
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                uuid TEXT PRIMARY KEY,
+                formula TEXT NOT NULL,
+                r_max REAL NOT NULL,
+                bins INTEGER NOT NULL,
+                vector BLOB NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS formula_index ON fingerprints (formula);
+            """
+        )
+        self._matrices = {}
+
+    def __len__(self):
+        query = "SELECT COUNT(*) FROM fingerprints WHERE r_max = ? AND bins = ?"
+        return self._connection.execute(query, (self.r_max, self.bins)).fetchone()[0]
+
+    def close(self):
+        """Close the sqlite connection."""
+        self._connection.close()
+
+    def fingerprint(self, structure):
+        """Return the fingerprint of a structure with the parameters of the index."""
+        if hasattr(structure, "get_fingerprint"):
+            return structure.get_fingerprint(r_max=self.r_max, bins=self.bins)
+        return get_structure_fingerprint(structure, r_max=self.r_max, bins=self.bins)
+
+    def add(self, structure, uuid=None):
+        """Add a structure to the index.
+
+        :param structure: ``StructureData`` node, or ``(formula, vector)`` tuple
+        :param uuid: identifier of the entry, by default the UUID of the node
+            (e.g. the UUID of the relaxation that used the structure); required
+            for a ``(formula, vector)`` tuple
+        :raises ValueError: if no ``uuid`` is given for a tuple
+        """
+        if isinstance(structure, tuple):
+            if uuid is None:
+                raise ValueError("a uuid is required to add a (formula, vector) tuple")
+            formula, vector = structure
+        else:
+            formula, vector = self.fingerprint(structure)
+            uuid = uuid or structure.uuid
+        vector = np.asarray(vector, dtype=np.float64)
+        self._replace([(uuid, formula, self.r_max, self.bins, vector.tobytes())])
+
+    def add_many(self, structures):
+        """Add ``StructureData`` nodes to the index in a single transaction."""
+        rows = []
+        for structure in structures:
+            formula, vector = self.fingerprint(structure)
+            rows.append(
+                (
+                    structure.uuid,
+                    formula,
+                    self.r_max,
+                    self.bins,
+                    np.asarray(vector, dtype=np.float64).tobytes(),
+                )
+            )
+        self._replace(rows)
+
+    def _replace(self, rows):
+        """Insert or replace rows in a single transaction.
+
+        The matrices of the new formulas are invalidated, and so are those of
+        the old formulas of the replaced entries.
+        """
+        with self._connection:
+            for uuid, formula, *_ in rows:
+                old = self._connection.execute(
+                    "SELECT formula FROM fingerprints WHERE uuid = ?", (uuid,)
+                ).fetchone()
+                if old is not None:
+                    self._matrices.pop(old[0], None)
+                self._matrices.pop(formula, None)
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?, ?, ?)", rows
+            )
+
+    def find(self, structure, tolerance=TOLERANCE):
+        """Find the indexed structures within ``tolerance`` of a structure.
+
+        :param structure: ``StructureData`` node, or ``(formula, vector)`` tuple
+        :param tolerance: maximum :func:`fingerprint_distance`
+        :returns: list of ``(uuid, distance)`` tuples sorted by distance
+        """
+        formula, vector = (
+            structure if isinstance(structure, tuple) else self.fingerprint(structure)
+        )
+        uuids, matrix, norms = self._get_matrix(formula)
+        if not uuids:
+            return []
+        vector = np.asarray(vector, dtype=np.float64)
+        squared = norms - 2 * (matrix @ vector) + vector @ vector
+        distances = np.sqrt(np.maximum(squared, 0) / len(vector))
+        close = np.flatnonzero(distances <= tolerance)
+        close = close[np.argsort(distances[close])]
+        return [(uuids[i], float(distances[i])) for i in close]
+
+    def _get_matrix(self, formula):
+        """Load the fingerprints of a formula and their squared norms, once."""
+        if formula not in self._matrices:
+            rows = self._connection.execute(
+                "SELECT uuid, vector FROM fingerprints "
+                "WHERE formula = ? AND r_max = ? AND bins = ?",
+                (formula, self.r_max, self.bins),
+            ).fetchall()
+            uuids = [uuid for uuid, _ in rows]
+            matrix = np.array([np.frombuffer(vector) for _, vector in rows])
+            norms = np.einsum("ij,ij->i", matrix, matrix) if rows else None
+            self._matrices[formula] = uuids, matrix, norms
+        return self._matrices[formula]
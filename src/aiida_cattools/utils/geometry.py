@@ -0,0 +1,378 @@
+"""Vectorized geometry helpers for slabs: neighbor lists and adsorption sites.
+
+All functions work on NumPy arrays (positions in Angstrom, cell vectors as
+rows) and avoid Python loops over atoms, so that they scale to slabs with
+hundreds of atoms and to millions of candidate configurations.
+"""
+from itertools import product
+
+import numpy as np
+
+SITE_KINDS = ("top", "bridge", "fcc", "hcp", "hollow")
+
+
+def neighbor_pairs(points, cutoff, queries=None):
+    """Find all pairs of points closer than ``cutoff`` with a cell list.
+
+    The points are binned in cubic cells of side ``cutoff``, so only the 27
+    neighboring cells of every point are searched instead of all the points.
+
+    :param points: (N, 3) array of cartesian positions
+    :param cutoff: maximum distance between the points of a pair
+    :param queries: (M, 3) array of positions whose neighbors among ``points``
+        are searched; by default the pairs within ``points`` are returned
+    :returns: tuple ``(i, j, distances)`` of arrays, ``i`` indexing ``queries``
+        and ``j`` indexing ``points`` (with ``i < j`` if ``queries`` is None)
+    """
+    points = np.asarray(points, dtype=float)
+    same = queries is None
+    queries = points if same else np.asarray(queries, dtype=float)
+    empty = (np.empty(0, int), np.empty(0, int), np.empty(0))
+    if len(points) == 0 or len(queries) == 0:
+        return empty
+
+    origin = np.minimum(points.min(axis=0), queries.min(axis=0))
+    cells = np.floor((points - origin) / cutoff).astype(np.int64)
+    query_cells = np.floor((queries - origin) / cutoff).astype(np.int64)
+    dims = np.maximum(cells.max(axis=0), query_cells.max(axis=0)) + 1
+    keys = np.ravel_multi_index(cells.T, dims)
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+
+    first, second = [], []
+    for offset in product((-1, 0, 1), repeat=3):
+        shifted = query_cells + offset
+        valid = np.all((shifted >= 0) & (shifted < dims), axis=1)
+        query = np.ravel_multi_index(shifted[valid].T, dims)
+        lo = np.searchsorted(sorted_keys, query, side="left")
+        hi = np.searchsorted(sorted_keys, query, side="right")
+        counts = hi - lo
+        if not counts.any():
+            continue
+        # indices into ``order`` of all the points in the queried cells
+        starts = np.repeat(lo - np.cumsum(counts) + counts, counts)
+        first.append(np.repeat(np.flatnonzero(valid), counts))
+        second.append(order[np.arange(counts.sum()) + starts])
+    if not first:
+        return empty
+
+    i, j = np.concatenate(first), np.concatenate(second)
+    if same:
+        keep = i < j
+        i, j = i[keep], j[keep]
+    distances = np.linalg.norm(queries[i] - points[j], axis=1)
+    keep = distances < cutoff
+    return i[keep], j[keep], distances[keep]
+
+
+def get_layers(positions, tolerance=0.5):
+    """Assign every atom to a layer along z, 0 being the topmost one.
+
+    :param positions: (N, 3) array of cartesian positions
+    :param tolerance: maximum z difference between atoms of the same layer
+    :returns: (N,) integer array
+    """
+    z = np.asarray(positions)[:, 2]
+    order = np.argsort(-z)
+    new_layer = np.diff(-z[order], prepend=-z[order[0]]) > tolerance
+    layers = np.empty(len(z), dtype=int)
+    layers[order] = np.cumsum(new_layer)
+    return layers
+
+
+def find_sites(  # pylint: disable=too-many-locals
+    positions,
+    numbers,
+    cell,
+    cutoff=None,
+    tolerance=0.15,
+    layer_tolerance=0.5,
+    precision=0.05,
+):
+    """Enumerate the top, bridge and hollow sites of the top layer of a slab.
+
+    The slab is assumed periodic along the first two cell vectors, with the
+    surface normal along z. Bridge sites are the midpoints of bonded surface
+    atoms, threefold hollows (classified as ``fcc`` or ``hcp`` depending on
+    whether there is an atom of the second layer below them) the centers of
+    bonded triangles and fourfold ``hollow`` sites the centers of bonded
+    squares. The bonds are kept as the sparse list of pairs found by
+    :func:`neighbor_pairs`. Equivalent sites are identified by their local
+    environment: sites with the same kind, the same species of the nearest
+    atoms and distances to them that agree within ``precision`` get the same
+    label.
+
+    :param positions: (N, 3) array of cartesian positions
+    :param numbers: (N,) array of integers identifying the species of the atoms
+    :param cell: (3, 3) array with the cell vectors as rows
+    :param cutoff: bonding distance between surface atoms; by default
+        ``1 + tolerance`` times the shortest surface distance
+    :param tolerance: relative tolerance on the bonding distances
+    :param layer_tolerance: maximum z difference between atoms of the same layer
+    :param precision: tolerance on the distances of equivalent sites
+    :returns: dictionary of arrays with one entry per site: ``positions``
+        (M, 3), ``kinds`` (M,) indices into ``SITE_KINDS``, ``atoms`` (M, 4)
+        indices of the coordinating atoms (padded with -1) and ``equivalence``
+        (M,) labels of the groups of equivalent sites, ``unique`` holding the
+        index of the first site of every group
+    """
+    positions = np.asarray(positions, dtype=float)
+    numbers = np.asarray(numbers)
+    cell = np.asarray(cell, dtype=float)
+    layers = get_layers(positions, layer_tolerance)
+
+    # Surface atoms and their in-plane periodic images
+    surface = np.flatnonzero(layers == 0)
+    shifts = np.array([(a, b, 0) for a in (0, -1, 1) for b in (0, -1, 1)])
+    images = (positions[surface][None, :, :] + (shifts @ cell)[:, None, :]).reshape(
+        -1, 3
+    )
+    image_atoms = np.tile(surface, len(shifts))
+
+    if cutoff is None:
+        spacing = np.sqrt(abs(np.linalg.det(cell[:2, :2])) / len(surface))
+        _, _, distances = neighbor_pairs(images, 2 * spacing)
+        cutoff = (1 + tolerance) * distances.min()
+    i, j, distances = neighbor_pairs(images, cutoff)
+    bonds = _Bonds(i, j, len(images))
+
+    sites, kinds, atoms = (
+        [images],
+        [np.zeros(len(images), int)],
+        [np.column_stack([np.arange(len(images)), np.full((len(images), 3), -1)])],
+    )
+
+    # Bridges
+    sites.append((images[i] + images[j]) / 2)
+    kinds.append(np.full(len(i), SITE_KINDS.index("bridge")))
+    atoms.append(np.column_stack([i, j, np.full((len(i), 2), -1)]))
+
+    # Threefold hollows: bonded triangles i < j < k
+    pair, k = bonds.neighbors(i)
+    keep = (k > j[pair]) & bonds.bonded(j[pair], k)
+    pair, k = pair[keep], k[keep]
+    triangles = np.column_stack([i[pair], j[pair], k])
+    centers = images[triangles].mean(axis=1)
+    below = _has_atom_below(centers, positions[layers == 1], cell, cutoff / 4)
+    sites.append(centers)
+    kinds.append(np.where(below, SITE_KINDS.index("hcp"), SITE_KINDS.index("fcc")))
+    atoms.append(np.column_stack([triangles, np.full(len(triangles), -1)]))
+
+    # Fourfold hollows: unbonded pairs with two common neighbors that are not
+    # bonded to each other either (the diagonals of a square)
+    a, c, _ = neighbor_pairs(images, np.sqrt(2) * cutoff)
+    unbonded = ~bonds.bonded(a, c)
+    a, c = a[unbonded], c[unbonded]
+    pair, shared = bonds.neighbors(a)
+    keep = bonds.bonded(c[pair], shared)
+    pair, shared = pair[keep], shared[keep]
+    # the first and last common neighbors of every pair, sorted by index
+    diagonal, first, counts = np.unique(pair, return_index=True, return_counts=True)
+    a, c = a[diagonal], c[diagonal]
+    b, d = shared[first], shared[first + counts - 1]
+    square = (counts >= 2) & ~bonds.bonded(b, d) & (a < np.minimum(b, d))
+    squares = np.column_stack([a, b, c, d])[square]
+    sites.append(images[squares].mean(axis=1))
+    kinds.append(np.full(len(squares), SITE_KINDS.index("hollow")))
+    atoms.append(squares)
+
+    sites, kinds, atoms = map(np.concatenate, (sites, kinds, atoms))
+
+    # Keep the sites inside the cell and map the image indices to the atoms
+    fractional = sites @ np.linalg.inv(cell)
+    inside = np.all(
+        (fractional[:, :2] >= -1e-8) & (fractional[:, :2] < 1 - 1e-8), axis=1
+    )
+    sites, kinds, atoms = sites[inside], kinds[inside], atoms[inside]
+    atoms = np.where(atoms >= 0, image_atoms[atoms], -1)
+
+    near = layers <= 1
+    equivalence = _equivalent_sites(
+        sites, kinds, positions[near], numbers[near], cell, precision, 1.5 * cutoff
+    )
+    _, unique = np.unique(equivalence, return_index=True)
+    return {
+        "positions": sites,
+        "kinds": kinds,
+        "atoms": atoms,
+        "equivalence": equivalence,
+        "unique": unique,
+    }
+
+
+class _Bonds:
+    """Sparse bond graph, with the neighbors of every point sorted by index.
+
+    :param i: first points of the bonded pairs
+    :param j: second points of the bonded pairs
+    :param size: number of points
+    """
+
+    def __init__(self, i, j, size):
+        self.size = size
+        self.keys = np.unique(np.concatenate([i * size + j, j * size + i]))
+        self.targets = self.keys % size
+        self.starts = np.searchsorted(self.keys // size, np.arange(size + 1))
+
+    def bonded(self, first, second):
+        """Check whether the points of every pair are bonded."""
+        keys = np.asarray(first) * self.size + second
+        index = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        return (self.keys[index] == keys) if len(self.keys) else keys < 0
+
+    def neighbors(self, points):
+        """Return the neighbors of points.
+
+        :returns: tuple ``(rows, neighbors)`` of arrays, ``rows`` indexing
+            ``points`` (in increasing order)
+        """
+        counts = self.starts[points + 1] - self.starts[points]
+        rows = np.repeat(np.arange(len(points)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(
+            np.cumsum(counts) - counts, counts
+        )
+        return rows, self.targets[self.starts[points][rows] + offsets]
+
+
+def _has_atom_below(points, atoms, cell, radius):
+    """Check whether an atom is within ``radius`` of every point, in the xy plane."""
+    if len(atoms) == 0:
+        return np.zeros(len(points), dtype=bool)
+    fractional = (points[:, None, :] - atoms[None, :, :]) @ np.linalg.inv(cell)
+    fractional[..., :2] -= np.round(fractional[..., :2])
+    delta = fractional @ cell
+    return (np.linalg.norm(delta[..., :2], axis=-1) < radius).any(axis=1)
+
+
+def _equivalent_sites(sites, kinds, positions, numbers, cell, precision, radius):
+    """Label sites with the same kind and local environment with the same integer.
+
+    The environment of a site is made of the species and distances of the
+    atoms (and periodic images) within ``radius``, sorted by distance. The
+    sites with the same kind and species are clustered on the distances, one
+    rank at a time: the sites sorted by distance are split where two
+    consecutive distances differ by more than ``precision``.
+    """
+    shifts = np.array([(a, b, 0) for a in (-1, 0, 1) for b in (-1, 0, 1)]) @ cell
+    images = (positions[None, :, :] + shifts[:, None, :]).reshape(-1, 3)
+    image_numbers = np.tile(numbers, len(shifts))
+
+    site, atom, distances = neighbor_pairs(images, radius, queries=sites)
+    order = np.lexsort((atom, distances, site))
+    site, atom, distances = site[order], atom[order], distances[order]
+    rank = np.arange(len(site)) - np.searchsorted(site, site)
+
+    size = rank.max() + 1 if len(rank) else 0
+    species = np.full((len(sites), 1 + size), -1)
+    species[:, 0] = kinds
+    species[site, 1 + rank] = image_numbers[atom]
+    environment = np.full((len(sites), size), -1.0)
+    environment[site, rank] = distances
+
+    _, labels = np.unique(species, axis=0, return_inverse=True)
+    labels = labels.reshape(-1)
+    for column in environment.T:
+        order = np.lexsort((column, labels))
+        split = (np.diff(labels[order]) != 0) | (np.diff(column[order]) > precision)
+        labels[order] = np.concatenate([[0], np.cumsum(split)])
+    return labels
+
+
+def get_orientations(angles=6, tilts=(0.0,)):
+    """Return the rotation matrices of a grid of adsorbate orientations.
+
+    :param angles: number of rotations about the surface normal, evenly spaced
+    :param tilts: tilt angles (in degrees) away from the surface normal
+    :returns: tuple ``(rotations, grid)`` with the (O, 3, 3) rotation matrices
+        and the (O, 2) array of their azimuthal and tilt angles in degrees
+    """
+    azimuths = np.arange(angles) * 360.0 / angles
+    grid = np.array([(phi, theta) for theta in tilts for phi in azimuths], float)
+    phi, theta = np.radians(grid).T
+    cos_p, sin_p, cos_t, sin_t = np.cos(phi), np.sin(phi), np.cos(theta), np.sin(theta)
+    zeros, ones = np.zeros_like(phi), np.ones_like(phi)
+    rot_z = np.stack(
+        [cos_p, -sin_p, zeros, sin_p, cos_p, zeros, zeros, zeros, ones], axis=1
+    ).reshape(-1, 3, 3)
+    rot_y = np.stack(
+        [cos_t, zeros, sin_t, zeros, ones, zeros, -sin_t, zeros, cos_t], axis=1
+    ).reshape(-1, 3, 3)
+    return rot_z @ rot_y, grid
+
+
+def iter_placements(  # pylint: disable=too-many-arguments,too-many-locals
+    adsorbate,
+    sites,
+    positions,
+    cell,
+    anchor=0,
+    heights=(2.0,),
+    angles=6,
+    tilts=(0.0,),
+    min_distance=1.5,
+    max_pairs=2**16,
+):
+    """Lazily place an adsorbate on a grid of sites, orientations and heights.
+
+    The adsorbate is rotated about its ``anchor`` atom, which is placed at
+    ``height`` above every site. The candidates whose atoms are closer than
+    ``min_distance`` to any slab atom, or to the periodic images of the
+    adsorbate itself, are rejected with minimum-image distances computed in
+    chunks of sites, into two buffers of ``max_pairs`` vectors allocated once,
+    so that the memory used does not grow with the number of sites.
+
+    :param adsorbate: (n, 3) array of cartesian positions of the adsorbate
+    :param sites: (M, 3) array of site positions
+    :param positions: (N, 3) array of cartesian positions of the slab
+    :param cell: (3, 3) array with the cell vectors as rows, periodic along the
+        first two
+    :param anchor: index of the adsorbate atom bonded to the site
+    :param heights: heights (in Angstrom) of the anchor above the sites
+    :param angles: number of rotations about the surface normal
+    :param tilts: tilt angles (in degrees) away from the surface normal
+    :param min_distance: minimum distance between atoms of a candidate
+    :param max_pairs: maximum number of distances computed at once
+    :returns: generator of ``(site, height, azimuth, tilt, positions)`` tuples,
+        ``site`` indexing ``sites`` and ``positions`` being the (n, 3) array of
+        the adsorbate atoms
+    """
+    adsorbate = np.asarray(adsorbate, dtype=float)
+    sites = np.asarray(sites, dtype=float)
+    positions = np.asarray(positions, dtype=float)
+    cell = np.asarray(cell, dtype=float)
+    inverse = np.linalg.inv(cell)
+
+    rotations, grid = get_orientations(angles, tilts)
+    rotated = np.einsum("oij,nj->oni", rotations, adsorbate - adsorbate[anchor])
+    heights = np.asarray(heights, dtype=float)
+    offsets = rotated[:, None] + heights[None, :, None, None] * np.array([0, 0, 1.0])
+    offsets = offsets.reshape(-1, *adsorbate.shape)
+    parameters = np.column_stack(
+        [np.tile(heights, len(grid)), np.repeat(grid, len(heights), axis=0)]
+    )
+
+    # Clashes of the adsorbate with its own periodic images do not depend on
+    # the site
+    shifts = np.array([(a, b, 0) for a in (-1, 0, 1) for b in (-1, 0, 1) if a or b])
+    delta = (
+        offsets[:, :, None, None, :]
+        - offsets[:, None, :, None, :]
+        - (shifts @ cell)[None, None, None, :, :]
+    )
+    allowed = np.linalg.norm(delta, axis=-1).min(axis=(1, 2, 3)) >= min_distance
+
+    chunk = max(1, max_pairs // max(1, offsets.size // 3 * len(positions)))
+    buffers = np.empty((2, chunk, *offsets.shape[:2], len(positions), 3))
+    for start in range(0, len(sites), chunk):
+        candidates = sites[start : start + chunk, None, None, :] + offsets[None]
+        delta, fractional = buffers[:, : len(candidates)]
+        np.subtract(candidates[:, :, :, None, :], positions, out=delta)
+        np.matmul(delta, inverse, out=fractional)
+        np.round(fractional[..., :2], out=delta[..., :2])
+        fractional[..., :2] -= delta[..., :2]
+        np.matmul(fractional, cell, out=delta)
+        squared = np.einsum("...i,...i->...", delta, delta)
+        valid = (squared.min(axis=(2, 3)) >= min_distance**2) & allowed
+        for site, candidate in zip(*np.nonzero(valid)):
+            height, azimuth, tilt = parameters[candidate]
+            yield start + site, height, azimuth, tilt, candidates[site, candidate]
@@ -1,15 +1,350 @@
-from aiida.orm import load_entity, load_node
-
-
-def get_energy_from_pk(input_pk):
-    final_energy = 0
-    wc_node = load_node(input_pk)
-    try:
-        final_energy = wc_node.outputs.misc.get_dict()["total_energies"][
-            "energy_extrapolated_electronic"
-        ]
-    except:  # NotExistentAttributeError:
-        raise
+from collections import OrderedDict, namedtuple
+from numbers import Integral
+import threading
+import time
+
+from aiida.common.exceptions import NotExistent, NotExistentAttributeError
+from aiida.orm import (
+    CalcJobNode,
+    Dict,
+    Node,
+    QueryBuilder,
+    WorkflowNode,
+    load_entity,
+    load_node,
+)
+
+from . import qe, vasp
+from .instrument import instrumented
+from .steps import extrapolate_energy, has_output
+
+# Link label of the output dictionary and path to the final energy inside it,
+# for each of the supported relaxation workchains.
+ENERGY_OUTPUTS = {
+    "misc": ("total_energies", "energy_extrapolated_electronic"),  # aiida-vasp
+    "output_parameters": ("energy",),  # aiida-quantumespresso
+}
+# Path to the smearing contribution -TS in the outputs whose energy is the free
+# energy E - TS (the ``energy`` of aiida-quantumespresso), so that the final
+# energies of all the codes are extrapolated to sigma -> 0, as the VASP one.
+SMEARING_OUTPUTS = {"output_parameters": ("energy_smearing",)}
+
+# Upper bound for the number of PKs sent in a single ``IN`` clause.
+QUERY_BATCH_SIZE = 5000
+
+# Sentinel of the entries not in the cache (``None`` is a valid value).
+_MISSING = object()
+
+CacheInfo = namedtuple(
+    "CacheInfo", ["hits", "misses", "stale", "evictions", "maxsize", "currsize"]
+)
+
+
+class NodeCache:
+    """Thread-safe LRU cache of node handles and values extracted from nodes.
+
+    Entries are keyed by the PK of the node, a name for the cached value and
+    the ``mtime`` of the node, which is checked with a lightweight projected
+    query on every lookup: a node modified since an entry was computed (e.g.
+    a workchain that finished) gives a miss, and the stale entry is replaced.
+    Entries older than ``ttl`` seconds expire regardless of ``mtime``. As a
+    hit still costs that query, the cache only pays off for values that are
+    expensive to compute, e.g. energies parsed from the retrieved files.
+
+    Usage::
+
+        energy = NODE_CACHE.get_or_compute(pk, "energy", compute_energy)
+
+    :param maxsize: maximum number of entries, the least recently used ones
+        being evicted first
+    :param ttl: lifetime of the entries in seconds, ``None`` for no expiry
+    :param clock: function returning the current time in seconds
+    """
+
+    def __init__(self, maxsize=4096, ttl=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()  # (pk, name) -> (mtime, time, value)
+        self._lock = threading.RLock()
+        self._hits = self._misses = self._stale = self._evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_or_compute(self, identifier, name, compute):
+        """Return a cached value for a node, computing it on a miss.
+
+        :param identifier: PK or UUID of the node
+        :param name: name of the value, e.g. ``"node"`` or ``"energy"``
+        :param compute: function of the node returning the value; exceptions
+            are propagated and not cached
+        :raises aiida.common.exceptions.NotExistent: if there is no such node
+        """
+        pk, mtime = _get_pk_mtime(identifier)
+        key = (pk, name)
+        with self._lock:
+            value = self._lookup(key, mtime, count=True)
+            node = self._lookup((pk, "node"), mtime) if name != "node" else None
+        if value is not _MISSING:
+            return value
+
+        if node is _MISSING or node is None:
+            node = load_node(pk)
+        value = node if name == "node" else compute(node)
+
+        with self._lock:
+            self._store(key, mtime, value)
+            if name != "node":
+                self._store((pk, "node"), mtime, node)
+        return value
+
+    def _lookup(self, key, mtime, count=False):
+        """Return a fresh entry, or ``_MISSING``; must be called with the lock."""
+        entry = self._entries.get(key)
+        fresh = (
+            entry is not None
+            and entry[0] == mtime
+            and (self.ttl is None or self._clock() - entry[1] <= self.ttl)
+        )
+        if fresh:
+            self._entries.move_to_end(key)
+        if count:
+            if fresh:
+                self._hits += 1
+            else:
+                self._misses += 1
+                self._stale += entry is not None
+        return entry[2] if fresh else _MISSING
+
+    def _store(self, key, mtime, value):
+        """Add an entry, evicting the least recently used ones; must hold the lock."""
+        self._entries[key] = (mtime, self._clock(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def invalidate(self, identifier=None):
+        """Drop the entries of a node (PK or UUID), or all of them."""
+        with self._lock:
+            if identifier is None:
+                self._entries.clear()
+                return
+            pk = _get_pk_mtime(identifier)[0]
+            for key in [key for key in self._entries if key[0] == pk]:
+                del self._entries[key]
+
+    def cache_info(self):
+        """Return the hit, miss, stale and eviction counts and the size."""
+        with self._lock:
+            return CacheInfo(
+                self._hits,
+                self._misses,
+                self._stale,
+                self._evictions,
+                self.maxsize,
+                len(self._entries),
+            )
+
+    def reset_stats(self):
+        """Set the hit, miss, stale and eviction counts to zero."""
+        with self._lock:
+            self._hits = self._misses = self._stale = self._evictions = 0
+
+
+# Cache shared by the getters of this module.
+NODE_CACHE = NodeCache()
+
+
+def load_node_cached(identifier):
+    """Load a node through ``NODE_CACHE``, avoiding repeated full loads.
+
+    :param identifier: PK or UUID of the node
+    """
+    return NODE_CACHE.get_or_compute(identifier, "node", None)
+
+
+@instrumented
+def get_energy_from_pk(input_pk, use_cache=False):
+    """Get the final energy of a VASP or Quantum ESPRESSO relaxation.
+
+    The energy is read from the output dictionary of the workchain (see
+    ``ENERGY_OUTPUTS``) and, if there is none, from the last ionic step of the
+    output files retrieved by its last calculation. For both codes, it is the
+    energy extrapolated to sigma -> 0 (see ``SMEARING_OUTPUTS``).
+
+    :param input_pk: PK (or UUID) of the workchain (or calculation)
+    :param use_cache: ``True`` to look up and store the energy in
+        ``NODE_CACHE``, or a :class:`NodeCache` to use instead. Off by default,
+        as every lookup queries the ``mtime`` of the node, so a miss costs one
+        more query than loading the node directly.
+    :returns: final energy in eV
+    :raises aiida.common.exceptions.NotExistentAttributeError: if the node has
+        no energy output nor parsable retrieved files
+    """
+    if isinstance(use_cache, NodeCache):
+        return use_cache.get_or_compute(input_pk, "energy", _get_energy)
+    if use_cache:
+        return NODE_CACHE.get_or_compute(input_pk, "energy", _get_energy)
+    return _get_energy(load_node(input_pk))
+
+
+def _get_energy(wc_node):
+    """Get the final energy of a loaded workchain or calculation node."""
+    for label, path in ENERGY_OUTPUTS.items():
+        if label in wc_node.outputs:
+            parameters = wc_node.outputs[label].get_dict()
+            final_energy = parameters
+            for key in path:
+                final_energy = final_energy[key]
+            if label in SMEARING_OUTPUTS:
+                smearing = parameters
+                for key in SMEARING_OUTPUTS[label]:
+                    smearing = smearing.get(key) if smearing else None
+                final_energy = extrapolate_energy(final_energy, smearing)
+            return final_energy
+
+    step = get_last_ionic_step(wc_node)
+    if step is None or step.energy_extrapolated is None:
+        raise NotExistentAttributeError(
+            f"Node<{wc_node.pk}> has no energy output nor parsable retrieved files."
+        )
+    return step.energy_extrapolated
+
+
+def iter_ionic_steps(node):
+    """Yield the ionic steps of the last calculation run by ``node``.
+
+    The files retrieved by the calculation are streamed with the VASP or pw.x
+    parser, depending on which output files are present, so both codes give
+    the same :class:`~aiida_cattools.utils.steps.IonicStep` records.
+
+    :param node: workchain or calculation node
+    """
+    retrieved = get_retrieved(node)
+    if retrieved is None:
+        return iter(())
+
+    for module in (vasp, qe):
+        if any(has_output(retrieved, name) for name in module.OUTPUT_FILES):
+            return module.iter_ionic_steps(retrieved)
+    return iter(())
+
+
+@instrumented
+def get_retrieved(node):
+    """Return the ``retrieved`` folder of the last calculation run by ``node``.
+
+    :param node: workchain or calculation node
+    :returns: :class:`aiida.orm.FolderData`, or ``None`` if no calculation
+        retrieved any file
+    """
+    calcs = [node] if isinstance(node, CalcJobNode) else []
+    calcs += sorted(
+        (n for n in node.called_descendants if isinstance(n, CalcJobNode)),
+        key=lambda n: n.ctime,
+    )
+    calcs = [calc for calc in calcs if "retrieved" in calc.outputs]
+    return calcs[-1].outputs.retrieved if calcs else None
+
+
+@instrumented
+def get_last_ionic_step(node):
+    """Return the last ionic step of the last calculation run by ``node``, if any."""
+    step = None
+    for step in iter_ionic_steps(node):
         pass
+    return step
+
+
+@instrumented
+def get_energies_from_pks(input_pks, batch_size=QUERY_BATCH_SIZE):
+    """Get the final energies of many workchains with one query per batch.
+
+    Instead of loading every workchain node and its output dictionary, the
+    energy is projected directly from the attributes of the ``misc`` (VASP) or
+    ``output_parameters`` (Quantum ESPRESSO) output, with the smearing
+    contribution of the latter (see ``SMEARING_OUTPUTS``), so the database is
+    hit once per ``batch_size`` PKs.
+
+    :param input_pks: iterable with the PKs of the workchains
+    :param batch_size: maximum number of PKs per query
+    :returns: tuple ``(energies, missing)``, where ``energies`` maps each PK to
+        its final energy and ``missing`` maps the PKs without an energy to the
+        reason why it could not be retrieved
+    :rtype: tuple(dict, dict)
+    """
+    pks = list(dict.fromkeys(int(pk) for pk in input_pks))
+    energies = {}
+
+    for start in range(0, len(pks), batch_size):
+        batch = pks[start : start + batch_size]
+        qb = QueryBuilder()
+        qb.append(WorkflowNode, filters={"id": {"in": batch}}, project=["id"], tag="wc")
+        qb.append(
+            Dict,
+            with_incoming="wc",
+            edge_filters={"label": {"in": list(ENERGY_OUTPUTS)}},
+            edge_project=["label"],
+            edge_tag="link",
+            project=[
+                _attribute_path(path)
+                for path in [*ENERGY_OUTPUTS.values(), *SMEARING_OUTPUTS.values()]
+            ],
+            tag="output",
+        )
+        for row in qb.iterdict():
+            label = row["link"]["label"]
+            value = row["output"][_attribute_path(ENERGY_OUTPUTS[label])]
+            if value is not None and label in SMEARING_OUTPUTS:
+                smearing = row["output"][_attribute_path(SMEARING_OUTPUTS[label])]
+                value = extrapolate_energy(value, smearing)
+            if value is not None:
+                energies[row["wc"]["id"]] = value
+
+    missing = {}
+    if len(energies) < len(pks):
+        found = _existing_workflow_pks([pk for pk in pks if pk not in energies])
+        for pk in pks:
+            if pk in energies:
+                continue
+            if pk not in found:
+                missing[pk] = "no workchain with this PK"
+            else:
+                missing[pk] = "no energy in outputs " + " or ".join(
+                    f"'{label}'" for label in ENERGY_OUTPUTS
+                )
+
+    return energies, missing
+
+
+def _attribute_path(path):
+    """Return the ``QueryBuilder`` projection of a nested attribute."""
+    return "attributes." + ".".join(path)
+
+
+def _existing_workflow_pks(pks, batch_size=QUERY_BATCH_SIZE):
+    """Return the subset of ``pks`` that correspond to workflow nodes."""
+    found = set()
+    for start in range(0, len(pks), batch_size):
+        qb = QueryBuilder()
+        qb.append(
+            WorkflowNode,
+            filters={"id": {"in": pks[start : start + batch_size]}},
+            project=["id"],
+        )
+        found.update(qb.all(flat=True))
+    return found
+
 
-    return final_energy
+def _get_pk_mtime(identifier):
+    """Return the PK and modification time of a node, without loading it."""
+    field = "id" if isinstance(identifier, Integral) else "uuid"
+    identifier = int(identifier) if field == "id" else str(identifier)
+    qb = QueryBuilder()
+    qb.append(Node, filters={field: identifier}, project=["id", "mtime"])
+    row = qb.first()
+    if row is None:
+        raise NotExistent(f"No node with {field} {identifier}")
+    return tuple(row)
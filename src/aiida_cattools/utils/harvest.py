@@ -0,0 +1,166 @@
+"""Concurrent harvesting of the final energies of many workchains with asyncio.
+
+The energies found in the output dictionaries are collected first, with one
+query per batch (see :func:`~aiida_cattools.utils.getters.get_energies_from_pks`).
+For the other workchains, the output file of their last calculation is copied
+out of the repository by a single I/O thread, as the ORM and the repository
+are not shared between threads, while the files copied before are parsed by a
+pool of worker processes. Reading and parsing thus overlap, and the results
+are yielded as soon as they are ready, in no particular order.
+"""
+import asyncio
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+from aiida.common.exceptions import NotExistent
+from aiida.orm import load_node
+
+from . import qe, vasp
+from .getters import QUERY_BATCH_SIZE, get_energies_from_pks, get_retrieved
+from .instrument import instrumented
+
+# Parsers of the output files, in the order in which they are looked for
+PARSERS = {"vasp": vasp, "qe": qe}
+MAX_CONCURRENCY = 8
+
+Harvested = namedtuple("Harvested", ["pk", "energy", "error"])
+Harvested.__doc__ = "Final energy of a workchain, or the reason why there is none."
+
+
+async def iter_energies(
+    pks, max_concurrency=MAX_CONCURRENCY, executor=None, batch_size=QUERY_BATCH_SIZE
+):
+    """Yield the final energies of many workchains as they become available.
+
+    Usage::
+
+        async for pk, energy, error in iter_energies(pks):
+            ...
+
+    :param pks: iterable with the PKs of the workchains
+    :param max_concurrency: maximum number of output files being copied or
+        parsed at the same time
+    :param executor: :class:`concurrent.futures.Executor` parsing the files; a
+        pool of ``max_concurrency`` processes (at most one per CPU) is created
+        and shut down by default
+    :param batch_size: maximum number of PKs per query
+    :returns: asynchronous generator of :class:`Harvested` tuples, whose
+        ``energy`` is ``None`` if there is an ``error``
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+    loop = asyncio.get_running_loop()
+    io_executor = ThreadPoolExecutor(max_workers=1)
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(
+            max_workers=min(max_concurrency, os.cpu_count() or 1),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    tasks = set()
+    folder = tempfile.mkdtemp(prefix="cattools-harvest-")
+
+    async def harvest(pk, reason):
+        directory = os.path.join(folder, str(pk))
+        os.mkdir(directory)
+        try:
+            name = await loop.run_in_executor(io_executor, _copy_output, pk, directory)
+            if name is None:
+                return Harvested(pk, None, reason)
+            energy = await loop.run_in_executor(
+                executor, _parse_energy, name, directory
+            )
+        except Exception as exception:  # pylint: disable=broad-except
+            return Harvested(pk, None, f"{type(exception).__name__}: {exception}")
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        if energy is None:
+            return Harvested(pk, None, f"no energy in the {name} output files")
+        return Harvested(pk, energy, None)
+
+    try:
+        energies, missing = await loop.run_in_executor(
+            io_executor, get_energies_from_pks, pks, batch_size
+        )
+        for pk, energy in energies.items():
+            yield Harvested(pk, energy, None)
+
+        todo = iter(missing.items())
+        while True:
+            for pk, reason in todo:
+                tasks.add(loop.create_task(harvest(pk, reason)))
+                if len(tasks) >= max_concurrency:
+                    break
+            if not tasks:
+                break
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+        io_executor.shutdown(wait=True)
+        if own_executor:
+            executor.shutdown(wait=True)
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+@instrumented
+def harvest_energies(pks, max_concurrency=MAX_CONCURRENCY, executor=None):
+    """Get the final energies of many workchains concurrently.
+
+    Blocking wrapper of :func:`iter_energies`, for use outside of an event
+    loop (in a running loop, e.g. a Jupyter notebook, iterate over
+    :func:`iter_energies` instead).
+
+    :returns: tuple ``(energies, missing)``, as
+        :func:`~aiida_cattools.utils.getters.get_energies_from_pks`, but with
+        the energies parsed from the retrieved files as well
+    :rtype: tuple(dict, dict)
+    """
+
+    async def collect():
+        energies, missing = {}, {}
+        async for pk, energy, error in iter_energies(pks, max_concurrency, executor):
+            if error is None:
+                energies[pk] = energy
+            else:
+                missing[pk] = error
+        return energies, missing
+
+    return asyncio.run(collect())
+
+
+def _copy_output(pk, directory):
+    """Copy the output file of the last calculation of a workchain to ``directory``.
+
+    :returns: the key of the parser of the file in ``PARSERS``, or ``None`` if
+        there is no node or no output file
+    """
+    try:
+        retrieved = get_retrieved(load_node(pk))
+    except NotExistent:
+        return None
+    if retrieved is None:
+        return None
+    names = set(retrieved.base.repository.list_object_names())
+    for name, module in PARSERS.items():
+        for filename in module.OUTPUT_FILES:
+            if filename in names:
+                with retrieved.base.repository.open(filename, "rb") as source:
+                    with open(os.path.join(directory, filename), "wb") as target:
+                        shutil.copyfileobj(source, target)
+                return name
+    return None
+
+
+def _parse_energy(name, directory):
+    """Return the energy (sigma -> 0) of the last ionic step in ``directory``."""
+    step = None
+    for step in PARSERS[name].iter_ionic_steps(directory):
+        pass
+    return None if step is None else step.energy_extrapolated
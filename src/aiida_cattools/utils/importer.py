@@ -0,0 +1,348 @@
+"""Bulk import of legacy (pre-AiiDA) VASP and Quantum ESPRESSO calculation folders.
+
+The folders are parsed in a process pool with the streaming parsers of
+:mod:`aiida_cattools.utils.vasp` and :mod:`aiida_cattools.utils.qe`, while the
+main process stores the optional structure nodes in batched transactions and
+appends every imported folder to a JSON-lines manifest, so that an interrupted
+import can be resumed without parsing the same folders again. The structure
+nodes of the folders that are not in the manifest yet, because the import was
+interrupted right after storing them, are found by their ``former_path`` extra
+and reused instead of being stored twice.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+import json
+import os
+from pathlib import Path
+import re
+import uuid
+
+import pandas as pd
+
+from aiida.common.constants import elements
+from aiida.manage import get_manager
+from aiida.orm import QueryBuilder
+from aiida.orm.nodes.data.structure import get_formula
+
+from . import qe, vasp
+from ..data.collection import Collection
+
+# Number of bytes at the start of a file checked to recognize a pw.x output.
+QE_HEADER_SIZE = 4096
+QE_STDOUT_SUFFIXES = (".out", ".log")
+
+_ELEMENTS = {element["symbol"] for element in elements.values()}
+
+# Workchain type of the simulations imported from the folders of each code
+CODE_WC_TYPES = {"vasp": "vasp.relax", "qe": "quantumespresso.pw.relax"}
+
+
+def find_calculation_dirs(root):
+    """Walk ``root`` and yield ``(path, code)`` for every VASP or pw.x folder.
+
+    :param root: top directory of the legacy calculations
+    :returns: generator of ``(pathlib.Path, str)`` tuples, ``code`` being
+        ``"vasp"`` or ``"qe"``
+    """
+    for dirpath, _, filenames in os.walk(root):
+        if any(name in filenames for name in vasp.OUTPUT_FILES):
+            yield Path(dirpath), "vasp"
+        elif _find_qe_stdout(dirpath, filenames) or qe.XML in filenames:
+            yield Path(dirpath), "qe"
+
+
+def parse_calculation(path, code):
+    """Parse the final state of a legacy calculation folder.
+
+    Runs in the worker processes, so it does not access the AiiDA database.
+
+    :param path: calculation folder
+    :param code: ``"vasp"`` or ``"qe"``
+    :returns: dictionary with the ``Simulation`` fields found in the folder
+        (including a new ``global_uuid``, kept in the manifest), the ``code``
+        and the final structure, or with an ``error`` key if the folder could
+        not be parsed
+    """
+    path = Path(path).resolve()
+    result = {
+        "global_uuid": str(uuid.uuid4()),
+        "former_path": str(path),
+        "label": path.name,
+        "code": code,
+        "wc_type": CODE_WC_TYPES[code],
+    }
+    try:
+        kinds = None
+        if code == "vasp":
+            steps = vasp.iter_ionic_steps(path)
+            symbols = _vasp_symbols(path)
+        else:
+            stdout = _find_qe_stdout(path, os.listdir(path))
+            if stdout:
+                steps = qe.iter_stdout_steps(path / stdout)
+                symbols, kinds = _qe_symbols(path / stdout) or (None, None)
+            else:
+                steps = qe.iter_xml_steps(path)
+                symbols = None
+
+        last = None
+        num_steps = 0
+        for last in steps:
+            num_steps += 1
+        if last is None or last.energy_extrapolated is None:
+            raise ValueError("no completed ionic step")
+    except Exception as exception:  # pylint: disable=broad-except
+        result["error"] = _format_error(exception)
+        return result
+
+    result["final_energy"] = last.energy_extrapolated
+    result["num_steps"] = num_steps
+    if (
+        symbols
+        and last.cell is not None
+        and last.positions is not None
+        and len(symbols) == len(last.positions)
+    ):
+        result["chem_formula"] = get_formula(symbols, mode="hill")
+        result["structure"] = {
+            "cell": last.cell.tolist(),
+            "symbols": symbols,
+            "kinds": kinds or symbols,
+            "positions": last.positions.tolist(),
+        }
+    return result
+
+
+def import_calculations(  # pylint: disable=too-many-arguments,too-many-locals
+    root,
+    manifest=None,
+    max_workers=None,
+    batch_size=500,
+    structure_class=None,
+    chunksize=16,
+):
+    """Import a tree of legacy calculation folders as a collection of simulations.
+
+    :param root: top directory of the legacy calculations
+    :param manifest: path to a JSON-lines file recording the imported folders.
+        Folders already in the manifest are not parsed again, and their rows
+        are included in the returned collection.
+    :param max_workers: number of worker processes (``1`` parses in-process)
+    :param batch_size: number of folders whose nodes are stored per transaction
+        and appended to the manifest at once
+    :param structure_class: if given, a ``StructureData`` subclass (e.g.
+        :class:`~aiida_cattools.data.support.Support`) used to store the final
+        structure of every folder; its UUID is added as ``structure_uuid``
+    :param chunksize: number of folders sent to a worker at once
+    :returns: tuple ``(collection, failures)``, ``failures`` mapping the
+        (resolved) folders that could not be parsed or stored to the error
+    :rtype: tuple(:class:`~aiida_cattools.data.collection.Collection`, dict)
+    """
+    rows = _read_manifest(manifest) if manifest else []
+    done = {str(Path(row["former_path"]).resolve()) for row in rows}
+    todo = [
+        (path, code)
+        for path, code in find_calculation_dirs(root)
+        if str(path.resolve()) not in done
+    ]
+
+    failures = {}
+    batch = []
+
+    def flush():
+        imported = _store_batch(batch, structure_class, failures)
+        if manifest:
+            _append_manifest(manifest, imported)
+        rows.extend(imported)
+        batch.clear()
+
+    paths, codes = [path for path, _ in todo], [code for _, code in todo]
+    executor = ProcessPoolExecutor(max_workers) if max_workers != 1 else None
+    with executor or nullcontext():
+        if executor is None:
+            results = map(parse_calculation, paths, codes)
+        else:
+            results = executor.map(parse_calculation, paths, codes, chunksize=chunksize)
+        for result in results:
+            if "error" in result:
+                failures[result["former_path"]] = result["error"]
+                continue
+            batch.append(result)
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+
+    return Collection(pd.DataFrame(rows)), failures
+
+
+def _store_batch(batch, structure_class, failures):
+    """Store the structure nodes of a batch of parsed folders in one transaction.
+
+    The folders whose structure cannot be created or stored are added to
+    ``failures`` instead of aborting the import, and so are all the folders
+    with a structure if the transaction fails.
+
+    :returns: the rows of the imported folders
+    """
+    rows = []
+    nodes = []
+    stored = (
+        {}
+        if structure_class is None
+        else _stored_structures(
+            structure_class,
+            [result["former_path"] for result in batch if "structure" in result],
+        )
+    )
+    for result in batch:
+        row = dict(result)
+        structure = row.pop("structure", None)
+        if structure_class is not None and structure is not None:
+            if row["former_path"] in stored:
+                row["structure_uuid"] = stored[row["former_path"]]
+            else:
+                try:
+                    node = _create_structure(structure_class, structure, row)
+                except Exception as exception:  # pylint: disable=broad-except
+                    failures[row["former_path"]] = _format_error(exception)
+                    continue
+                nodes.append((row, node))
+                row["structure_uuid"] = node.uuid
+        rows.append(row)
+
+    if not nodes:
+        return rows
+    try:
+        with get_manager().get_profile_storage().transaction():
+            for _, node in nodes:
+                node.store()
+    except Exception as exception:  # pylint: disable=broad-except
+        # nothing of the batch was stored: its folders are imported on resume
+        for row, _ in nodes:
+            failures[row["former_path"]] = _format_error(exception)
+            rows.remove(row)
+    return rows
+
+
+def _create_structure(structure_class, structure, row):
+    """Create the (unstored) structure node of a parsed folder."""
+    node = structure_class(cell=structure["cell"])
+    for symbol, kind, position in zip(
+        structure["symbols"], structure["kinds"], structure["positions"]
+    ):
+        node.append_atom(position=position, symbols=symbol, name=kind)
+    node.label = row["label"]
+    node.base.extras.set_many(
+        {"former_path": row["former_path"], "final_energy": row["final_energy"]}
+    )
+    return node
+
+
+def _stored_structures(structure_class, paths):
+    """Return the UUIDs of the structures already stored for folders, by path."""
+    if not paths:
+        return {}
+    qb = QueryBuilder()
+    qb.append(
+        structure_class,
+        filters={"extras.former_path": {"in": paths}},
+        project=["extras.former_path", "uuid"],
+    )
+    return dict(qb.all())
+
+
+def _format_error(exception):
+    return f"{type(exception).__name__}: {exception}"
+
+
+def _read_manifest(manifest):
+    """Read the rows of the folders imported in previous runs."""
+    if not os.path.exists(manifest):
+        return []
+    with open(manifest, encoding="utf8") as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+def _append_manifest(manifest, rows):
+    """Append rows to the manifest and make sure they reach the disk."""
+    with open(manifest, "a", encoding="utf8") as handle:
+        for row in rows:
+            handle.write(json.dumps(row) + "\n")
+        handle.flush()
+        os.fsync(handle.fileno())
+
+
+def _find_qe_stdout(dirpath, filenames):
+    """Return the name of the pw.x standard output in a folder, if any."""
+    for name in sorted(filenames):
+        if not name.endswith(QE_STDOUT_SUFFIXES):
+            continue
+        with open(os.path.join(dirpath, name), "rb") as handle:
+            if b"Program PWSCF" in handle.read(QE_HEADER_SIZE):
+                return name
+    return None
+
+
+def _vasp_symbols(path):
+    """Read the chemical symbols of a VASP calculation from its OUTCAR or CONTCAR."""
+    outcar = path / vasp.OUTCAR
+    if outcar.is_file():
+        types = []
+        with open(outcar, "rb") as handle:
+            for line in handle:
+                if line.lstrip().startswith(b"VRHFIN"):
+                    types.append(line.split(b"=")[1].split(b":")[0].strip().decode())
+                elif b"ions per type" in line:
+                    counts = [int(n) for n in line.split(b"=")[1].split()]
+                    return [t for t, n in zip(types, counts) for _ in range(n)]
+
+    for name in ("CONTCAR", "POSCAR"):
+        if (path / name).is_file():
+            with open(path / name, encoding="utf8") as handle:
+                lines = [handle.readline() for _ in range(7)]
+            types, counts = lines[5].split(), lines[6].split()
+            if counts and all(count.isdigit() for count in counts):
+                return [t for t, n in zip(types, counts) for _ in range(int(n))]
+    return None
+
+
+def _qe_symbols(stdout):
+    """Read the chemical symbols and species of the atoms of a pw.x output.
+
+    The atomic positions block gives the species label of every atom (e.g.
+    ``Fe1``), which is mapped to its element with the pseudopotential column
+    of the atomic species table, e.g. ``Fe1  16.00  55.84500  Fe( 1.00)``.
+
+    :returns: tuple ``(symbols, kinds)``, or ``None`` if there are no positions
+    :raises ValueError: if the element of a species cannot be determined
+    """
+    species = {}
+    kinds = []
+    in_species = False
+    with open(stdout, "rb") as handle:
+        for line in handle:
+            if b"atomic species" in line and b"pseudopotential" in line:
+                in_species = True
+            elif in_species:
+                columns = line.decode().split()
+                if len(columns) < 4:
+                    in_species = False
+                else:
+                    species[columns[0]] = " ".join(columns[3:]).split("(")[0].strip()
+            elif b"tau(" in line:
+                kinds.append(line.split()[1].decode())
+            elif kinds:
+                break
+    if not kinds:
+        return None
+    return [species.get(kind) or _species_element(kind) for kind in kinds], kinds
+
+
+def _species_element(label):
+    """Return the element of a species label, e.g. ``Fe`` for ``Fe1`` or ``fe_up``."""
+    letters = re.match(r"[A-Za-z]*", label).group()
+    for candidate in (letters[:2], letters[:1]):
+        if candidate.capitalize() in _ELEMENTS:
+            return candidate.capitalize()
+    raise ValueError(f"Cannot determine the element of the species '{label}'")
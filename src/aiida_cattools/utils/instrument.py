@@ -0,0 +1,366 @@
+"""Opt-in instrumentation of the queries, repository reads and time of operations.
+
+Usage::
+
+    with instrument("harvest") as report:
+        collection = Collection.from_workchains(group)
+    print(report.format())
+
+While an :func:`instrument` block is active, the calls to ``load_node``, the
+``QueryBuilder`` queries and the rows they return, the SQL statements sent to
+the database and the bytes read from the file repository are counted. The
+functions decorated with :func:`instrumented` (getters, collection builders,
+parsers and CLI commands) record these counts per operation and emit one
+structured log event per call to the ``aiida.cattools`` logger, so that a
+query per row (N+1) pattern shows up as an operation with as many queries as
+rows. Outside of such a block, the decorated functions only check a list and
+the database layer is not patched at all.
+"""
+import contextlib
+from dataclasses import asdict, dataclass, fields
+import functools
+import inspect
+import threading
+import time
+
+from aiida.common.log import AIIDA_LOGGER
+
+LOGGER = AIIDA_LOGGER.getChild("cattools")
+COUNTERS = ("load_node", "queries", "rows", "sql", "repository_bytes")
+
+_MISSING = object()
+_LOCK = threading.RLock()
+_COUNTS = dict.fromkeys(COUNTERS, 0)
+# Reports of the active ``instrument`` blocks, and functions undoing the patches
+_ACTIVE = []
+_UNPATCH = []
+
+
+@dataclass
+class Stats:
+    """Counts and wall time (in seconds) of the calls of an operation.
+
+    The counts of an operation include those of the operations it calls.
+    """
+
+    calls: int = 0
+    load_node: int = 0
+    queries: int = 0
+    rows: int = 0
+    sql: int = 0
+    repository_bytes: int = 0
+    wall_time: float = 0.0
+
+    def update(self, other):
+        """Add the counts of another :class:`Stats`."""
+        for field in fields(self):
+            setattr(
+                self, field.name, getattr(self, field.name) + getattr(other, field.name)
+            )
+
+
+class Report:
+    """Counts of an :func:`instrument` block, in total and per operation.
+
+    :ivar total: :class:`Stats` of the whole block
+    :ivar operations: mapping of operation names to their :class:`Stats`
+    """
+
+    HEADERS = ("calls", "load_node", "queries", "rows", "sql", "repo bytes", "time [s]")
+
+    def __init__(self, name):
+        self.name = name
+        self.total = Stats()
+        self.operations = {}
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.name!r}, {self.total})"
+
+    def as_dict(self):
+        """Return the report as a JSON-serializable dictionary."""
+        return {
+            "name": self.name,
+            "total": asdict(self.total),
+            "operations": {
+                name: asdict(stats) for name, stats in self.operations.items()
+            },
+        }
+
+    def format(self):
+        """Return the report as a table, the slowest operations first."""
+        rows = sorted(self.operations.items(), key=lambda item: -item[1].wall_time)
+        rows.append((f"total ({self.name})", self.total))
+        width = max(len(name) for name, _ in rows)
+        lines = [
+            f"{'operation':<{width}}  " + "  ".join(f"{h:>10}" for h in self.HEADERS)
+        ]
+        for name, stats in rows:
+            values = [getattr(stats, field.name) for field in fields(stats)]
+            cells = [f"{value:>10}" for value in values[:-1]]
+            cells.append(f"{values[-1]:>10.3f}")
+            lines.append(f"{name:<{width}}  " + "  ".join(cells))
+        return "\n".join(lines)
+
+
+@contextlib.contextmanager
+def instrument(name="cattools"):
+    """Count the queries, rows, repository bytes and time of the enclosed code.
+
+    Blocks can be nested and used from several threads; every block gets the
+    counts of everything that ran while it was active.
+
+    :param name: name of the block in the report and log event
+    :returns: context manager yielding the :class:`Report` of the block, which
+        is complete when the block exits
+    """
+    report = Report(name)
+    with _LOCK:
+        if not _ACTIVE:
+            _patch()
+        _ACTIVE.append(report)
+    start = _snapshot()
+    try:
+        yield report
+    finally:
+        stats = _elapsed(start)
+        report.total.update(stats)
+        with _LOCK:
+            _ACTIVE.remove(report)
+            if not _ACTIVE:
+                _unpatch()
+        _log(name, stats)
+
+
+def instrumented(func):
+    """Record the calls of a function (or generator) as an operation.
+
+    The operation is named after the module (without the package prefix) and
+    qualified name of the function, e.g. ``utils.getters.get_energy_from_pk``.
+    For generators, only the time spent producing the items is counted.
+    """
+    module = func.__module__.split(".", 1)[-1]
+    name = f"{module}.{func.__qualname__}"
+
+    if inspect.isgeneratorfunction(func):
+
+        @functools.wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            if not _ACTIVE:
+                return (yield from func(*args, **kwargs))
+            stats = Stats()
+            generator = func(*args, **kwargs)
+            try:
+                while True:
+                    start = _snapshot()
+                    try:
+                        item = next(generator)
+                    except StopIteration as stop:
+                        return stop.value
+                    finally:
+                        stats.update(_elapsed(start, calls=0))
+                    yield item
+            finally:
+                generator.close()
+                stats.calls = 1
+                _record(name, stats)
+
+        return generator_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _ACTIVE:
+            return func(*args, **kwargs)
+        start = _snapshot()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _record(name, _elapsed(start))
+
+    return wrapper
+
+
+def _count(counter, value=1):
+    with _LOCK:
+        _COUNTS[counter] += value
+
+
+def _snapshot():
+    with _LOCK:
+        return dict(_COUNTS), time.perf_counter()
+
+
+def _elapsed(start, calls=1):
+    """Return the :class:`Stats` since a snapshot."""
+    counts, end = _snapshot()
+    before, started = start
+    return Stats(
+        calls=calls,
+        wall_time=end - started,
+        **{counter: counts[counter] - before[counter] for counter in COUNTERS},
+    )
+
+
+def _record(name, stats):
+    """Add the stats of an operation to the active reports and log them."""
+    with _LOCK:
+        for report in _ACTIVE:
+            report.operations.setdefault(name, Stats()).update(stats)
+    _log(name, stats)
+
+
+def _log(name, stats):
+    event = {"operation": name, **asdict(stats)}
+    LOGGER.info(
+        "%s: %d queries, %d rows, %d load_node, %d SQL, %d repository bytes, %.3f s",
+        name,
+        stats.queries,
+        stats.rows,
+        stats.load_node,
+        stats.sql,
+        stats.repository_bytes,
+        stats.wall_time,
+        extra={"cattools_event": event},
+    )
+
+
+def _patch():
+    """Wrap the entry points of the database and repository with counters."""
+    # pylint: disable=import-outside-toplevel
+    from sqlalchemy import event
+
+    from aiida.manage import get_manager
+    from aiida.orm.utils.loaders import NodeEntityLoader
+    from aiida.repository.repository import Repository
+
+    storage = get_manager().get_profile_storage()
+
+    load_entity = NodeEntityLoader.load_entity.__func__
+
+    def counted_load_entity(cls, *args, **kwargs):
+        _count("load_node")
+        return load_entity(cls, *args, **kwargs)
+
+    _replace(NodeEntityLoader, "load_entity", classmethod(counted_load_entity))
+
+    query_class = type(storage.query())
+    for method in ("iterall", "iterdict"):
+        _replace(query_class, method, _counted_iterator(getattr(query_class, method)))
+    first = query_class.first
+
+    def counted_first(self, *args, **kwargs):
+        _count("queries")
+        row = first(self, *args, **kwargs)
+        _count("rows", row is not None)
+        return row
+
+    _replace(query_class, "first", counted_first)
+    count = query_class.count
+
+    def counted_count(self, *args, **kwargs):
+        _count("queries")
+        return count(self, *args, **kwargs)
+
+    _replace(query_class, "count", counted_count)
+
+    open_object = Repository.open
+    get_object_content = Repository.get_object_content
+
+    @contextlib.contextmanager
+    def counted_open(self, path):
+        with open_object(self, path) as handle:
+            yield _CountingReader(handle)
+
+    def counted_get_object_content(self, path):
+        content = get_object_content(self, path)
+        _count("repository_bytes", len(content))
+        return content
+
+    _replace(Repository, "open", counted_open)
+    _replace(Repository, "get_object_content", counted_get_object_content)
+
+    engine = storage.get_session().get_bind()
+
+    def count_statement(*_):
+        _count("sql")
+
+    event.listen(engine, "before_cursor_execute", count_statement)
+    _UNPATCH.append(
+        lambda: event.remove(engine, "before_cursor_execute", count_statement)
+    )
+
+
+def _unpatch():
+    while _UNPATCH:
+        _UNPATCH.pop()()
+
+
+def _replace(owner, name, value):
+    """Set an attribute of a class, remembering how to restore it."""
+    original = owner.__dict__.get(name, _MISSING)
+    setattr(owner, name, value)
+
+    def restore():
+        if original is _MISSING:
+            delattr(owner, name)
+        else:
+            setattr(owner, name, original)
+
+    _UNPATCH.append(restore)
+
+
+def _counted_iterator(method):
+    @functools.wraps(method)
+    def counted(self, *args, **kwargs):
+        _count("queries")
+        for row in method(self, *args, **kwargs):
+            _count("rows")
+            yield row
+
+    return counted
+
+
+class _CountingReader:
+    """Binary file handle counting the bytes read through it."""
+
+    def __init__(self, handle):
+        self._handle = handle
+
+    def __getattr__(self, name):
+        return getattr(self._handle, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._handle.close()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = next(self._handle)
+        _count("repository_bytes", len(line))
+        return line
+
+    def _counted(self, data):
+        _count("repository_bytes", len(data))
+        return data
+
+    def read(self, *args):
+        return self._counted(self._handle.read(*args))
+
+    def read1(self, *args):
+        return self._counted(self._handle.read1(*args))
+
+    def readline(self, *args):
+        return self._counted(self._handle.readline(*args))
+
+    def readlines(self, *args):
+        lines = self._handle.readlines(*args)
+        _count("repository_bytes", sum(len(line) for line in lines))
+        return lines
+
+    def readinto(self, buffer):
+        count = self._handle.readinto(buffer)
+        _count("repository_bytes", count or 0)
+        return count
@@ -0,0 +1,216 @@
+"""Streaming parsers for Quantum ESPRESSO (pw.x) output files.
+
+The parsers yield the same :class:`~aiida_cattools.utils.steps.IonicStep`
+records as :mod:`aiida_cattools.utils.vasp`, converted to the same units (eV,
+Angstrom, kbar), one per ionic step.
+"""
+from xml.etree.ElementTree import iterparse
+
+import numpy as np
+
+from .instrument import instrumented
+from .steps import (
+    IonicStep,
+    extrapolate_energy,
+    has_output,
+    iter_lines,
+    open_output,
+)
+
+STDOUT = "aiida.out"
+XML = "data-file-schema.xml"
+OUTPUT_FILES = (STDOUT, XML)
+
+RY_TO_EV = 13.605693122994
+BOHR_TO_ANGSTROM = 0.529177210903
+HA_TO_EV = 2 * RY_TO_EV
+HA_BOHR3_TO_KBAR = 294210.15697
+
+
+def iter_ionic_steps(source):
+    """Yield the ionic steps of a pw.x calculation.
+
+    The standard output is preferred, as the XML only contains the Fermi
+    energy and magnetization of the last step.
+
+    :param source: retrieved :class:`aiida.orm.FolderData` or path to the
+        calculation folder
+    """
+    if has_output(source, STDOUT):
+        return iter_stdout_steps(source)
+    return iter_xml_steps(source)
+
+
+@instrumented
+def iter_stdout_steps(source, filename=STDOUT):
+    """Yield the ionic steps of a pw.x standard output, reading it line by line.
+
+    :param source: retrieved :class:`aiida.orm.FolderData`, path to the
+        calculation folder or to the output file itself
+    :param filename: name of the output file inside ``source``
+    """
+    with open_output(source, filename) as handle:
+        lines = iter_lines(handle)
+        alat = None
+        cell = None
+        positions = None
+        step = IonicStep(index=0)
+        smearing = None
+
+        for line in lines:
+            if step.energy is not None and (
+                b"Self-consistent Calculation" in line
+                or line.startswith(b"ATOMIC_POSITIONS")
+                or line.startswith(b"CELL_PARAMETERS")
+            ):
+                yield _finalize(step, smearing)
+                step = IonicStep(index=step.index + 1)
+                smearing = None
+
+            if b"lattice parameter (alat)" in line:
+                alat = float(line.split(b"=")[1].split()[0]) * BOHR_TO_ANGSTROM
+            elif b"crystal axes: (cart. coord. in units of alat)" in line:
+                cell = alat * np.array([_parenthesized(next(lines)) for _ in range(3)])
+            elif b"site n." in line and b"positions (alat units)" in line:
+                positions = []
+                for row in lines:
+                    if b"tau(" not in row:
+                        break
+                    positions.append(_parenthesized(row))
+                positions = alat * np.array(positions)
+            elif line.startswith(b"CELL_PARAMETERS"):
+                rows = np.array([next(lines).split()[:3] for _ in range(3)], float)
+                cell = rows * _unit(line, alat)
+            elif line.startswith(b"ATOMIC_POSITIONS"):
+                rows = []
+                for row in lines:
+                    tokens = row.split()
+                    if len(tokens) < 4 or row.startswith(b"End"):
+                        break
+                    rows.append(tokens[1:4])
+                rows = np.array(rows, dtype=float)
+                positions = (
+                    rows @ cell if b"crystal" in line else rows * _unit(line, alat)
+                )
+            elif b"the Fermi energy is" in line:
+                step.fermi_energy = float(line.split(b"is")[1].split()[0])
+            elif b"total magnetization" in line:
+                step.magnetization = float(line.split(b"=")[1].split()[0])
+            elif line.startswith(b"!"):
+                step.energy = float(line.split(b"=")[1].split()[0]) * RY_TO_EV
+                step.positions, step.cell = positions, cell
+            elif b"smearing contrib. (-TS)" in line:
+                smearing = float(line.split(b"=")[1].split()[0]) * RY_TO_EV
+            elif b"Forces acting on atoms" in line:
+                forces = []
+                for row in lines:
+                    if b"force =" in row:
+                        forces.append(row.split(b"=")[1].split()[:3])
+                    elif forces:
+                        break
+                step.forces = np.array(forces, dtype=float) * (
+                    RY_TO_EV / BOHR_TO_ANGSTROM
+                )
+            elif b"total   stress" in line:
+                rows = [next(lines).split()[3:6] for _ in range(3)]
+                step.stress = np.array(rows, dtype=float)
+
+        if step.energy is not None:
+            yield _finalize(step, smearing)
+
+
+@instrumented
+def iter_xml_steps(source, filename=XML):
+    """Yield the ionic steps of a pw.x XML output with an incremental parser.
+
+    Every ``<step>`` element is discarded once parsed. The Fermi energy and
+    magnetization are only available for the last step.
+
+    :param source: retrieved :class:`aiida.orm.FolderData`, path to the
+        calculation folder or to the XML file itself
+    :param filename: name of the XML file inside ``source``
+    """
+    with open_output(source, filename) as handle:
+        stack = []
+        root = None
+        index = 0
+        last = None
+
+        for event, elem in iterparse(handle, events=("start", "end")):
+            if event == "start":
+                if root is None:
+                    root = elem
+                stack.append(elem.tag)
+                continue
+
+            stack.pop()
+            if elem.tag == "step" and len(stack) == 1:
+                if last is not None:
+                    yield last
+                last = _xml_step(elem, index)
+                index += 1
+                root.clear()
+            elif elem.tag == "output" and len(stack) == 1 and last is not None:
+                fermi = elem.find("band_structure/fermi_energy")
+                if fermi is not None:
+                    last.fermi_energy = float(fermi.text) * HA_TO_EV
+                magnetization = elem.find("magnetization/total")
+                if magnetization is not None:
+                    last.magnetization = float(magnetization.text)
+                elem.clear()
+
+        if last is not None:
+            yield last
+
+
+def _xml_step(elem, index):
+    """Convert a ``<step>`` element of the pw.x XML to an :class:`IonicStep`."""
+    step = IonicStep(index=index)
+    structure = elem.find("atomic_structure")
+    if structure is not None:
+        step.positions = BOHR_TO_ANGSTROM * np.array(
+            [atom.text.split() for atom in structure.iter("atom")], dtype=float
+        )
+        step.cell = BOHR_TO_ANGSTROM * np.array(
+            [structure.find(f"cell/a{i}").text.split() for i in (1, 2, 3)],
+            dtype=float,
+        )
+    etot = elem.find("total_energy/etot")
+    if etot is not None:
+        step.energy = float(etot.text) * HA_TO_EV
+        demet = elem.find("total_energy/demet")
+        smearing = None if demet is None else float(demet.text) * HA_TO_EV
+        _finalize(step, smearing)
+    forces = elem.find("forces")
+    if forces is not None:
+        step.forces = np.array(forces.text.split(), dtype=float).reshape(-1, 3) * (
+            HA_TO_EV / BOHR_TO_ANGSTROM
+        )
+    stress = elem.find("stress")
+    if stress is not None:
+        step.stress = (
+            np.array(stress.text.split(), dtype=float).reshape(3, 3) * HA_BOHR3_TO_KBAR
+        )
+    return step
+
+
+def _finalize(step, smearing):
+    """Set the sigma -> 0 energy from the smearing contribution (-TS)."""
+    step.energy_extrapolated = extrapolate_energy(step.energy, smearing)
+    return step
+
+
+def _parenthesized(line):
+    """Return the three numbers between the parentheses after the ``=`` of a line."""
+    return [float(x) for x in line.split(b"=")[1].split(b"(")[1].split(b")")[0].split()]
+
+
+def _unit(line, alat):
+    """Conversion factor to Angstrom for the unit of a card, e.g. ``(bohr)``."""
+    if b"bohr" in line:
+        return BOHR_TO_ANGSTROM
+    if b"alat" in line:
+        if b"=" in line:
+            return float(line.split(b"=")[1].strip(b" )\r\n")) * BOHR_TO_ANGSTROM
+        return alat
+    return 1.0
@@ -0,0 +1,254 @@
+"""Reference energies of gas-phase molecules and bulk metals, per functional.
+
+The references of a functional (e.g. H2, H2O and CO molecules and a bulk Pt
+cell) are turned into chemical potentials of the elements by solving the
+linear system of their stoichiometry matrix once. The reference energy of any
+formula is then the dot product of its composition with the chemical
+potentials, so the energies of a whole collection come from a single product
+of the composition matrix of its distinct formulas with the chemical
+potentials of every functional.
+"""
+from functools import lru_cache
+import re
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_FUNCTIONAL = "pbe"
+REFERENCE_KINDS = ("gas", "bulk")
+
+_TOKEN = re.compile(r"([A-Z][a-z]?|\(|\))(\d*)")
+
+
+@lru_cache(maxsize=None)
+def parse_formula(formula):
+    """Parse a chemical formula, e.g. ``"CH3OH"``, ``"Pt36"`` or ``"(CH3)2CO"``.
+
+    The results are cached, as the same few formulas are repeated over the
+    rows of a collection.
+
+    :param formula: formula string, the empty string being no atom at all
+    :returns: sorted tuple of ``(element, count)`` pairs
+    :raises ValueError: if the formula cannot be parsed
+    """
+    stack = [{}]
+    position = 0
+    for match in _TOKEN.finditer(formula):
+        token, count = match.groups()
+        if match.start() != position or (token == "(" and count):
+            break
+        if token == ")" and len(stack) == 1:
+            break
+        position = match.end()
+        count = int(count) if count else 1
+        if token == "(":
+            stack.append({})
+        elif token == ")":
+            group = stack.pop()
+            for element, number in group.items():
+                stack[-1][element] = stack[-1].get(element, 0) + number * count
+        else:
+            stack[-1][token] = stack[-1].get(token, 0) + count
+    if position != len(formula) or len(stack) != 1:
+        raise ValueError(f"Invalid chemical formula '{formula}'")
+    return tuple(sorted(stack[0].items()))
+
+
+class ReferenceEnergies:
+    """Registry of reference energies, from which chemical potentials are derived.
+
+    Every functional needs as many references as elements, such that their
+    stoichiometry matrix can be inverted: for instance H2, H2O and CO give the
+    chemical potentials of H, O and C, and bulk Pt the one of Pt.
+
+    Usage::
+
+        references = ReferenceEnergies()
+        references.add("H2", -6.77)
+        references.add("H2O", -14.22)
+        references.add("Pt4", -24.4, kind="bulk")  # energy of the bulk cell
+        references.get_energies(["OH", "H2O"])  # array([-10.84, -14.22])
+
+    :param references: mapping of functionals to mappings of formulas to
+        energies, added as gas-phase references
+    """
+
+    def __init__(self, references=None):
+        # functional -> formula -> (energy, kind)
+        self._references = {}
+        self._potentials = None
+        for functional, energies in (references or {}).items():
+            for formula, energy in energies.items():
+                self.add(formula, energy, functional=functional)
+
+    def __repr__(self):
+        counts = {key: len(value) for key, value in self._references.items()}
+        return f"{self.__class__.__name__}({counts})"
+
+    def add(self, formula, energy, functional=DEFAULT_FUNCTIONAL, kind="gas"):
+        """Add (or replace) a reference.
+
+        :param formula: formula of the molecule or of the bulk cell, whose
+            energy is ``energy``
+        :param energy: total energy in eV
+        :param functional: functional the energy was computed with
+        :param kind: one of ``REFERENCE_KINDS``
+        """
+        if kind not in REFERENCE_KINDS:
+            raise ValueError(f"kind must be one of {REFERENCE_KINDS}, not '{kind}'")
+        if not parse_formula(formula):
+            raise ValueError("a reference needs at least one atom")
+        functional = _functional_key(functional)
+        self._references.setdefault(functional, {})[formula] = (float(energy), kind)
+        self._potentials = None
+
+    @property
+    def functionals(self):
+        """Functionals with references, as lowercase strings."""
+        return list(self._references)
+
+    def get_references(self, functional=DEFAULT_FUNCTIONAL):
+        """Return the references of a functional.
+
+        :returns: dataframe with the ``energy`` and ``kind`` of every formula
+        :rtype: :class:`pandas.DataFrame`
+        """
+        references = self._references.get(_functional_key(functional), {})
+        return pd.DataFrame(
+            list(references.values()),
+            index=pd.Index(list(references), name="formula"),
+            columns=["energy", "kind"],
+        )
+
+    def chemical_potentials(self, functional=DEFAULT_FUNCTIONAL):
+        """Return the chemical potentials of the elements for a functional.
+
+        :returns: series indexed by element, in eV per atom
+        :rtype: :class:`pandas.Series`
+        """
+        elements, functionals, potentials = self._get_potentials()
+        functional = _functional_key(functional)
+        if functional not in functionals:
+            raise KeyError(f"No references for functional '{functional}'")
+        row = potentials[functionals.index(functional)]
+        known = ~np.isnan(row)
+        return pd.Series(row[known], index=np.array(elements)[known], name=functional)
+
+    def get_energies(self, formulas, functionals=DEFAULT_FUNCTIONAL):
+        """Sum the chemical potentials of the atoms of many formulas.
+
+        Every distinct formula is parsed once, and the energies of all of them
+        for all functionals come from one matrix product.
+
+        :param formulas: sequence of formulas (missing values count as no atom)
+        :param functionals: functional of every formula, or a single one
+        :returns: reference energies, NaN where an element or the functional
+            has no reference
+        :rtype: :class:`numpy.ndarray`
+        """
+        elements, known_functionals, potentials = self._get_potentials()
+        formula_codes, unique_formulas = _factorize(formulas)
+        if isinstance(functionals, str):
+            functionals = [functionals] * len(formula_codes)
+        functional_codes, unique_functionals = _factorize(functionals)
+
+        compositions, other = composition_matrix(unique_formulas, elements)
+        undetermined = np.isnan(potentials)
+        # (distinct formulas, functionals) table of reference energies
+        table = compositions @ np.where(undetermined, 0.0, potentials).T
+        table[(compositions @ undetermined.T) > 0] = np.nan
+        table[other] = np.nan
+
+        columns = np.array(
+            [
+                known_functionals.index(key) if key in known_functionals else -1
+                for key in map(_functional_key, unique_functionals)
+            ],
+            dtype=int,
+        )
+        table = np.hstack([table, np.full((len(table), 1), np.nan)])
+        return table[formula_codes, columns[functional_codes]]
+
+    def _get_potentials(self):
+        """Return the elements, functionals and matrix of chemical potentials.
+
+        The matrix, with one row per functional and NaN for the elements
+        without reference, is computed once and kept until a reference is
+        added.
+        """
+        if self._potentials is not None:
+            return self._potentials
+        elements = sorted(
+            {
+                element
+                for references in self._references.values()
+                for formula in references
+                for element, _ in parse_formula(formula)
+            }
+        )
+        functionals = list(self._references)
+        potentials = np.full((len(functionals), len(elements)), np.nan)
+        for row, functional in enumerate(functionals):
+            references = self._references[functional]
+            stoichiometry, _ = composition_matrix(list(references), elements)
+            used = stoichiometry.any(axis=0)
+            energies = np.array([energy for energy, _ in references.values()])
+            if len(references) != used.sum():
+                raise ValueError(
+                    f"Functional '{functional}' has {len(references)} references "
+                    f"for {used.sum()} elements, there must be one per element"
+                )
+            try:
+                potentials[row, used] = np.linalg.solve(
+                    stoichiometry[:, used], energies
+                )
+            except np.linalg.LinAlgError as exception:
+                raise ValueError(
+                    f"The references of functional '{functional}' are linearly "
+                    "dependent and do not determine the chemical potentials"
+                ) from exception
+        self._potentials = elements, functionals, potentials
+        return self._potentials
+
+
+def composition_matrix(formulas, elements):
+    """Return the number of atoms of every element in every formula.
+
+    :param formulas: sequence of formulas
+    :param elements: sequence of elements, the columns of the matrix
+    :returns: tuple ``(matrix, other)``, where ``matrix`` has one row per
+        formula and ``other`` flags the formulas with elements not in
+        ``elements``
+    :rtype: tuple(numpy.ndarray, numpy.ndarray)
+    """
+    columns = {element: index for index, element in enumerate(elements)}
+    matrix = np.zeros((len(formulas), len(elements)))
+    other = np.zeros(len(formulas), dtype=bool)
+    for row, formula in enumerate(formulas):
+        for element, count in parse_formula(formula):
+            if element in columns:
+                matrix[row, columns[element]] = count
+            else:
+                other[row] = True
+    return matrix, other
+
+
+def count_atoms(formulas):
+    """Return the number of atoms of many formulas, parsing each distinct one once."""
+    codes, unique = _factorize(formulas)
+    counts = np.array([sum(n for _, n in parse_formula(f)) for f in unique], dtype=int)
+    return counts[codes]
+
+
+def _factorize(values):
+    """Return the codes and distinct values of a sequence of strings.
+
+    Missing values become the empty string.
+    """
+    values = pd.Series(values, dtype=object).fillna("").astype(str)
+    codes, unique = pd.factorize(values)
+    return codes, list(unique)
+
+
+def _functional_key(functional):
+    return str(functional).lower()
@@ -0,0 +1,80 @@
+from contextlib import contextmanager
+from dataclasses import dataclass
+import mmap
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from aiida.orm import FolderData
+
+
+@dataclass
+class IonicStep:
+    """Results of one ionic step, as yielded by the streaming output parsers.
+
+    Units: energies in eV, forces in eV/Angstrom, positions and cell in
+    Angstrom (cartesian), stress in kbar and magnetization in Bohr magnetons.
+    Quantities not printed by the code for a given step are ``None``.
+    """
+
+    index: int
+    energy: Optional[float] = None  # free energy (VASP TOTEN, QE "!" total energy)
+    energy_extrapolated: Optional[float] = None  # sigma -> 0
+    forces: Optional[np.ndarray] = None  # (num_atoms, 3)
+    positions: Optional[np.ndarray] = None  # (num_atoms, 3)
+    cell: Optional[np.ndarray] = None  # (3, 3)
+    stress: Optional[np.ndarray] = None  # (3, 3)
+    magnetization: Optional[float] = None
+    fermi_energy: Optional[float] = None
+
+
+def extrapolate_energy(energy, smearing):
+    """Return the energy extrapolated to sigma -> 0 of a smeared calculation.
+
+    :param energy: free energy ``E - TS``
+    :param smearing: smearing contribution ``-TS``, or ``None`` if there is none
+    :returns: ``E - TS/2``, as the ``energy(sigma->0)`` of VASP
+    """
+    return energy if smearing is None else energy - 0.5 * smearing
+
+
+@contextmanager
+def open_output(source, filename, use_mmap=True):
+    """Open an output file for streaming, in binary mode.
+
+    :param source: retrieved :class:`aiida.orm.FolderData`, path to the
+        calculation folder or path to the file itself
+    :param filename: name of the file inside ``source`` (ignored if ``source``
+        is the path to a file)
+    :param use_mmap: memory-map files on disk instead of reading them through
+        a buffered handle
+    :returns: file-like object supporting ``read`` and ``readline``
+    """
+    if isinstance(source, FolderData):
+        with source.open(filename, "rb") as handle:
+            yield handle
+        return
+
+    path = Path(source)
+    if path.is_dir():
+        path = path / filename
+    with open(path, "rb") as handle:
+        if use_mmap and path.stat().st_size > 0:
+            with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield mapped
+        else:
+            yield handle
+
+
+def iter_lines(handle):
+    """Iterate over the (binary) lines of a file or memory map."""
+    return iter(handle.readline, b"")
+
+
+def has_output(source, filename):
+    """Check whether ``source`` (as accepted by :func:`open_output`) has ``filename``."""
+    if isinstance(source, FolderData):
+        return filename in source.base.repository.list_object_names()
+    path = Path(source)
+    return path.name == filename or (path / filename).is_file()
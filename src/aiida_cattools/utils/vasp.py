@@ -0,0 +1,143 @@
+"""Streaming parsers for VASP output files.
+
+The parsers are generators yielding one :class:`~aiida_cattools.utils.steps.IonicStep`
+per ionic step, so that trajectories of long relaxations can be processed
+without loading the OUTCAR or vasprun.xml in memory.
+"""
+from xml.etree.ElementTree import iterparse
+
+import numpy as np
+
+from .instrument import instrumented
+from .steps import IonicStep, has_output, iter_lines, open_output
+
+OUTCAR = "OUTCAR"
+VASPRUN = "vasprun.xml"
+OUTPUT_FILES = (OUTCAR, VASPRUN)
+
+
+def iter_ionic_steps(source):
+    """Yield the ionic steps of a VASP calculation.
+
+    The OUTCAR is preferred, as it is the only file with the magnetization of
+    every step; the vasprun.xml is used if there is no OUTCAR.
+
+    :param source: retrieved :class:`aiida.orm.FolderData` or path to the
+        calculation folder
+    """
+    if has_output(source, OUTCAR):
+        return iter_outcar_steps(source)
+    return iter_vasprun_steps(source)
+
+
+@instrumented
+def iter_outcar_steps(source, filename=OUTCAR):
+    """Yield the ionic steps of an OUTCAR, reading it line by line.
+
+    :param source: retrieved :class:`aiida.orm.FolderData`, path to the
+        calculation folder or to the OUTCAR itself
+    :param filename: name of the OUTCAR inside ``source``
+    """
+    with open_output(source, filename) as handle:
+        lines = iter_lines(handle)
+        step = IonicStep(index=0)
+        cell = None
+        in_final_energy = False
+
+        for line in lines:
+            if b"magnetization" in line and b"number of electron" in line:
+                # printed at every electronic step, the last one is converged
+                step.magnetization = float(line.split()[-1])
+            elif b"E-fermi" in line:
+                step.fermi_energy = float(line.split()[2])
+            elif line.lstrip().startswith(b"in kB"):
+                step.stress = _voigt_to_matrix(line.split()[2:8])
+            elif b"direct lattice vectors" in line:
+                cell = np.array(
+                    [next(lines).split()[:3] for _ in range(3)], dtype=float
+                )
+            elif b"TOTAL-FORCE" in line and b"POSITION" in line:
+                next(lines)  # dashed line
+                block = []
+                for row in lines:
+                    if row.lstrip().startswith(b"---"):
+                        break
+                    block.append(row.split()[:6])
+                block = np.array(block, dtype=float).reshape(-1, 6)
+                step.positions, step.forces = block[:, :3], block[:, 3:]
+            elif b"FREE ENERGIE OF THE ION-ELECTRON SYSTEM" in line:
+                in_final_energy = True
+            elif in_final_energy and b"TOTEN" in line:
+                step.energy = float(line.split(b"=")[-1].split()[0])
+            elif in_final_energy and b"energy(sigma->0)" in line:
+                step.energy_extrapolated = float(line.split(b"=")[-1])
+                step.cell = cell
+                yield step
+                step = IonicStep(index=step.index + 1)
+                in_final_energy = False
+
+
+@instrumented
+def iter_vasprun_steps(source, filename=VASPRUN):
+    """Yield the ionic steps of a vasprun.xml with an incremental XML parser.
+
+    Every ``<calculation>`` element is discarded once parsed, so the memory
+    usage does not grow with the number of steps. The vasprun.xml does not
+    contain the magnetization, which is always ``None``.
+
+    :param source: retrieved :class:`aiida.orm.FolderData`, path to the
+        calculation folder or to the vasprun.xml itself
+    :param filename: name of the vasprun.xml inside ``source``
+    """
+    with open_output(source, filename) as handle:
+        stack = []
+        root = None
+        step = IonicStep(index=0)
+
+        for event, elem in iterparse(handle, events=("start", "end")):
+            if event == "start":
+                if root is None:
+                    root = elem
+                stack.append(elem.tag)
+                continue
+
+            stack.pop()
+            parent = stack[-1] if stack else None
+
+            if elem.tag == "calculation":
+                yield step
+                step = IonicStep(index=step.index + 1)
+                root.clear()
+            elif parent != "calculation":
+                continue
+            elif elem.tag == "structure":
+                step.cell = _varray(elem.find("crystal/varray[@name='basis']"))
+                step.positions = _varray(elem.find("varray[@name='positions']"))
+                step.positions = step.positions @ step.cell
+            elif elem.tag == "varray" and elem.get("name") == "forces":
+                step.forces = _varray(elem)
+            elif elem.tag == "varray" and elem.get("name") == "stress":
+                step.stress = _varray(elem)
+            elif elem.tag == "energy":
+                values = {i.get("name"): float(i.text) for i in elem.iter("i")}
+                step.energy = values.get("e_fr_energy")
+                step.energy_extrapolated = values.get("e_0_energy")
+            elif elem.tag == "dos":
+                efermi = elem.find("i[@name='efermi']")
+                if efermi is not None:
+                    step.fermi_energy = float(efermi.text)
+
+            if parent == "calculation":
+                # the electronic steps, eigenvalues and DOS are the bulk of the file
+                elem.clear()
+
+
+def _varray(elem):
+    """Convert a ``<varray>`` element to a 2D array."""
+    return np.array([v.text.split() for v in elem.iter("v")], dtype=float)
+
+
+def _voigt_to_matrix(values):
+    """Convert VASP's (XX, YY, ZZ, XY, YZ, ZX) stress components to a 3x3 matrix."""
+    xx, yy, zz, xy, yz, zx = (float(value) for value in values)
+    return np.array([[xx, xy, zx], [xy, yy, yz], [zx, yz, zz]])
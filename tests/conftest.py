@@ -0,0 +1,81 @@
+"""pytest fixtures shared by the test modules."""
+import os
+
+import numpy as np
+import pytest
+
+from aiida.common.links import LinkType
+from aiida.orm import CalcJobNode, Dict, FolderData, WorkflowNode
+
+from aiida_cattools.data.support import Support
+
+from . import TEST_DIR
+
+
+@pytest.fixture(scope="function")
+def create_workchain():
+    """Get a factory storing workflow nodes with an energy output."""
+
+    def _create_workchain(energy=None, label="misc", smearing=None):
+        """Store a workflow node returning a ``misc``-like dictionary."""
+        workchain = WorkflowNode().store()
+        if energy is not None:
+            if label == "misc":
+                content = {"total_energies": {"energy_extrapolated_electronic": energy}}
+            else:
+                content = {"energy": energy}
+                if smearing is not None:
+                    content["energy_smearing"] = smearing
+            output = Dict(content).store()
+            output.base.links.add_incoming(
+                workchain, link_type=LinkType.RETURN, link_label=label
+            )
+        return workchain
+
+    return _create_workchain
+
+
+@pytest.fixture(scope="function")
+def create_retrieved_workchain(
+    create_workchain,
+):  # pylint: disable=redefined-outer-name
+    """Get a factory storing workflow nodes whose calculation retrieved files."""
+
+    def _create_retrieved_workchain(code):
+        """Store a workchain without energy output, whose calculation retrieved files."""
+        workchain = create_workchain()
+        calc = CalcJobNode()
+        calc.base.links.add_incoming(
+            workchain, link_type=LinkType.CALL_CALC, link_label="call"
+        )
+        calc.store()
+        retrieved = FolderData(tree=os.path.join(TEST_DIR, "input_files", code))
+        retrieved.base.links.add_incoming(
+            calc, link_type=LinkType.CREATE, link_label="retrieved"
+        )
+        retrieved.store()
+        return workchain
+
+    return _create_retrieved_workchain
+
+
+@pytest.fixture(scope="function")
+def fcc111():
+    """Get a builder of fcc(111) slabs."""
+
+    def _fcc111(size=3, layers=3, a=3.92, symbol="Pt"):
+        """Build an fcc(111) slab with ABC stacking as a Support."""
+        d = a / np.sqrt(2)
+        a1, a2 = np.array([d, 0, 0]), np.array([d / 2, d * np.sqrt(3) / 2, 0])
+        dz = a / np.sqrt(3)
+        support = Support(cell=[size * a1, size * a2, [0, 0, layers * dz + 15]])
+        for layer in range(layers):
+            shift = (layer % 3) * (a1 + a2) / 3 + [0, 0, layer * dz]
+            for x in range(size):
+                for y in range(size):
+                    support.append_atom(
+                        position=x * a1 + y * a2 + shift, symbols=symbol
+                    )
+        return support
+
+    return _fcc111
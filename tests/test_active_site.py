@@ -0,0 +1,49 @@
+""" Tests for the enumeration of adsorption sites."""
+import numpy as np
+
+from aiida.orm import load_node
+
+from aiida_cattools.utils.geometry import find_sites, neighbor_pairs
+
+
+def test_neighbor_pairs():
+    """Test the cell list against the brute-force O(N^2) search."""
+    points = np.random.default_rng(0).random((300, 3)) * 10
+    i, j, _ = neighbor_pairs(points, 1.5)
+
+    distances = np.linalg.norm(points[:, None] - points[None], axis=-1)
+    expected = set(zip(*np.nonzero(np.triu(distances < 1.5, k=1))))
+    assert set(zip(i, j)) == expected
+
+
+def test_equivalent_sites_tolerance(fcc111):
+    """Test that slightly displaced atoms do not split the groups of equivalent sites."""
+    support = fcc111(size=4)
+    positions = support.get_ase().positions
+    positions += np.random.default_rng(0).normal(0, 0.005, positions.shape)
+
+    sites = find_sites(positions, np.zeros(len(positions), int), support.cell)
+
+    assert sorted(sites["kinds"][sites["unique"]]) == [0, 1, 2, 3]
+
+
+def test_active_sites(fcc111):
+    """Test the sites of a Pt(111) slab and their caching on the support."""
+    support = fcc111()
+    active_sites = support.get_active_sites()
+
+    kinds = active_sites.get_site_kinds()
+    assert [
+        np.count_nonzero(kinds == kind) for kind in ("top", "bridge", "fcc", "hcp")
+    ] == [9, 27, 9, 9]
+    assert sorted(active_sites.get_unique_sites()["kinds"]) == [0, 1, 2, 3]
+    assert support.get_active_sites() is active_sites
+
+    support.store()
+    stored = support.get_active_sites(tolerance=0.2)
+    assert stored.is_stored
+    reloaded = load_node(support.pk).get_active_sites(tolerance=0.2)
+    assert reloaded.uuid == stored.uuid
+    np.testing.assert_array_equal(
+        reloaded.get_sites()["positions"], stored.get_sites()["positions"]
+    )
@@ -0,0 +1,56 @@
+""" Tests for the placement of adsorbates on slabs."""
+import types
+
+import numpy as np
+import pytest
+
+from aiida_cattools.data.adsorbate import Adsorbate
+
+
+def carbon_monoxide():
+    """Build an upright CO molecule bonded through the carbon atom."""
+    adsorbate = Adsorbate(cell=np.eye(3) * 10)
+    adsorbate.append_atom(position=(0, 0, 0), symbols="C")
+    adsorbate.append_atom(position=(0, 0, 1.15), symbols="O")
+    return adsorbate
+
+
+def test_iter_placements(fcc111):
+    """Test that clashing candidates are rejected and the others are generated."""
+    support = fcc111()
+    active_sites = support.get_active_sites()
+    placements = carbon_monoxide().iter_placements(
+        support, heights=(2.0, 0.5), angles=2
+    )
+    assert isinstance(placements, types.GeneratorType)
+
+    structures = list(placements)
+    # Only the threefold hollows are far enough from the surface at 0.5 A
+    assert len(structures) == 4 * 2 + 2 * 2
+    low = [s.base.attributes.get("placement") for s in structures]
+    assert {p["site_kind"] for p in low if p["height"] == 0.5} == {"fcc", "hcp"}
+
+    structure = structures[0]
+    placement = structure.base.attributes.get("placement")
+    assert structure.get_formula() == "COPt27"
+    site = active_sites.get_sites()["positions"][placement["site"]]
+    np.testing.assert_allclose(
+        structure.sites[-2].position, site + [0, 0, placement["height"]]
+    )
+
+
+def test_iter_placements_tilted(fcc111):
+    """Test that every orientation is generated around the anchor atom."""
+    adsorbate = carbon_monoxide()
+    with pytest.raises(ValueError):
+        adsorbate.anchor = 2
+    structures = list(
+        adsorbate.iter_placements(
+            fcc111(), heights=(2.0,), angles=3, tilts=(0, 60), unique=False
+        )
+    )
+    assert len(structures) == 54 * 3 * 2
+    oxygen = np.array([s.sites[-1].position for s in structures[:6]])
+    carbon = np.array([s.sites[-2].position for s in structures[:6]])
+    np.testing.assert_allclose(np.linalg.norm(carbon - oxygen, axis=1), 1.15)
+    np.testing.assert_allclose(oxygen[:, 2] - carbon[:, 2], [1.15] * 3 + [0.575] * 3)
@@ -1,10 +1,13 @@
 """ Tests for calculations."""
 import os
+import shutil
 
 from aiida.engine import run
 from aiida.orm import SinglefileData
 from aiida.plugins import CalculationFactory, DataFactory
 
+from aiida_cattools.calculations import identical_diff, run_diff
+
 from . import TEST_DIR
 
 
@@ -35,3 +38,98 @@ def test_process(cattools_code):
 
     assert "content1" in computed_diff
     assert "content2" in computed_diff
+
+
+def test_process_many_targets(cattools_code, tmp_path):
+    """Test comparing many targets in a single job, with and without reference."""
+    DiffParameters = DataFactory("cattools")
+    reference = os.path.join(TEST_DIR, "input_files", "file1.txt")
+    targets = {}
+    for label in ("same", "other", "own"):
+        path = tmp_path / label
+        path.mkdir()
+        if label == "same":
+            shutil.copy(reference, path / "INCAR")
+        else:
+            (path / "INCAR").write_text(f"content of {label}\n")
+        targets[label] = SinglefileData(file=str(path / "INCAR"))
+
+    inputs = {
+        "code": cattools_code,
+        "parameters": DiffParameters({}),
+        "file1": SinglefileData(file=reference),
+        "targets": targets,
+        "references": {"own": SinglefileData(file=str(tmp_path / "own" / "INCAR"))},
+        "metadata": {"options": {"max_wallclock_seconds": 30}},
+    }
+
+    result = run(CalculationFactory("cattools"), **inputs)
+
+    assert "cattools" not in result
+    assert set(result["diffs"]) == {"same", "other", "own"}
+    assert result["diffs"]["same"].get_content() == ""
+    assert result["diffs"]["own"].get_content() == ""
+    assert "content of other" in result["diffs"]["other"].get_content()
+
+
+def test_process_summary(cattools_code):
+    """Test the structured summary of the diffs, with the patches inlined or kept."""
+    DiffParameters = DataFactory("cattools")
+    file1 = SinglefileData(file=os.path.join(TEST_DIR, "input_files", "file1.txt"))
+    file2 = SinglefileData(file=os.path.join(TEST_DIR, "input_files", "file2.txt"))
+
+    inputs = {
+        "code": cattools_code,
+        "parameters": DiffParameters({}),
+        "file1": file1,
+        "file2": file2,
+        "targets": {"same": file1},
+        "metadata": {
+            "options": {
+                "max_wallclock_seconds": 30,
+                "summarize": True,
+                "patch_threshold": 0,
+            }
+        },
+    }
+
+    result = run(CalculationFactory("cattools"), **inputs)
+
+    summary = result["summary"].get_dict()
+    assert not summary["identical"]
+    assert summary["format"] == "normal"
+    assert summary["hunks"] == len(summary["hunk_ranges"]) == 1
+    assert "content2" in result["cattools"].get_content()
+
+    same = result["summaries"]["same"].get_dict()
+    assert same["identical"] and same["patch"] == ""
+    assert "same" not in result.get("diffs", {})
+
+
+def test_run_diff_identical(cattools_code, tmp_path):
+    """Test that identical files are compared by a cached calcfunction, not a job."""
+    DiffParameters = DataFactory("cattools")
+    path = os.path.join(TEST_DIR, "input_files", "file1.txt")
+    shutil.copy(path, tmp_path / "copy.txt")
+
+    def inputs():
+        return {
+            "code": cattools_code,
+            "parameters": DiffParameters({}),
+            "file1": SinglefileData(file=path),
+            "file2": SinglefileData(file=str(tmp_path / "copy.txt")),
+        }
+
+    node = run_diff(inputs())
+    assert node.process_type == identical_diff.process_class.build_process_type()
+    assert node.outputs.summary["identical"]
+    assert node.outputs.cattools.get_content() == ""
+
+    cached = run_diff(inputs())
+    assert cached.base.caching.get_cache_source() == node.uuid
+
+    different = dict(
+        inputs(),
+        file2=SinglefileData(os.path.join(TEST_DIR, "input_files", "file2.txt")),
+    )
+    assert run_diff(different).process_class is CalculationFactory("cattools")
@@ -0,0 +1,149 @@
+""" Tests for the throttled submission of simulation campaigns."""
+import pandas as pd
+from plumpy import ProcessState
+import pytest
+
+from aiida.orm import WorkflowNode, load_node
+
+from aiida_cattools.data.collection import Collection
+from aiida_cattools.data.simulation import Simulation
+from aiida_cattools.utils.campaign import (
+    SIMULATION_EXTRA,
+    CampaignSubmitter,
+    TokenBucket,
+)
+
+
+class FakeClock:
+    """Clock advanced by the calls to ``sleep`` instead of waiting."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.on_sleep = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+        for callback in self.on_sleep:
+            callback()
+
+
+def test_token_bucket():
+    """Test that bursts are allowed and the average rate is enforced."""
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=3, clock=clock, sleep=clock.sleep)
+
+    for _ in range(7):
+        bucket.acquire()
+
+    # 3 tokens at once, then one every 0.5 s
+    assert clock.now == 2.0
+    assert not bucket.try_acquire()
+
+
+def test_campaign_submitter(tmp_path):
+    """Test the limit of active processes per queue and the resumption."""
+    clock = FakeClock()
+    running = []
+
+    def submit(builder):
+        node = WorkflowNode()
+        node.set_process_state(ProcessState.RUNNING)
+        node.label = builder["queue"]
+        node.description = builder.get("metadata", {}).get("description", "")
+        running.append(node.store())
+        peak[builder["queue"]] = max(
+            peak[builder["queue"]],
+            sum(n.label == builder["queue"] for n in running),
+        )
+        return node
+
+    def finish_all():
+        for node in running:
+            node.set_process_state(ProcessState.FINISHED)
+        running.clear()
+
+    clock.on_sleep.append(finish_all)
+    peak = {"short": 0, "long": 0}
+    simulations = [Simulation(wc_pk=1)] + [
+        Simulation(label=f"sim{i}", comment="short" if i % 2 else "long")
+        for i in range(6)
+    ]
+    collection = Collection.from_simulations(simulations)
+    state_file = tmp_path / "campaign.jsonl"
+    submitter = CampaignSubmitter(
+        collection,
+        lambda simulation: {"queue": simulation.comment},
+        state_file,
+        max_active=2,
+        rate=10,
+        key=lambda builder: builder["queue"],
+        submit=submit,
+        clock=clock,
+        sleep=clock.sleep,
+    )
+
+    pks = submitter.run()
+
+    assert len(pks) == 6
+    assert peak == {"short": 2, "long": 2}
+    assert (collection.df["wc_status"] == "submitted").sum() == 6
+    assert collection.df["wc_pk"].tolist()[1:] == [
+        pks[s.global_uuid] for s in simulations[1:]
+    ]
+    assert set(collection.df["wc_status"]) == {"", "submitted"}
+    node = load_node(pks[simulations[1].global_uuid])
+    assert node.base.extras.get(SIMULATION_EXTRA) == simulations[1].global_uuid
+
+    # A crash between the submission and its record, before the extra is
+    # set: the process is found instead of being submitted again
+    late = Simulation(label="late", comment="short")
+    collection = Collection.from_simulations(simulations + [late])
+
+    def crash(builder):
+        submit(builder)
+        raise KeyboardInterrupt
+
+    submitter.collection = collection
+    submitter._submit = crash  # pylint: disable=protected-access
+    with pytest.raises(KeyboardInterrupt):
+        submitter.run(wait=False)
+    node = running[-1]
+    assert SIMULATION_EXTRA not in node.base.extras.keys()
+
+    submitter._submit = submit  # pylint: disable=protected-access
+    resumed = submitter.run(wait=False)
+
+    assert len(resumed) == 7
+    assert resumed[late.global_uuid] == node.pk
+
+
+def test_campaign_restart_from_source(tmp_path):
+    """Test that a collection rebuilt from a source without UUIDs is not resubmitted."""
+    submitted = []
+
+    def submit(builder):  # pylint: disable=unused-argument
+        node = WorkflowNode()
+        node.set_process_state(ProcessState.FINISHED)
+        submitted.append(node.store())
+        return node
+
+    source = pd.DataFrame(
+        {"label": ["a", "b", "a"], "chem_formula": ["Pt", "Pt", "Pt"]}
+    )
+    state_file = tmp_path / "campaign.jsonl"
+    first = Collection.from_df(source)
+    build = lambda simulation: {}  # pylint: disable=unnecessary-lambda-assignment
+    pks = CampaignSubmitter(first, build, state_file, submit=submit).run()
+    assert len(pks) == 3
+
+    second = Collection.from_df(source)
+    assert set(second.df["global_uuid"]).isdisjoint(pks)
+    resumed = CampaignSubmitter(second, build, state_file, submit=submit).run()
+
+    assert len(submitted) == 3
+    assert resumed == pks
+    assert second.df["global_uuid"].tolist() == first.df["global_uuid"].tolist()
+    assert second.df["wc_pk"].tolist() == first.df["wc_pk"].tolist()
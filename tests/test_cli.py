@@ -1,9 +1,17 @@
 """ Tests for command line interface."""
+import csv
+import io
+import json
+
 from click.testing import CliRunner
+import pandas as pd
+import pytest
 
+from aiida.orm import Group
 from aiida.plugins import DataFactory
 
-from aiida_cattools.cli import export, list_
+from aiida_cattools.cli import export, export_collection, list_
+from aiida_cattools.data.collection import Collection
 
 
 # pylint: disable=attribute-defined-outside-init
@@ -25,6 +33,28 @@ class TestDataCli:
         result = self.runner.invoke(list_, catch_exceptions=False)
         assert str(self.parameters.pk) in result.output
 
+    def test_data_diff_list_formats(self):
+        """Test the filters, pagination and machine-readable formats of 'list'."""
+        DiffParameters = DataFactory("cattools")
+        other = DiffParameters({"ignore-all-space": True}).store()
+
+        result = self.runner.invoke(
+            list_, ["-e", "ignore-all-space", "-F", "json"], catch_exceptions=False
+        )
+        rows = [json.loads(line) for line in result.output.splitlines()]
+        assert [row["pk"] for row in rows] == [other.pk]
+        assert rows[0]["parameters"] == {"ignore-all-space": True}
+
+        result = self.runner.invoke(
+            list_,
+            ["--limit", "1", "--offset", "1", "-F", "csv"],
+            catch_exceptions=False,
+        )
+        rows = list(csv.DictReader(io.StringIO(result.output)))
+        assert [int(row["pk"]) for row in rows] == [other.pk]
+        assert rows[0]["ignore-all-space"] == "True"
+        assert rows[0]["ignore-case"] == "False"
+
     def test_data_diff_export(self):
         """Test 'verdi data cattools export'
 
@@ -35,3 +65,27 @@ class TestDataCli:
             export, [str(self.parameters.pk)], catch_exceptions=False
         )
         assert "ignore-case" in result.output
+
+
+@pytest.mark.parametrize("filename", ["simulations.parquet", "simulations.csv.gz"])
+def test_export_collection(tmp_path, filename, create_workchain):
+    """Test 'verdi data cattools export-collection' in chunks, with a group filter."""
+    group = Group(label="screening").store()
+    workchains = [create_workchain(-10.0 - i) for i in range(5)]
+    group.add_nodes(workchains[:3])
+
+    outfile = tmp_path / filename
+    result = CliRunner().invoke(
+        export_collection,
+        [str(outfile), "--group", str(group.pk), "--chunk-size", "2"],
+        catch_exceptions=False,
+    )
+    assert "exported 3 simulations" in result.output
+
+    if filename.endswith(".parquet"):
+        df = Collection.from_parquet(outfile).df
+    else:
+        df = pd.read_csv(outfile)
+    assert df["wc_pk"].tolist() == [node.pk for node in workchains[:3]]
+    assert df["final_energy"].tolist() == [-10.0, -11.0, -12.0]
+    assert df["global_uuid"].tolist() == [node.uuid for node in workchains[:3]]
@@ -0,0 +1,214 @@
+""" Tests for the Collection data container."""
+import pandas as pd
+import pytest
+
+from aiida_cattools.data.collection import Collection
+from aiida_cattools.data.simulation import Simulation
+from aiida_cattools.utils.references import ReferenceEnergies
+
+
+@pytest.fixture
+def collection():
+    """Collection of two clean slabs and three adsorbed configurations."""
+    simulations = [
+        Simulation(wc_pk=1, chem_formula="Pt36", surf_facet="111", final_energy=-100),
+        Simulation(wc_pk=2, chem_formula="Pd36", surf_facet="111", final_energy=-80),
+        Simulation(
+            wc_pk=3,
+            chem_formula="Pt36",
+            surf_facet="111",
+            ads_formula="CO",
+            ads_site="top",
+            final_energy=-116,
+        ),
+        Simulation(
+            wc_pk=4,
+            chem_formula="Pt36",
+            surf_facet="111",
+            ads_formula="CO",
+            ads_site="hollow",
+            final_energy=-116.5,
+        ),
+        Simulation(
+            wc_pk=5,
+            chem_formula="Pd36",
+            surf_facet="111",
+            ads_formula="CO",
+            ads_site="top",
+            final_energy=-95,
+        ),
+    ]
+    return Collection.from_simulations(simulations)
+
+
+def test_roundtrip(collection):
+    """Test the conversion from and to simulations and dataframes."""
+    assert len(collection) == 5
+    assert collection.df["surf_facet"].dtype == "category"
+
+    simulations = collection.to_simulations()
+    assert [sim.wc_pk for sim in simulations] == [1, 2, 3, 4, 5]
+    assert simulations[2].ads_formula == "CO"
+
+    from_df = Collection.from_df(collection.to_df()[["wc_pk", "final_energy"]])
+    assert from_df.df["functional"].tolist() == ["pbe"] * 5
+
+
+def test_adsorption_energies(collection):
+    """Test E_ads = E_slab+ads - E_slab - E_ref for the whole collection."""
+    energies = collection.adsorption_energies({"CO": -15})
+
+    assert energies.isna().tolist() == [True, True, False, False, False]
+    assert energies.tolist()[2:] == pytest.approx([-1.0, -1.5, 0.0])
+
+
+def test_adsorption_energies_duplicate_slabs(collection):
+    """Test that the lowest energy of a slab computed twice is the reference."""
+    duplicate = Simulation(
+        wc_pk=6, chem_formula="Pt36", surf_facet="111", final_energy=-101
+    )
+    simulations = collection.to_simulations()
+
+    for ordered in ([duplicate] + simulations, simulations + [duplicate]):
+        doubled = Collection.from_simulations(ordered)
+        energies = doubled.adsorption_energies({"CO": -15})
+        assert energies[doubled.df["wc_pk"] == 3].tolist() == [0.0]
+
+
+def test_min_energy_sites(collection):
+    """Test that the most stable site per slab and adsorbate is selected."""
+    energies = collection.adsorption_energies({"CO": -15})
+
+    best = collection.min_energy_sites(energies=energies)
+
+    assert sorted(best.df["wc_pk"]) == [4, 5]
+    assert isinstance(best.groupby("ads_site").size(), pd.Series)
+
+
+def test_parquet_snapshot_refresh(tmp_path, create_workchain):
+    """Test that a snapshot round-trips and refresh only re-queries changes."""
+    from aiida.orm import Group
+
+    workchains = [create_workchain(-10.0), create_workchain(-20.0)]
+    group = Group(label="collection").store()
+    group.add_nodes(workchains[:1])
+    snapshot = Collection.from_df(pd.DataFrame({"wc_pk": [workchains[0].pk]}))
+
+    assert snapshot.refresh(group=group) == [workchains[0].pk]
+    assert snapshot.df["final_energy"].tolist() == [-10.0]
+
+    path = tmp_path / "snapshot.parquet"
+    snapshot.to_parquet(path)
+    loaded = Collection.from_parquet(path)
+    assert loaded.snapshot_time == snapshot.snapshot_time
+    assert loaded.df["mtime"].notna().all()
+
+    assert not loaded.refresh(group=group)
+    group.add_nodes(workchains[1:])
+    # without a group, only the existing rows are refreshed
+    assert not Collection.from_parquet(path).refresh()
+    workchains[0].base.extras.set("touched", True)
+    assert loaded.refresh(group=group) == [wc.pk for wc in workchains]
+    assert loaded.df["final_energy"].tolist() == [-10.0, -20.0]
+
+
+def test_reference_energies(collection):
+    """Test adsorption and formation energies from a reference registry."""
+    references = ReferenceEnergies({"pbe": {"CO": -15, "O2": -10, "Pt": -2.5}})
+
+    energies = collection.adsorption_energies(references)
+    # only the adsorbate references are needed, so Pd has none
+    assert energies.tolist()[2:] == pytest.approx([-1.0, -1.5, 0.0])
+
+    formation = collection.formation_energies(references, per_atom=True)
+    assert formation[0] == pytest.approx((-100 + 90) / 36)
+    assert formation[2] == pytest.approx((-116 + 105) / 38)
+    assert formation[[1, 4]].isna().all()
+
+
+def test_query(create_workchain):
+    """Test that metadata is stored as extras and filtered in the database."""
+    workchains = [create_workchain(-10.0), create_workchain(-20.0), create_workchain()]
+    workchains[0].base.extras.set("note", "kept")
+    Collection.from_simulations(
+        [
+            Simulation(wc_pk=workchains[0].pk, active_metal="Pt", surf_facet="111"),
+            Simulation(wc_pk=workchains[1].pk, active_metal="Pd", vacancy=True),
+            Simulation(wc_pk=workchains[2].pk, active_metal="Pt", surf_facet="100"),
+        ]
+    ).store_metadata()
+    assert workchains[0].base.extras.get("note") == "kept"
+    assert workchains[1].base.extras.get("cattools_vacancy") is True
+
+    pt = Collection.query({"active_metal": "Pt"})
+    assert pt.df["wc_pk"].tolist() == [workchains[0].pk, workchains[2].pk]
+    assert pt.df["final_energy"].tolist() == [-10.0, 0.0]
+    assert pt.df["surf_facet"].tolist() == ["111", "100"]
+
+    ranged = Collection.query(
+        {"active_metal": {"in": ["Pt", "Pd"]}, "final_energy": {"<": -15}},
+        columns=["active_metal", "final_energy"],
+    )
+    assert ranged.df["wc_pk"].tolist() == [workchains[1].pk]
+    assert ranged.df["final_energy"].tolist() == [-20.0]
+    assert ranged.df["surf_facet"].tolist() == [""]
+
+    # energies parsed from the retrieved files are only stored as extras
+    workchains[2].base.extras.set("cattools_final_energy", -30.0)
+    ranged = Collection.query({"final_energy": {"<": -15}}, columns=["label"])
+    assert ranged.df["wc_pk"].tolist() == [wc.pk for wc in workchains[1:]]
+    assert ranged.df["final_energy"].tolist() == [-20.0, -30.0]
+
+    vacancies = Collection.query({"vacancy": True}, columns=["vacancy"])
+    assert vacancies.df["wc_pk"].tolist() == [workchains[1].pk]
+    assert not len(Collection.query({"vacancy": True, "wc_type": "vasp.relax"}))
+    with pytest.raises(ValueError):
+        Collection.query({"metal": "Pt"})
+
+    # the free energy of pw.x is extrapolated to sigma -> 0
+    qe = create_workchain(-40.0, label="output_parameters", smearing=-0.2)
+    low = Collection.query({"final_energy": {"<": -35}}, columns=["label"])
+    assert low.df["wc_pk"].tolist() == [qe.pk]
+    assert low.df["final_energy"].tolist() == [pytest.approx(-39.9)]
+
+
+def test_collection_group(monkeypatch, create_workchain):
+    """Test bulk membership changes and the single-query read of a group."""
+    from aiida.orm import Dict
+
+    from aiida_cattools.data.group import CollectionGroup
+    from aiida_cattools.utils.instrument import instrument
+
+    workchains = [create_workchain(-10.0), create_workchain(), create_workchain()]
+    collection = Collection.from_simulations(
+        [
+            Simulation(wc_pk=workchains[0].pk, active_metal="Pt", final_energy=-10),
+            Simulation(wc_pk=workchains[1].pk, active_metal="Pd", final_energy=-20),
+            Simulation(wc_pk=workchains[2].pk, active_metal="Pt", final_energy=-30),
+        ]
+    )
+    group = collection.to_group("screening")
+    assert isinstance(group, CollectionGroup)
+    assert group.count() == 3
+    assert not group.add_workchains(workchains)
+
+    with instrument() as report:
+        loaded = group.to_collection()
+    assert report.total.queries == 1
+    assert loaded.df["wc_pk"].tolist() == [wc.pk for wc in workchains]
+    assert loaded.df["active_metal"].tolist() == ["Pt", "Pd", "Pt"]
+    assert loaded.df["final_energy"].tolist() == [-10.0, -20.0, -30.0]
+    assert len(group.to_collection({"active_metal": "Pt"})) == 2
+
+    assert group.remove_workchains(workchains[1:] + [workchains[1].pk]) == [
+        wc.pk for wc in workchains[1:]
+    ]
+    assert group.count() == 1
+    with pytest.raises(ValueError):
+        group.add_workchains([workchains[1].pk, Dict().store().pk])
+    assert group.count() == 1
+
+    # storage backends without membership table
+    monkeypatch.setattr(CollectionGroup, "_membership_table", lambda self: None)
+    assert group.remove_workchains(workchains) == [workchains[0].pk]
+    assert group.count() == 0
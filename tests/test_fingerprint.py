@@ -0,0 +1,88 @@
+""" Tests for the structure fingerprints and their index."""
+import numpy as np
+import pytest
+
+from aiida_cattools.data.support import Support
+from aiida_cattools.utils.fingerprint import FingerprintIndex, get_fingerprint
+
+
+def shuffled(support, seed=0, noise=0.0):
+    """Copy a support permuting and displacing its atoms."""
+    rng = np.random.default_rng(seed)
+    sites = support.sites
+    copy = Support(cell=support.cell)
+    for i in rng.permutation(len(sites)):
+        position = np.array(sites[i].position) + rng.normal(0, noise, 3)
+        copy.append_atom(position=position, symbols="Pt")
+    return copy
+
+
+def test_fingerprint_attribute(fcc111):
+    """Test that the fingerprint is invariant and persisted once stored."""
+    support = fcc111()
+    formula, vector = support.get_fingerprint()
+
+    assert formula == "Pt27"
+    assert "fingerprint" not in support.base.attributes.keys()
+    _, other = shuffled(support).get_fingerprint()
+    np.testing.assert_allclose(vector, other, atol=1e-12)
+
+    # the structure may change until it is stored
+    support.append_atom(position=(0.0, 0.0, -2.0), symbols="Pt")
+    assert support.get_fingerprint()[0] == "Pt28"
+    support.store()
+    assert support.base.attributes.get("fingerprint")["formula"] == "Pt28"
+    assert support.get_fingerprint()[0] == "Pt28"
+
+    _, coarse = support.get_fingerprint(bins=24)
+    assert support.base.extras.get("fingerprint")["bins"] == 24
+    np.testing.assert_allclose(support.get_fingerprint(bins=24)[1], coarse)
+
+
+def test_fingerprint_index(tmp_path, fcc111):
+    """Test that duplicates are found across sessions and distinct ones are not."""
+    path = tmp_path / "fingerprints.sqlite"
+    index = FingerprintIndex(path)
+    reference = fcc111().store()
+    index.add_many([reference, fcc111(a=4.08).store()])
+    index.add(fcc111(size=2).store())
+    index.close()
+
+    index = FingerprintIndex(path)
+    assert len(index) == 3
+    found = index.find(shuffled(reference, noise=0.01))
+    assert [uuid for uuid, _ in found] == [reference.uuid]
+    assert not index.find(fcc111(a=3.8))
+    assert not index.find(fcc111(size=4))
+
+
+def test_fingerprint_index_replace(fcc111):
+    """Test tuples without uuid and the replacement of an entry's formula."""
+    index = FingerprintIndex()
+    formula, vector = fcc111().get_fingerprint()
+    with pytest.raises(ValueError):
+        index.add((formula, vector))
+
+    index.add((formula, vector), uuid="entry")
+    assert index.find((formula, vector))
+    index.add(("Pd27", vector), uuid="entry")
+    assert not index.find((formula, vector))
+    assert index.find(("Pd27", vector))
+
+
+def test_fingerprint_degenerate_cell(fcc111):
+    """Test that the non-periodic vectors of a 2-D cell may be zero."""
+    slab = fcc111()
+    positions = [site.position for site in slab.sites]
+    cell = np.array(slab.cell)
+    symbols = ["Pt"] * len(positions)
+    pbc = (True, True, False)
+
+    _, vector = get_fingerprint(positions, symbols, cell, pbc)
+    cell[2] = 0
+    _, flat = get_fingerprint(positions, symbols, cell, pbc)
+
+    np.testing.assert_allclose(flat, vector, atol=1e-12)
+    cell[1] = cell[0]
+    with pytest.raises(ValueError):
+        get_fingerprint(positions, symbols, cell, pbc)
@@ -0,0 +1,100 @@
+""" Tests for the getters in aiida_cattools.utils."""
+import os
+
+import pytest
+
+from aiida.common.links import LinkType
+from aiida.orm import CalcJobNode, FolderData
+
+from aiida_cattools.utils.getters import (
+    NODE_CACHE,
+    NodeCache,
+    get_energies_from_pks,
+    get_energy_from_pk,
+    load_node_cached,
+)
+
+from . import TEST_DIR
+
+
+def test_get_energies_from_pks(create_workchain):
+    """Test that energies are collected in bulk and missing PKs are reported."""
+    vasp = create_workchain(-10.5)
+    qe = create_workchain(-20.5, label="output_parameters", smearing=-0.2)
+    empty = create_workchain()
+
+    energies, missing = get_energies_from_pks([vasp.pk, qe.pk, empty.pk, 999999])
+
+    # the free energy of pw.x is extrapolated to sigma -> 0, as the VASP one
+    assert energies == {vasp.pk: -10.5, qe.pk: -20.4}
+    assert get_energy_from_pk(qe.pk) == -20.4
+    assert set(missing) == {empty.pk, 999999}
+    assert "no workchain" in missing[999999]
+
+
+@pytest.mark.parametrize("code", ["vasp", "qe"])
+def test_get_energy_from_retrieved(code, create_workchain):
+    """Test the fallback to the files retrieved by the last calculation."""
+    workchain = create_workchain()
+    calc = CalcJobNode()
+    calc.base.links.add_incoming(
+        workchain, link_type=LinkType.CALL_CALC, link_label="call"
+    )
+    calc.store()
+    retrieved = FolderData(tree=os.path.join(TEST_DIR, "input_files", code))
+    retrieved.base.links.add_incoming(
+        calc, link_type=LinkType.CREATE, link_label="retrieved"
+    )
+    retrieved.store()
+
+    energy = get_energy_from_pk(workchain.pk)
+
+    assert energy == pytest.approx(-10.7 if code == "vasp" else -1191.7906891)
+    assert get_energy_from_pk(create_workchain(-1.0).pk) == -1.0
+
+
+def test_node_cache(create_workchain):
+    """Test the hits, the invalidation by mtime and TTL, and the eviction."""
+    now = [0.0]
+    cache = NodeCache(maxsize=3, ttl=10, clock=lambda: now[0])
+    workchain = create_workchain(-3.0)
+    calls = []
+
+    def compute(node):
+        calls.append(node.pk)
+        return get_energy_from_pk(node.pk)
+
+    assert cache.get_or_compute(workchain.pk, "energy", compute) == -3.0
+    assert cache.get_or_compute(workchain.uuid, "energy", compute) == -3.0
+    assert calls == [workchain.pk]
+    assert cache.cache_info()[:3] == (1, 1, 0)
+
+    workchain.description = "modified"
+    cache.get_or_compute(workchain.pk, "energy", compute)
+    now[0] = 11.0
+    cache.get_or_compute(workchain.pk, "energy", compute)
+    assert len(calls) == 3
+    assert cache.cache_info().stale == 2
+
+    cache.invalidate(workchain.uuid)
+    assert len(cache) == 0
+    for energy in (-4.0, -5.0):
+        cache.get_or_compute(create_workchain(energy).pk, "energy", compute)
+    assert cache.cache_info().evictions == 1
+
+
+def test_get_energy_from_pk_cached(create_workchain):
+    """Test that the getter only uses a cache when asked to."""
+    cache = NodeCache()
+    workchain = create_workchain(-7.0)
+
+    assert get_energy_from_pk(workchain.pk, use_cache=cache) == -7.0
+    assert get_energy_from_pk(workchain.pk, use_cache=cache) == -7.0
+    assert get_energy_from_pk(workchain.pk) == -7.0
+    assert cache.cache_info()[:2] == (1, 1)
+
+    NODE_CACHE.invalidate()
+    assert load_node_cached(workchain.pk).pk == workchain.pk
+    assert get_energy_from_pk(workchain.pk, use_cache=True) == -7.0
+    assert len(NODE_CACHE) == 2
+    NODE_CACHE.invalidate()
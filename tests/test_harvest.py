@@ -0,0 +1,60 @@
+""" Tests for the concurrent harvesting of energies."""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from aiida_cattools.data.collection import Collection
+from aiida_cattools.data.simulation import Simulation
+from aiida_cattools.utils.harvest import harvest_energies, iter_energies
+
+
+def test_harvest_energies(create_retrieved_workchain, create_workchain):
+    """Test that output and parsed energies are harvested, as they complete."""
+    vasp = create_retrieved_workchain("vasp")
+    qe = create_retrieved_workchain("qe")
+    output = create_workchain(-1.0)
+    empty = create_workchain()
+    pks = [vasp.pk, qe.pk, output.pk, empty.pk, 999999]
+
+    energies, missing = harvest_energies(pks, max_concurrency=2)
+
+    assert energies == {
+        vasp.pk: pytest.approx(-10.7),
+        qe.pk: pytest.approx(-1191.7906891),
+        output.pk: -1.0,
+    }
+    assert set(missing) == {empty.pk, 999999}
+    assert "no workchain" in missing[999999]
+
+    async def collect():
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            return [
+                result
+                async for result in iter_energies(
+                    pks, max_concurrency=1, executor=executor
+                )
+            ]
+
+    results = asyncio.run(collect())
+    # The energies of the output dictionaries come first, without parsing
+    assert results[0] == (output.pk, -1.0, None)
+    assert {result.pk for result in results} == set(pks)
+
+
+def test_collection_harvest_energies(create_retrieved_workchain, create_workchain):
+    """Test that the collection energies are filled, keeping the missing ones."""
+    vasp = create_retrieved_workchain("vasp")
+    empty = create_workchain()
+    collection = Collection.from_simulations(
+        [
+            Simulation(wc_pk=vasp.pk),
+            Simulation(wc_pk=empty.pk, final_energy=-5.0),
+            Simulation(final_energy=-3.0),
+        ]
+    )
+
+    missing = collection.harvest_energies(executor=ThreadPoolExecutor())
+
+    assert list(missing) == [empty.pk]
+    assert collection.df["final_energy"].tolist() == pytest.approx([-10.7, -5.0, -3.0])
@@ -0,0 +1,85 @@
+""" Tests for the importer of legacy calculation folders."""
+import os
+import shutil
+
+import pytest
+
+from aiida.orm import load_node
+
+from aiida_cattools.data.support import Support
+from aiida_cattools.utils.importer import import_calculations
+
+from . import TEST_DIR
+
+
+@pytest.fixture
+def legacy_tree(tmp_path):
+    """Tree with a VASP folder, two pw.x folders and a broken folder."""
+    input_dir = os.path.join(TEST_DIR, "input_files")
+    shutil.copytree(os.path.join(input_dir, "vasp"), tmp_path / "Pt111" / "vasp")
+    (tmp_path / "Pt111" / "qe").mkdir()
+    shutil.copy(
+        os.path.join(input_dir, "qe", "aiida.out"), tmp_path / "Pt111" / "qe" / "pw.out"
+    )
+    # species labels instead of elements, only Fe1 in the atomic species table
+    stdout = (tmp_path / "Pt111" / "qe" / "pw.out").read_text()
+    stdout = stdout.replace("Pt  tau(   1)", "Fe1 tau(   1)").replace(
+        "Pt  tau(   2)", "Fe2 tau(   2)"
+    )
+    stdout = stdout.replace(
+        "   Cartesian axes",
+        "     atomic species   valence    mass     pseudopotential\n"
+        "        Fe1           16.00    55.84500     Fe( 1.00)\n\n"
+        "   Cartesian axes",
+    )
+    (tmp_path / "Fe" / "qe").mkdir(parents=True)
+    (tmp_path / "Fe" / "qe" / "pw.out").write_text(stdout)
+    (tmp_path / "broken").mkdir()
+    (tmp_path / "broken" / "OUTCAR").write_text("killed by the scheduler\n")
+    return tmp_path
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_import_calculations(legacy_tree, tmp_path, max_workers):
+    """Test that the folders are parsed, stored and recorded in the manifest."""
+    manifest = tmp_path / "manifest.jsonl"
+
+    collection, failures = import_calculations(
+        legacy_tree, manifest=manifest, max_workers=max_workers, structure_class=Support
+    )
+
+    assert list(failures) == [str((legacy_tree / "broken").resolve())]
+    df = collection.df.sort_values("former_path")
+    assert df["code"].tolist() == ["qe", "qe", "vasp"]
+    assert df["wc_type"].tolist() == ["quantumespresso.pw.relax"] * 2 + ["vasp.relax"]
+    assert (df["comment"] == "").all()
+    assert df["chem_formula"].tolist() == ["Fe2", "Pt2", "Pt2"]
+    assert df["final_energy"].tolist()[2] == -10.7
+    structure = load_node(df["structure_uuid"].tolist()[2])
+    assert isinstance(structure, Support)
+    assert structure.base.extras.get("final_energy") == -10.7
+    iron = load_node(df["structure_uuid"].tolist()[0])
+    assert iron.get_kind_names() == ["Fe1", "Fe2"]
+    assert [kind.symbol for kind in iron.kinds] == ["Fe", "Fe"]
+
+    # Resuming does not parse the imported folders again
+    shutil.rmtree(legacy_tree / "Pt111" / "vasp")
+    resumed, failures = import_calculations(legacy_tree, manifest=manifest)
+    assert sorted(resumed.df["code"]) == ["qe", "qe", "vasp"]
+    # with the same identities
+    assert set(resumed.df["global_uuid"]) == set(df["global_uuid"])
+    assert len(manifest.read_text().splitlines()) == 3
+
+
+def test_import_resumes_after_storing(legacy_tree, tmp_path):
+    """Test that structures stored before an interruption are not stored twice."""
+    collection, _ = import_calculations(legacy_tree, structure_class=Support)
+    manifest = tmp_path / "manifest.jsonl"
+
+    resumed, _ = import_calculations(
+        legacy_tree, manifest=manifest, structure_class=Support
+    )
+
+    assert sorted(resumed.df["structure_uuid"]) == sorted(
+        collection.df["structure_uuid"]
+    )
@@ -0,0 +1,44 @@
+""" Tests that the modules loaded by verdi and the entry points import lazily."""
+import subprocess
+import sys
+
+import pytest
+
+# Modules that must only be imported by the functions and commands using them
+HEAVY_MODULES = ("pandas", "pyarrow", "aiida_vasp", "aiida_quantumespresso")
+
+
+def imported_heavy_modules(module):
+    """Import ``module`` in a new interpreter.
+
+    The import time itself is measured by the benchmarks, as it depends too
+    much on the machine to be asserted here.
+
+    :returns: list of the heavy modules imported along with ``module``
+    """
+    code = (
+        f"import sys; import {module}; "
+        f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, check=True, text=True
+    )
+    return result.stdout.split()
+
+
+@pytest.mark.parametrize(
+    "module",
+    [
+        "aiida_cattools.cli",
+        "aiida_cattools.data",
+        "aiida_cattools.data.simulation",
+        "aiida_cattools.data.group",
+        "aiida_cattools.calculations",
+        "aiida_cattools.parsers",
+    ],
+)
+def test_lazy_imports(module):
+    """Test that the entry points and verdi commands do not load heavy modules."""
+    heavy = imported_heavy_modules(module)
+
+    assert not heavy, f"{module} imports {heavy}"
@@ -0,0 +1,57 @@
+""" Tests for the instrumentation of queries, repository reads and time."""
+import json
+import logging
+
+from click.testing import CliRunner
+
+from aiida.orm.utils.loaders import NodeEntityLoader
+from aiida.plugins import DataFactory
+
+from aiida_cattools.cli import data_cli
+from aiida_cattools.utils.getters import get_energies_from_pks, get_energy_from_pk
+from aiida_cattools.utils.instrument import instrument
+
+
+def test_instrument(caplog, create_retrieved_workchain, create_workchain):
+    """Test the counts per operation, the log events and the removal of the patches."""
+    pks = [create_workchain(-1.0 * index).pk for index in range(1, 4)]
+    retrieved = create_retrieved_workchain("vasp")
+
+    with caplog.at_level(logging.INFO, logger="aiida.cattools"):
+        with instrument("energies") as report:
+            get_energies_from_pks(pks)
+            for pk in pks:
+                get_energy_from_pk(pk)
+            get_energy_from_pk(retrieved.pk)
+
+    bulk = report.operations["utils.getters.get_energies_from_pks"]
+    assert (bulk.calls, bulk.queries, bulk.rows, bulk.load_node) == (1, 1, 3, 0)
+    single = report.operations["utils.getters.get_energy_from_pk"]
+    assert (single.calls, single.load_node) == (4, 4)
+    assert single.sql > single.queries  # loading nodes and their links
+    outcar = report.operations["utils.vasp.iter_outcar_steps"]
+    assert outcar.repository_bytes == report.total.repository_bytes > 0
+    assert report.total.wall_time >= single.wall_time > 0
+    assert "total (energies)" in report.format()
+
+    events = [record.cattools_event for record in caplog.records]
+    assert events[-1]["operation"] == "energies"
+    assert sum(e["operation"].endswith("get_energy_from_pk") for e in events) == 4
+    assert "load_entity" not in NodeEntityLoader.__dict__
+
+
+def test_profile_command():
+    """Test that the profile command runs another command and reports its cost."""
+    DiffParameters = DataFactory("cattools")
+    for option in ("ignore-case", "ignore-all-space"):
+        DiffParameters({option: True}).store()
+
+    result = CliRunner().invoke(
+        data_cli, ["profile", "--json", "list", "--format", "json"]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert len(result.stdout.splitlines()) == 2
+    report = json.loads(result.stderr)
+    assert report["name"] == "list --format json"
+    assert report["operations"]["cli.list_"]["rows"] == 2
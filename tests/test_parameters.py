@@ -0,0 +1,44 @@
+""" Tests for the DiffParameters data type."""
+import pytest
+from voluptuous import MultipleInvalid
+
+from aiida_cattools.data import DiffParameters, _validate
+
+
+def test_validation_is_memoized():
+    """Test that the schema runs once per set of options."""
+    _validate.cache_clear()
+    for _ in range(3):
+        parameters = DiffParameters({"ignore-case": True, "ignore-all-space": False})
+    DiffParameters({"ignore-all-space": False, "ignore-case": True})
+
+    assert _validate.cache_info().misses == 1
+    assert parameters.cmdline_params("a", "b") == ["--ignore-case", "a", "b"]
+    with pytest.raises(MultipleInvalid):
+        DiffParameters({"unknown-option": True})
+    with pytest.raises(MultipleInvalid):
+        DiffParameters({"ignore-case": [True]})
+
+
+def test_validation_does_not_depend_on_cache():
+    """Test that ``1`` is rejected after ``True`` was validated."""
+    _validate.cache_clear()
+    DiffParameters({"ignore-case": True})
+
+    with pytest.raises(MultipleInvalid):
+        DiffParameters({"ignore-case": 1})
+
+
+def test_get_or_create():
+    """Test that stored nodes with the same options are reused."""
+    DiffParameters.clear_interned()
+    stored = DiffParameters({"ignore-case": True}).store()
+
+    node = DiffParameters.get_or_create({"ignore-case": True})
+    assert node.pk == stored.pk
+    assert DiffParameters.get_or_create({"ignore-case": True}) is node
+
+    other = DiffParameters.get_or_create({"ignore-space-change": True})
+    assert other.is_stored and other.pk != stored.pk
+    assert other.cmdline_params("a", "b") == ["--ignore-space-change", "a", "b"]
+    DiffParameters.clear_interned()
@@ -0,0 +1,55 @@
+""" Tests for the streaming Quantum ESPRESSO output parsers."""
+import os
+
+import numpy as np
+import pytest
+
+from aiida.orm import FolderData
+
+from aiida_cattools.utils.qe import (
+    RY_TO_EV,
+    iter_ionic_steps,
+    iter_stdout_steps,
+    iter_xml_steps,
+)
+
+from . import TEST_DIR
+
+QE_DIR = os.path.join(TEST_DIR, "input_files", "qe")
+
+
+def test_stdout_steps():
+    """Test that every ionic step of the pw.x output is yielded, in eV and Angstrom."""
+    steps = list(iter_stdout_steps(QE_DIR))
+
+    assert [step.index for step in steps] == [0, 1]
+    assert steps[0].energy == pytest.approx(-87.5 * RY_TO_EV)
+    assert steps[0].energy_extrapolated == pytest.approx(-87.49 * RY_TO_EV)
+    assert [step.magnetization for step in steps] == [0.5, 0.6]
+    assert [step.fermi_energy for step in steps] == [7.1, 7.2]
+    assert steps[1].stress[0, 0] == -0.5
+    np.testing.assert_allclose(steps[0].positions[1], [1.0, 1.0, 1.0], atol=1e-5)
+    np.testing.assert_allclose(steps[1].positions[1], [1.0, 1.0, 1.1])
+    np.testing.assert_allclose(np.diag(steps[1].cell), [4.0, 4.0, 8.0], atol=1e-5)
+
+
+def test_xml_steps_match_stdout():
+    """Test that the XML parser gives the same records as the stdout parser."""
+    folder = FolderData(tree=QE_DIR)
+    steps = list(iter_xml_steps(folder))
+
+    assert steps[0].fermi_energy is None
+    assert steps[1].magnetization == 0.6
+    for step, reference in zip(steps, iter_stdout_steps(QE_DIR)):
+        assert step.energy == pytest.approx(reference.energy)
+        assert step.energy_extrapolated == pytest.approx(reference.energy_extrapolated)
+        np.testing.assert_allclose(step.positions, reference.positions, atol=1e-5)
+        np.testing.assert_allclose(step.forces, reference.forces)
+    np.testing.assert_allclose(np.diag(steps[0].stress), [-1.23] * 3, atol=1e-3)
+
+
+def test_iter_ionic_steps():
+    """Test that the standard output is preferred when available."""
+    steps = list(iter_ionic_steps(FolderData(tree=QE_DIR)))
+
+    assert steps[0].fermi_energy == 7.1
@@ -0,0 +1,51 @@
+""" Tests for the reference energies and chemical potentials."""
+import numpy as np
+import pytest
+
+from aiida_cattools.utils.references import (
+    ReferenceEnergies,
+    count_atoms,
+    parse_formula,
+)
+
+
+@pytest.fixture
+def references():
+    """Gas-phase and bulk references for two functionals."""
+    registry = ReferenceEnergies({"pbe": {"H2": -6.8, "H2O": -14.2, "CO": -14.8}})
+    registry.add("Pt4", -24.4, kind="bulk")
+    registry.add("H2", -7.0, functional="RPBE")
+    return registry
+
+
+def test_parse_formula():
+    """Test the parsing of formulas, with groups and repeated elements."""
+    assert parse_formula("CH3OH") == (("C", 1), ("H", 4), ("O", 1))
+    assert parse_formula("(CH3)2CO") == (("C", 3), ("H", 6), ("O", 1))
+    assert parse_formula("Pt36") == (("Pt", 36),)
+    assert parse_formula("") == ()
+    for formula in ("co", "C(O", "CO)", "C-O"):
+        with pytest.raises(ValueError):
+            parse_formula(formula)
+    assert count_atoms(["CO", "Pt36", None, "CO"]).tolist() == [2, 36, 0, 2]
+
+
+def test_chemical_potentials(references):
+    """Test that the stoichiometry matrix is solved per functional."""
+    potentials = references.chemical_potentials("PBE")
+    assert potentials.to_dict() == pytest.approx(
+        {"C": -7.4, "H": -3.4, "O": -7.4, "Pt": -6.1}
+    )
+    assert references.chemical_potentials("rpbe").to_dict() == {"H": -3.5}
+
+    energies = references.get_energies(
+        ["OH", "CO", "OH", "", "Pt36", "H"],
+        ["pbe", "pbe", "rpbe", "pbe", "hse", "rpbe"],
+    )
+    np.testing.assert_allclose(
+        energies, [-10.8, -14.8, np.nan, 0.0, np.nan, -3.5], equal_nan=True
+    )
+
+    references.add("O2", -9.8)
+    with pytest.raises(ValueError, match="one per element"):
+        references.chemical_potentials()
@@ -0,0 +1,66 @@
+""" Tests for the Simulation record."""
+from dataclasses import field, fields, make_dataclass
+import tracemalloc
+
+from aiida_vasp.workchains.relax import RelaxWorkChain
+
+from aiida_cattools.data.simulation import (
+    FIELD_NAMES,
+    Simulation,
+    workchain_entry_point,
+)
+
+
+def test_defaults():
+    """Test that every instance gets its own UUID and no ``__dict__``."""
+    first, second = Simulation(), Simulation()
+
+    assert first.global_uuid != second.global_uuid
+    assert not hasattr(first, "__dict__")
+
+
+def test_row_roundtrip():
+    """Test the conversion to and from collection rows."""
+    simulation = Simulation(wc_pk=7, ads_formula="CO", final_energy=-1.5)
+    row = simulation.to_row()
+
+    assert len(row) == len(FIELD_NAMES)
+    assert Simulation.from_row(row) == simulation
+
+
+def memory_per_record(record_class, num_records=10000):
+    """Return the memory allocated per record of a class, in bytes."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        records = [record_class(wc_pk=pk) for pk in range(num_records)]
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return (after - before) / len(records)
+
+
+def test_memory_per_record():
+    """Test that a record takes less memory than with a per-instance ``__dict__``."""
+    unslotted = make_dataclass(
+        "UnslottedSimulation",
+        [
+            (
+                f.name,
+                f.type,
+                field(default=f.default, default_factory=f.default_factory),
+            )
+            for f in fields(Simulation)
+        ],
+    )
+
+    assert memory_per_record(Simulation) < memory_per_record(unslotted)
+
+
+def test_workchain_entry_point():
+    """Test that workchain types are entry points, resolved to classes on demand."""
+    assert Simulation().wc_type == "vasp.relax"
+    assert Simulation().get_workchain_class() is RelaxWorkChain
+    for wc_type in (RelaxWorkChain, "RelaxWorkChain", "aiida.workflows:vasp.relax"):
+        assert workchain_entry_point(wc_type) == "vasp.relax"
+    assert workchain_entry_point("PwRelaxWorkChain") == "quantumespresso.pw.relax"
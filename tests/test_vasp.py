@@ -0,0 +1,54 @@
+""" Tests for the streaming VASP output parsers."""
+import os
+
+import numpy as np
+import pytest
+
+from aiida.orm import FolderData
+
+from aiida_cattools.utils.vasp import (
+    iter_ionic_steps,
+    iter_outcar_steps,
+    iter_vasprun_steps,
+)
+
+from . import TEST_DIR
+
+VASP_DIR = os.path.join(TEST_DIR, "input_files", "vasp")
+
+
+def test_outcar_steps():
+    """Test that every ionic step of an OUTCAR is yielded."""
+    steps = list(iter_outcar_steps(VASP_DIR))
+
+    assert [step.index for step in steps] == [0, 1]
+    assert [step.energy for step in steps] == [-10.5, -10.75]
+    assert [step.energy_extrapolated for step in steps] == [-10.45, -10.7]
+    assert [step.magnetization for step in steps] == [0.5, 0.6]
+    assert steps[1].fermi_energy == 5.2
+    assert steps[1].cell[0, 0] == 4.1
+    assert steps[1].stress[0, 2] == 0.3
+    np.testing.assert_allclose(steps[1].positions[1], [1.0, 1.0, 1.1])
+    np.testing.assert_allclose(steps[1].forces[:, 2], [-0.01, 0.01])
+
+
+def test_vasprun_steps_from_folder_data():
+    """Test that the vasprun.xml parser gives the same trajectory from a FolderData."""
+    folder = FolderData(tree=VASP_DIR)
+    steps = list(iter_vasprun_steps(folder))
+
+    assert [step.energy_extrapolated for step in steps] == [-10.45, -10.7]
+    assert steps[0].magnetization is None
+    assert steps[1].fermi_energy == 5.2
+    for step, reference in zip(steps, iter_outcar_steps(VASP_DIR)):
+        np.testing.assert_allclose(step.positions, reference.positions)
+        np.testing.assert_allclose(step.forces, reference.forces)
+
+
+@pytest.mark.parametrize("use_folder", [True, False])
+def test_iter_ionic_steps(use_folder):
+    """Test that the OUTCAR is preferred when available."""
+    source = FolderData(tree=VASP_DIR) if use_folder else VASP_DIR
+    steps = list(iter_ionic_steps(source))
+
+    assert steps[-1].magnetization == 0.6